@@ -1,90 +1,157 @@
+import asyncio
 import random
 import time
 import os
+import sys
+import io
+import hashlib
+import heapq
 import json
+import marshal
+import shutil
+import sqlite3
+import struct
+import tempfile
+import tracemalloc
+import unicodedata
+import weakref
+from array import array
+from collections import Counter, OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager, redirect_stdout
+from functools import lru_cache
+from itertools import cycle
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+# NumPy es opcional: solo lo necesitan los motores vectorizados
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ARCHIVO_PARTIDA = 'partida_guardada.jsonl'
+ARCHIVO_PARTIDA_ANTIGUA = 'partida_guardada.json'
+ARCHIVO_PARTIDAS = 'partidas.db'
+ARCHIVO_COMBATES = 'combates.log'
+
+
+def escribir_atomico(ruta, contenido):
+    """Escribe en un temporal y lo renombra: si el proceso muere a mitad, el archivo anterior sigue intacto."""
+    temporal = f"{ruta}.tmp"
+    with open(temporal, 'wb') as f:
+        f.write(contenido)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
 
 # -----------------------------
-# Dibujos ASCII sencillos
-# -----------------------------
-ascii_art = {
-    "Flameragon": r"""
-      /^\/^\
-    _|__|  O|
-\\/     /~     \\
- \____|________/
-       \_______/
-    """,
-    "Aquatle": r"""
-     ><(((('> 
-    """,
-    "Leafox": r"""
-    (\__/)
-    ( •.•)
-    c(")(")
-    """,
-    "Normie": r"""
-    (•_•) 
-    <)   )╯
-    /   \\
-    """,
-    "Sparkit": r"""
-     =^.^=
-    """,
-    "Wavefin": r"""
-     ><>
-    """,
-    "Bushbug": r"""
-     _/\_
-    (o  o)
-    / -- \\
-    """,
-    "Fluffball": r"""
-     (o.o)
-    <)   (>
-     ^^ ^^
-    """,
-    "Rocktoise": r"""
-     ____
-   /      \\
-  |  () () |
-   \  __  /
-    """,
-    "Glowfly": r"""
-     \*o*/ 
-      / \\
-    """
-}
+# Tipos internados como enteros
+# -----------------------------
+TIPOS = {}               # nombre del tipo -> id
+NOMBRES_TIPO = []        # id -> nombre del tipo
+MATRIZ_EFECTIVIDAD = []  # MATRIZ_EFECTIVIDAD[id_atacante][id_defensor] -> multiplicador
+_matriz_np = None        # copia NumPy, se regenera solo cuando cambia la matriz
+
+
+def registrar_tipo(nombre):
+    """Devuelve el id de un tipo; si es nuevo añade su fila y columna (neutras, 1.0) a la matriz."""
+    global _matriz_np
+    id_tipo = TIPOS.get(nombre)
+    if id_tipo is None:
+        id_tipo = len(NOMBRES_TIPO)
+        TIPOS[nombre] = id_tipo
+        NOMBRES_TIPO.append(nombre)
+        for fila in MATRIZ_EFECTIVIDAD:
+            fila.append(1.0)
+        MATRIZ_EFECTIVIDAD.append([1.0] * (id_tipo + 1))
+        _matriz_np = None
+    return id_tipo
+
+
+def registrar_efectividad(atacante, defensor, valor):
+    global _matriz_np
+    MATRIZ_EFECTIVIDAD[registrar_tipo(atacante)][registrar_tipo(defensor)] = valor
+    _matriz_np = None
+    _tabla_danio.cache_clear()
+    _golpes_por_efecto.cache_clear()
+
+
+def matriz_efectividad_np():
+    """MATRIZ_EFECTIVIDAD como array de NumPy para los motores vectorizados."""
+    global _matriz_np
+    if _matriz_np is None:
+        _matriz_np = np.array(MATRIZ_EFECTIVIDAD, dtype=np.float64)
+    return _matriz_np
+
 
 # -----------------------------
-# Tabla de efectividades
-# (lista, no diccionario)
+# Tablas de daño precalculadas
 # -----------------------------
-type_effectiveness_table = [
-    ['fuego', 'planta', 2.0],
-    ['fuego', 'agua', 0.5],
-    ['fuego', 'normal', 1.0],
-    ['agua', 'fuego', 2.0],
-    ['agua', 'planta', 0.5],
-    ['agua', 'normal', 1.0],
-    ['planta', 'agua', 2.0],
-    ['planta', 'fuego', 0.5],
-    ['planta', 'normal', 1.0],
-    ['normal', 'fuego', 1.0],
-    ['normal', 'agua', 1.0],
-    ['normal', 'planta', 1.0]
-]
+# Resultado de atacar() según el efecto 1-10: 0 sin efecto, 1 básico, 2 doble, 3 pierde turno
+RESULTADO_POR_EFECTO = (None, 0, 0, 1, 1, 1, 1, 1, 2, 2, 3)
+
+
+def formula_danio(danio_base, ataque, defensa, stab, efectividad):
+    return int((danio_base * ataque / max(1, defensa)) * stab * efectividad)
+
+
+@lru_cache(maxsize=8192)
+def _tabla_danio(ataque, tipo_atacante, poder, tipo_movimiento, defensa, tipo_defensor):
+    stab = 1.5 if tipo_movimiento == tipo_atacante else 1.0
+    efectividad = MATRIZ_EFECTIVIDAD[tipo_atacante][tipo_defensor]
+    danios = tuple(formula_danio(base, ataque, defensa, stab, efectividad) if base else 0
+                   for base in (0, poder, int(poder * 1.5), 0))
+    return danios, efectividad
+
+
+def tabla_danio(atacante, movimiento, defensor):
+    """
+    (daño final de cada resultado de atacar(), efectividad) para un golpe. La caché
+    usa como clave las stats y tipos que intervienen, así que si cambian (por ejemplo
+    al cargar una partida) la siguiente consulta ya no coincide con la entrada vieja.
+    """
+    return _tabla_danio(atacante.ataque, atacante.tipo_id, movimiento.poder, movimiento.tipo_id,
+                        defensor.defensa, defensor.tipo_id)
+
+
+@lru_cache(maxsize=4096)
+def _golpes_por_efecto(ataque, tipo_atacante, movimientos, defensa, tipo_defensor):
+    return tuple(tuple(_tabla_danio(ataque, tipo_atacante, m.poder, m.tipo_id, defensa, tipo_defensor)[0][r]
+                       for r in RESULTADO_POR_EFECTO[1:])
+                 for m in movimientos)
+
+
+def golpes_por_efecto(atacante, defensor):
+    """golpes[i][efecto - 1]: daño final del movimiento i con cada tirada 1-10 de atacar()."""
+    return _golpes_por_efecto(atacante.ataque, atacante.tipo_id, tuple(atacante.movimientos),
+                              defensor.defensa, defensor.tipo_id)
+
 
 # -----------------------------
 # Clase Movimiento
 # -----------------------------
 class Movimiento:
+    # Inmutable: cada especie comparte la misma tupla de movimientos entre todos sus ejemplares
+    __slots__ = ('nombre', 'poder', 'tipo_id')
+
     def __init__(self, nombre, poder, tipo):
-        self.nombre = nombre
-        self.poder = poder
-        self.tipo = tipo
+        object.__setattr__(self, 'nombre', nombre)
+        object.__setattr__(self, 'poder', poder)
+        object.__setattr__(self, 'tipo_id', registrar_tipo(tipo))
 
-    def atacar(self):
-        efecto = random.randint(1, 10)
+    def __setattr__(self, nombre, valor):
+        raise AttributeError("Movimiento es inmutable; crea uno nuevo")
+
+    def __reduce__(self):
+        return Movimiento, (self.nombre, self.poder, self.tipo)
+
+    @property
+    def tipo(self):
+        return NOMBRES_TIPO[self.tipo_id]
+
+    def atacar(self, rng=random):
+        efecto = rng.randint(1, 10)
         if efecto <= 2:
             return 0, "Sin efecto"
         elif efecto <= 7:
@@ -94,12 +161,22 @@ class Movimiento:
         else:
             return 0, "Ataque pierde turno"
 
+    def resultados(self):
+        """Los cuatro resultados posibles de atacar() como [(probabilidad, daño base, mensaje)]."""
+        return [(0.2, 0, "Sin efecto"),
+                (0.5, self.poder, "Ataque básico"),
+                (0.2, int(self.poder * 1.5), "Ataque doble"),
+                (0.1, 0, "Ataque pierde turno")]
+
 
 # -----------------------------
 # Clase Pokemon
 # -----------------------------
 class Pokemon:
-    def __init__(self, nombre, tipo, ataque, defensa, hp, habilidad, movimientos):
+    __slots__ = ('nombre', 'tipo_id', 'ataque', 'defensa', 'hp_max', 'hp_actual', 'habilidad', 'movimientos',
+                 'especie')
+
+    def __init__(self, nombre, tipo, ataque, defensa, hp, habilidad, movimientos, especie=None):
         self.nombre = nombre
         self.tipo = tipo
         self.ataque = ataque
@@ -108,31 +185,39 @@ class Pokemon:
         self.hp_actual = hp
         self.habilidad = habilidad
         self.movimientos = movimientos
+        self.especie = especie  # Especie del catálogo, o None si no está en él
+
+    @property
+    def tipo(self):
+        return NOMBRES_TIPO[self.tipo_id]
+
+    @tipo.setter
+    def tipo(self, valor):
+        self.tipo_id = registrar_tipo(valor)
 
     def mostrar_ascii(self):
-        art = ascii_art.get(self.nombre)
+        art = self.especie.arte if self.especie else None
         if art:
             print(art)
 
     def calcular_efectividad(self, tipo_oponente):
-        for efectividad in type_effectiveness_table:
-            if efectividad[0] == self.tipo and efectividad[1] == tipo_oponente:
-                return efectividad[2]
-        return 1.0
-
-    def cuackatacar(self, movimiento_idx, oponente):
+        # Acepta el nombre del tipo o su id
+        if isinstance(tipo_oponente, str):
+            tipo_oponente = TIPOS.get(tipo_oponente)
+            if tipo_oponente is None:
+                return 1.0
+        return MATRIZ_EFECTIVIDAD[self.tipo_id][tipo_oponente]
+
+    def cuackatacar(self, movimiento_idx, oponente, rng=random):
         movimiento = self.movimientos[movimiento_idx]
-        danio_base, mensaje = movimiento.atacar()
+        danio_base, mensaje = movimiento.atacar(rng)
 
         if danio_base == 0:
             return mensaje
 
-        # STAB
-        stab = 1.5 if movimiento.tipo == self.tipo else 1.0
-
-        efectividad = self.calcular_efectividad(oponente.tipo)
-
-        danio_final = int((danio_base * self.ataque / max(1, oponente.defensa)) * stab * efectividad)
+        danios, efectividad = tabla_danio(self, movimiento, oponente)
+        # atacar() solo devuelve daño en el ataque básico (poder) y el doble
+        danio_final = danios[1] if danio_base == movimiento.poder else danios[2]
 
         oponente.hp_actual = max(0, oponente.hp_actual - danio_final)
 
@@ -144,6 +229,15 @@ class Pokemon:
 
         return f"{mensaje}{mensaje_efectividad} ¡{danio_final} de daño!"
 
+    def calcular_danio(self, movimiento, danio_base, oponente):
+        """Daño final de un golpe con danio_base y la efectividad aplicada."""
+        # STAB
+        stab = 1.5 if movimiento.tipo_id == self.tipo_id else 1.0
+
+        efectividad = self.calcular_efectividad(oponente.tipo_id)
+
+        return formula_danio(danio_base, self.ataque, oponente.defensa, stab, efectividad), efectividad
+
     def cuackhabilidad(self):
         return self.habilidad
 
@@ -152,104 +246,315 @@ class Pokemon:
 
 
 # -----------------------------
-# Clases específicas
+# Catálogo de especies
 # -----------------------------
-class Flameragon(Pokemon):
-    def __init__(self):
-        movimientos = [
-            Movimiento("Llamarada", 40, "fuego"),
-            Movimiento("Ascuas", 30, "fuego"),
-            Movimiento("Garra", 25, "normal"),
-            Movimiento("Gruñido", 0, "normal")
-        ]
-        super().__init__("Flameragon", "fuego", 52, 43, 39, "Mar llamas", movimientos)
-
-
-class Aquatle(Pokemon):
-    def __init__(self):
-        movimientos = [
-            Movimiento("Pistola Agua", 40, "agua"),
-            Movimiento("Burbujas", 30, "agua"),
-            Movimiento("Cabezazo", 25, "normal"),
-            Movimiento("Retirada", 0, "normal")
-        ]
-        super().__init__("Aquatle", "agua", 48, 65, 44, "Torrente", movimientos)
-
-
-class Leafox(Pokemon):
-    def __init__(self):
-        movimientos = [
-            Movimiento("Latigazo", 40, "planta"),
-            Movimiento("Hoja Afilada", 30, "planta"),
-            Movimiento("Derribo", 25, "normal"),
-            Movimiento("Crecimiento", 0, "normal")
-        ]
-        super().__init__("Leafox", "planta", 49, 49, 45, "Espesura", movimientos)
-
-
-class Normie(Pokemon):
-    def __init__(self):
-        movimientos = [
-            Movimiento("Placaje", 35, "normal"),
-            Movimiento("Ataque Rápido", 30, "normal"),
-            Movimiento("Doble Filo", 40, "normal"),
-            Movimiento("Canto", 0, "normal")
-        ]
-        super().__init__("Normie", "normal", 55, 50, 50, "Fuga", movimientos)
-
-
-class Sparkit(Pokemon):
-    def __init__(self):
-        movimientos = [
-            Movimiento("Chispa", 35, "fuego"),
-            Movimiento("Arañazo", 25, "normal")
-        ]
-        super().__init__("Sparkit", "fuego", 45, 40, 35, "Electricidad", movimientos)
+# Especies, movimientos, tabla de tipos y dibujos viven en especies.json; añadir una
+# especie es añadir una entrada allí. El JSON se convierte a tuplas planas y se guarda
+# con marshal en __pycache__, con la huella del archivo: si no cambia, no se vuelve a leer.
+ARCHIVO_CATALOGO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'especies.json')
+VERSION_CATALOGO = 2
+
+
+class Especie:
+    """Datos inmutables de una especie del catálogo. Llamarla crea un ejemplar: Especie() -> Pokemon."""
+    __slots__ = ('nombre', 'tipo_id', 'ataque', 'defensa', 'hp', 'habilidad', 'movimientos', 'arte',
+                 'aparicion', 'inicial', 'rareza', 'biomas')
+
+    def __init__(self, nombre, tipo, ataque, defensa, hp, habilidad, movimientos, arte, aparicion, inicial,
+                 rareza='comun', biomas=()):
+        valores = (nombre, registrar_tipo(tipo), ataque, defensa, hp, habilidad, movimientos, arte,
+                   aparicion, inicial, rareza, biomas)
+        for campo, valor in zip(self.__slots__, valores):
+            object.__setattr__(self, campo, valor)
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError("Especie es inmutable; cambia el catálogo")
+
+    def __reduce__(self):
+        # Entre procesos viaja solo el nombre; el otro lado la busca en su catálogo
+        return especie_por_nombre, (self.nombre,)
+
+    def __repr__(self):
+        return f"Especie({self.nombre!r})"
+
+    @property
+    def tipo(self):
+        return NOMBRES_TIPO[self.tipo_id]
+
+    def __call__(self):
+        return Pokemon(self.nombre, self.tipo, self.ataque, self.defensa, self.hp, self.habilidad,
+                       self.movimientos, self)
+
+
+def _catalogo_desde_json(contenido):
+    """Texto de especies.json -> (efectividades, rarezas, especies) como tuplas planas (aptas para marshal)."""
+    datos = json.loads(contenido)
+    efectividades = tuple((atacante, defensor, float(valor)) for atacante, defensor, valor in datos['efectividades'])
+    rarezas = tuple((rareza, float(factor)) for rareza, factor in datos.get('rarezas', {'comun': 1.0}).items())
+    especies = []
+    nombres = set()
+    for e in datos['especies']:
+        if e['nombre'] in nombres:
+            raise ValueError(f"Especie repetida en el catálogo: {e['nombre']}")
+        nombres.add(e['nombre'])
+        rareza = e.get('rareza', 'comun')
+        if rareza not in dict(rarezas):
+            raise ValueError(f"Rareza desconocida para {e['nombre']}: {rareza}")
+        especies.append((e['nombre'], e['tipo'], e['ataque'], e['defensa'], e['hp'], e.get('habilidad', ''),
+                         tuple((m[0], m[1], m[2]) for m in e['movimientos']),
+                         '\n'.join(e.get('arte', ())), e.get('aparicion', 1), bool(e.get('inicial', False)),
+                         rareza, tuple(e.get('biomas', ()))))
+    return efectividades, rarezas, tuple(especies)
+
+
+def leer_catalogo(ruta=ARCHIVO_CATALOGO):
+    """Tuplas del catálogo, desde la copia precompilada si la huella del archivo coincide."""
+    with open(ruta, 'rb') as f:
+        contenido = f.read()
+    huella = hashlib.sha256(contenido).hexdigest()
+    cache = os.path.join(os.path.dirname(ruta), '__pycache__', os.path.basename(ruta) + '.marshal')
+    try:
+        with open(cache, 'rb') as f:
+            # marshal.loads sobre el archivo ya leído: marshal.load lee el archivo a trozos y es mucho más lento
+            version, huella_cache, datos = marshal.loads(f.read())
+        if version == (VERSION_CATALOGO, marshal.version) and huella_cache == huella:
+            return datos
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    datos = _catalogo_desde_json(contenido)
+    try:
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        escribir_atomico(cache, marshal.dumps(((VERSION_CATALOGO, marshal.version), huella, datos)))
+    except OSError:
+        pass  # sin permiso de escritura: se volverá a leer el JSON la próxima vez
+    return datos
+
+
+def construir_catalogo(datos):
+    """
+    Registra la tabla de tipos y crea las especies. Nombres y movimientos se internan:
+    un movimiento con el mismo nombre, poder y tipo es el mismo objeto en todas las especies.
+    Devuelve (efectividades, {rareza: factor}, {nombre: Especie}) en el orden del archivo.
+    """
+    efectividades, rarezas, especies = datos
+    for atacante, defensor, valor in efectividades:
+        registrar_efectividad(atacante, defensor, valor)
+    movimientos = {}
+    catalogo = {}
+    for nombre, tipo, ataque, defensa, hp, habilidad, movs, arte, aparicion, inicial, rareza, biomas in especies:
+        for m in movs:
+            if m not in movimientos:
+                movimientos[m] = Movimiento(sys.intern(m[0]), m[1], m[2])
+        nombre = sys.intern(nombre)
+        catalogo[nombre] = Especie(nombre, tipo, ataque, defensa, hp, sys.intern(habilidad),
+                                   tuple(movimientos[m] for m in movs), arte, aparicion, inicial,
+                                   sys.intern(rareza), tuple(sys.intern(b) for b in biomas))
+    return efectividades, dict(rarezas), catalogo
 
 
-class Wavefin(Pokemon):
-    def __init__(self):
-        movimientos = [
-            Movimiento("Surf", 35, "agua"),
-            Movimiento("Mordisco", 25, "normal")
-        ]
-        super().__init__("Wavefin", "agua", 42, 50, 40, "Nado", movimientos)
+def especie_por_nombre(nombre):
+    return REGISTRO_ESPECIES[nombre]
 
 
-class Bushbug(Pokemon):
-    def __init__(self):
-        movimientos = [
-            Movimiento("Hoja Navaja", 35, "planta"),
-            Movimiento("Picotazo", 25, "normal")
-        ]
-        super().__init__("Bushbug", "planta", 40, 45, 42, "Enjambre", movimientos)
+type_effectiveness_table, RAREZAS, REGISTRO_ESPECIES = construir_catalogo(leer_catalogo())
+ESPECIES = tuple(REGISTRO_ESPECIES.values())
+# Especies que pueden aparecer en el mapa, y las que se ofrecen al crear partida
+ESPECIES_SALVAJES = tuple(e for e in ESPECIES if e.aparicion > 0)
+ESPECIES_INICIALES = tuple(e for e in ESPECIES if e.inicial)
 
 
-class Fluffball(Pokemon):
-    def __init__(self):
-        movimientos = [
-            Movimiento("Golpe Cuerpo", 35, "normal"),
-            Movimiento("Lengüetazo", 25, "normal")
-        ]
-        super().__init__("Fluffball", "normal", 50, 45, 48, "Pelusa", movimientos)
+# -----------------------------
+# Tablas de aparición
+# -----------------------------
+class MuestreadorAlias:
+    """
+    Elige un elemento con probabilidad proporcional a su peso en O(1) por tirada
+    (método alias de Walker, construcción de Vose en O(n)). Los pesos quedan fijos:
+    si cambian se crea un muestreador nuevo.
+    """
+    __slots__ = ('elementos', 'prob', 'alias', '_prob_np', '_alias_np')
+
+    def __init__(self, elementos, pesos):
+        n = len(elementos)
+        total = float(sum(pesos))
+        if n == 0 or total <= 0:
+            raise ValueError("Hace falta al menos un elemento con peso positivo")
+        self.elementos = tuple(elementos)
+        escalados = [peso * n / total for peso in pesos]
+        prob = [1.0] * n
+        alias = list(range(n))
+        pequenos = [i for i, p in enumerate(escalados) if p < 1.0]
+        grandes = [i for i, p in enumerate(escalados) if p >= 1.0]
+        while pequenos and grandes:
+            pequeno, grande = pequenos.pop(), grandes[-1]
+            prob[pequeno] = escalados[pequeno]
+            alias[pequeno] = grande
+            escalados[grande] -= 1.0 - escalados[pequeno]
+            if escalados[grande] < 1.0:
+                pequenos.append(grandes.pop())
+        # Lo que queda (por redondeo) tiene probabilidad 1
+        self.prob = prob
+        self.alias = alias
+        self._prob_np = self._alias_np = None
+
+    def __len__(self):
+        return len(self.elementos)
+
+    def indice(self, rng=random):
+        # Un solo número al azar: la parte entera elige la columna y la fraccionaria el lado
+        u = rng.random() * len(self.prob)
+        i = int(u)
+        return i if u - i < self.prob[i] else self.alias[i]
+
+    def muestra(self, rng=random):
+        return self.elementos[self.indice(rng)]
+
+    def indices(self, k, rng=random):
+        prob, alias, n, azar = self.prob, self.alias, len(self.prob), rng.random
+        resultado = []
+        for _ in range(k):
+            u = azar() * n
+            i = int(u)
+            resultado.append(i if u - i < prob[i] else alias[i])
+        return resultado
+
+    def indices_np(self, k, generador):
+        """Como indices() pero con un generador de NumPy, devolviendo un array."""
+        if self._prob_np is None:
+            self._prob_np = np.array(self.prob)
+            self._alias_np = np.array(self.alias, dtype=np.int64)
+        u = generador.random(k) * len(self.prob)
+        i = u.astype(np.int64)
+        return np.where(u - i < self._prob_np[i], i, self._alias_np[i])
+
+
+class TablaAparicion:
+    """
+    Pesos de aparición de un conjunto de especies: peso = aparicion (o su ajuste) por
+    el factor de su rareza. Cada bioma (None = todos) tiene su MuestreadorAlias, que se
+    construye la primera vez y solo se rehace si cambia algún peso de ese bioma.
+    """
 
+    def __init__(self, especies, rarezas=None):
+        self.especies = tuple(especies)
+        self.rarezas = dict(RAREZAS if rarezas is None else rarezas)
+        self.ajustes = {}  # especie -> aparicion que sustituye a la del catálogo
+        self._muestreadores = {}
+        self.reconstrucciones = 0
+
+    def peso(self, especie):
+        return self.ajustes.get(especie, especie.aparicion) * self.rarezas.get(especie.rareza, 1.0)
+
+    def muestreador(self, bioma=None):
+        muestreador = self._muestreadores.get(bioma)
+        if muestreador is None:
+            candidatas = [e for e in self.especies if bioma is None or bioma in e.biomas]
+            pesos = [self.peso(e) for e in candidatas]
+            if not any(peso > 0 for peso in pesos):
+                raise ValueError(f"No hay especies que puedan aparecer en el bioma {bioma}")
+            muestreador = self._muestreadores[bioma] = MuestreadorAlias(candidatas, pesos)
+            self.reconstrucciones += 1
+        return muestreador
+
+    def ajustar(self, especie, aparicion):
+        """Cambia el peso de una especie; solo se rehacen los biomas donde aparece."""
+        if self.ajustes.get(especie, especie.aparicion) == aparicion:
+            return
+        self.ajustes[especie] = aparicion
+        for bioma in list(self._muestreadores):
+            if bioma is None or bioma in especie.biomas:
+                del self._muestreadores[bioma]
 
-class Rocktoise(Pokemon):
-    def __init__(self):
-        movimientos = [
-            Movimiento("Roca Afilada", 35, "normal"),
-            Movimiento("Defensa", 0, "normal")
-        ]
-        super().__init__("Rocktoise", "normal", 48, 65, 44, "Caparazón", movimientos)
+    def ajustar_rareza(self, rareza, factor):
+        if self.rarezas.get(rareza) == factor:
+            return
+        self.rarezas[rareza] = factor
+        self._muestreadores.clear()
+
+    def sortear(self, k, bioma=None, rng=random):
+        """k especies al azar (con repetición) según sus pesos."""
+        muestreador = self.muestreador(bioma)
+        return [muestreador.elementos[i] for i in muestreador.indices(k, rng)]
+
+    def colocar(self, k, tamano, bioma=None, rng=random):
+        """
+        k apariciones en celdas distintas de un mapa tamano x tamano: (xs, ys, especies).
+        Con un generador de NumPy como rng todo se sortea en bloque y xs, ys y los
+        índices de especie son arrays; si no, son listas.
+        """
+        celdas = tamano * tamano
+        if k > celdas:
+            raise ValueError(f"No caben {k} apariciones en {celdas} celdas")
+        muestreador = self.muestreador(bioma)
+        if np is not None and isinstance(rng, np.random.Generator):
+            posiciones = rng.choice(celdas, size=k, replace=False)
+            return posiciones % tamano, posiciones // tamano, muestreador.indices_np(k, rng)
+        posiciones = rng.sample(range(celdas), k)
+        especies = [muestreador.elementos[i] for i in muestreador.indices(k, rng)]
+        return [p % tamano for p in posiciones], [p // tamano for p in posiciones], especies
 
 
-class Glowfly(Pokemon):
-    def __init__(self):
-        movimientos = [
-            Movimiento("Destello", 30, "normal"),
-            Movimiento("Polvo Cegador", 0, "normal")
-        ]
-        super().__init__("Glowfly", "normal", 42, 38, 40, "Iluminación", movimientos)
+# -----------------------------
+# Plantel compacto
+# -----------------------------
+class Plantel:
+    """
+    Miles de criaturas guardadas en arrays paralelos (especie, HP y stats) en lugar
+    de un objeto por criatura. Solo admite especies del catálogo.
+    """
+    __slots__ = ('especies', '_indice_especie', 'especie', 'hp_actual', 'hp_max', 'ataque', 'defensa')
+
+    def __init__(self, especies=ESPECIES_SALVAJES):
+        self.especies = list(especies)
+        self._indice_especie = {especie: i for i, especie in enumerate(self.especies)}
+        self.especie = array('H')
+        self.hp_actual = array('H')
+        self.hp_max = array('H')
+        self.ataque = array('H')
+        self.defensa = array('H')
+
+    def __len__(self):
+        return len(self.especie)
+
+    def agregar(self, pokemon):
+        idx = self._indice_especie.get(pokemon.especie)
+        if idx is None:
+            raise ValueError(f"{pokemon.nombre} no es una especie del plantel")
+        self.especie.append(idx)
+        self.hp_actual.append(pokemon.hp_actual)
+        self.hp_max.append(pokemon.hp_max)
+        self.ataque.append(pokemon.ataque)
+        self.defensa.append(pokemon.defensa)
+        return len(self.especie) - 1
+
+    def agregar_especie(self, especie, cantidad):
+        """Añade cantidad ejemplares recién nacidos de una especie sin crear objetos."""
+        ejemplar = especie()
+        self.especie.extend([self._indice_especie[especie]] * cantidad)
+        self.hp_actual.extend([ejemplar.hp_actual] * cantidad)
+        self.hp_max.extend([ejemplar.hp_max] * cantidad)
+        self.ataque.extend([ejemplar.ataque] * cantidad)
+        self.defensa.extend([ejemplar.defensa] * cantidad)
+
+    def __getitem__(self, i):
+        """Materializa la criatura i como un Pokemon normal (una copia)."""
+        pokemon = self.especies[self.especie[i]]()
+        pokemon.hp_actual = self.hp_actual[i]
+        pokemon.hp_max = self.hp_max[i]
+        pokemon.ataque = self.ataque[i]
+        pokemon.defensa = self.defensa[i]
+        return pokemon
+
+    def __setitem__(self, i, pokemon):
+        """Guarda de vuelta el estado de una criatura materializada con plantel[i]."""
+        self.especie[i] = self._indice_especie[pokemon.especie]
+        self.hp_actual[i] = pokemon.hp_actual
+        self.hp_max[i] = pokemon.hp_max
+        self.ataque[i] = pokemon.ataque
+        self.defensa[i] = pokemon.defensa
+
+    def vivos(self):
+        return sum(1 for hp in self.hp_actual if hp > 0)
 
 
 # -----------------------------
@@ -277,57 +582,1236 @@ class Jugador:
         return False
 
 
+# -----------------------------
+# Guardado de partidas
+# -----------------------------
+def datos_pokemon(pokemon):
+    return {
+        'nombre': pokemon.nombre,
+        'tipo': pokemon.tipo,
+        'ataque': pokemon.ataque,
+        'defensa': pokemon.defensa,
+        'hp_max': pokemon.hp_max,
+        'hp_actual': pokemon.hp_actual,
+        'habilidad': pokemon.habilidad,
+        'movimientos': [{'nombre': m.nombre, 'poder': m.poder, 'tipo': m.tipo} for m in pokemon.movimientos]
+    }
+
+
+def pokemon_desde_datos(datos):
+    """Reconstruye un Pokémon guardado; las especies conocidas se buscan en REGISTRO_ESPECIES."""
+    especie = REGISTRO_ESPECIES.get(datos['nombre'])
+    if especie is not None:
+        pokemon = especie()
+    else:
+        movimientos = tuple(Movimiento(m['nombre'], m['poder'], m['tipo']) for m in datos['movimientos'])
+        pokemon = Pokemon(datos['nombre'], datos['tipo'], datos['ataque'], datos['defensa'],
+                          datos['hp_max'], datos.get('habilidad', ''), movimientos)
+    # Actualizar stats
+    pokemon.ataque = datos['ataque']
+    pokemon.defensa = datos['defensa']
+    pokemon.hp_max = datos['hp_max']
+    pokemon.hp_actual = datos['hp_actual']
+    return pokemon
+
+
+# Un codificador reutilizado: json.dumps con opciones crea uno nuevo en cada llamada
+_codificar_json = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+
+class MotorGuardado:
+    """
+    Guarda una partida en dos archivos:
+    - ruta: una línea JSON de cabecera y otra por Pokémon, reescrito de forma atómica.
+    - ruta + '.historial': un combate por línea; solo se añaden las entradas nuevas.
+    La cabecera anota cuántas entradas del historial son válidas, así que una
+    escritura interrumpida del historial nunca deja una partida inconsistente.
+
+    Tiene la misma interfaz que AlmacenPartidas (listar, guardar, cargar, borrar,
+    cerrar) pero un solo hueco: guardar reemplaza la partida que hubiera. Se elige
+    con python "pokemon IA.py" archivo RUTA; sin eso, Juego usa AlmacenPartidas y
+    este formato solo se lee para importar la partida de antes.
+    """
+
+    def __init__(self, ruta=ARCHIVO_PARTIDA):
+        self.ruta = ruta
+        self.ruta_historial = ruta + '.historial'
+        self._jugador = None          # jugador cuyo historial ya está en disco
+        self._historial_guardado = 0  # entradas ya escritas
+        self._bytes_historial = 0     # y dónde terminan
+
+    def existe(self):
+        return os.path.exists(self.ruta) or os.path.exists(ARCHIVO_PARTIDA_ANTIGUA)
+
+    def listar(self):
+        """Devuelve [(jugador, fecha de guardado)]: como mucho una partida."""
+        if os.path.exists(self.ruta):
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                nombre = json.loads(f.readline())['nombre']
+            return [(nombre, os.path.getmtime(self.ruta))]
+        jugador = self._cargar_antigua()
+        return [(jugador.nombre, os.path.getmtime(ARCHIVO_PARTIDA_ANTIGUA))] if jugador else []
+
+    def cerrar(self):
+        pass
+
+    def guardar(self, jugador):
+        historial = jugador.historial_combates
+        if jugador is not self._jugador or len(historial) < self._historial_guardado:
+            self._historial_guardado = self._bytes_historial = 0
+        nuevas = "".join([_codificar_json(entrada) + "\n"
+                          for entrada in historial[self._historial_guardado:]]).encode('utf-8')
+        with open(self.ruta_historial, 'ab') as f:
+            # Descartar lo que quedara detrás de la última entrada válida
+            f.truncate(self._bytes_historial)
+            f.write(nuevas)
+            f.flush()
+            os.fsync(f.fileno())
+
+        actual = jugador.equipo.index(jugador.pokemon_actual) if jugador.pokemon_actual in jugador.equipo else 0
+        cabecera = {'version': 2, 'nombre': jugador.nombre, 'pokemon_actual': actual, 'historial': len(historial)}
+        lineas = [cabecera] + [datos_pokemon(p) for p in jugador.equipo]
+        escribir_atomico(self.ruta, "".join(_codificar_json(linea) + "\n" for linea in lineas).encode('utf-8'))
+        self._jugador = jugador
+        self._historial_guardado = len(historial)
+        self._bytes_historial += len(nuevas)
+
+    def cargar(self, nombre=None):
+        """Devuelve el Jugador guardado (si se da nombre, solo si es ese), o None si no hay partida."""
+        if not os.path.exists(self.ruta):
+            jugador = self._cargar_antigua()
+            return jugador if jugador is None or nombre in (None, jugador.nombre) else None
+        with open(self.ruta, 'r', encoding='utf-8') as f:
+            cabecera = json.loads(f.readline())
+            if nombre is not None and cabecera['nombre'] != nombre:
+                return None
+            equipo = [pokemon_desde_datos(json.loads(linea)) for linea in f if linea.strip()]
+
+        historial = []
+        self._bytes_historial = 0
+        n = cabecera['historial']
+        if n:
+            try:
+                with open(self.ruta_historial, 'rb') as f:
+                    contenido = f.read()
+            except FileNotFoundError:
+                # Sin archivo de historial (borrado, o copiado solo el de la partida): historial vacío
+                n = 0
+        if n:
+            # Solo cuentan las n primeras líneas; lo que haya detrás es de un guardado interrumpido
+            if contenido.count(b'\n') != n or not contenido.endswith(b'\n'):
+                lineas = contenido.split(b'\n', n)
+                if len(lineas) <= n:
+                    raise ValueError(f"{self.ruta_historial} tiene menos de {n} entradas")
+                contenido = contenido[:len(contenido) - len(lineas[n])]
+            historial = json.loads(b'[' + contenido[:-1].replace(b'\n', b',') + b']')
+            self._bytes_historial = len(contenido)
+
+        jugador = self._crear_jugador(cabecera['nombre'], equipo, historial, cabecera.get('pokemon_actual', 0))
+        self._jugador = jugador
+        self._historial_guardado = len(historial)
+        return jugador
+
+    def _cargar_antigua(self):
+        # Partidas de antes de este formato: un único JSON con todo
+        if not os.path.exists(ARCHIVO_PARTIDA_ANTIGUA):
+            return None
+        with open(ARCHIVO_PARTIDA_ANTIGUA, 'r', encoding='utf-8') as f:
+            datos = json.load(f)
+        equipo = [pokemon_desde_datos(d) for d in datos['equipo']]
+        self._jugador = None
+        return self._crear_jugador(datos['nombre'], equipo, datos.get('historial_combates', []),
+                                   datos.get('pokemon_actual', 0))
+
+    @staticmethod
+    def _crear_jugador(nombre, equipo, historial, idx_actual):
+        jugador = Jugador(nombre)
+        jugador.equipo = equipo
+        jugador.historial_combates = historial
+        # Establecer pokemon actual
+        if 0 <= idx_actual < len(equipo):
+            jugador.pokemon_actual = equipo[idx_actual]
+        elif equipo:
+            jugador.pokemon_actual = equipo[0]
+        return jugador
+
+    def borrar(self, nombre=None):
+        """Borra la partida (si se da nombre, solo si es esa); devuelve False si no había ninguna."""
+        if nombre is not None and nombre not in (guardada for guardada, _ in self.listar()):
+            return False
+        borrado = False
+        for ruta in (self.ruta, self.ruta_historial, ARCHIVO_PARTIDA_ANTIGUA):
+            try:
+                os.remove(ruta)
+                borrado = True
+            except FileNotFoundError:
+                pass
+        self._jugador = None
+        return borrado
+
+
+class AlmacenPartidas:
+    """
+    Muchas partidas en una base SQLite (modo WAL: varios lectores a la vez, también
+    desde otros procesos), una por jugador. Cargar una partida es una búsqueda por
+    clave y no lee las demás; el historial de combates va en filas propias y al
+    guardar solo se insertan las entradas nuevas de esa misma partida (el Jugador que
+    se cargó o guardó aquí). Una partida nueva con el nombre de otra la reemplaza entera.
+    """
+
+    def __init__(self, ruta=ARCHIVO_PARTIDAS):
+        self.ruta = ruta
+        self.conexion = sqlite3.connect(ruta, timeout=30, isolation_level=None, check_same_thread=False)
+        # Jugador -> (entradas del historial, actualizada) de la fila tal como la dejó su
+        # último guardado o carga; si la fila ya no está así, otra partida la ha escrito
+        self._guardadas = weakref.WeakKeyDictionary()
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.executescript("""
+            CREATE TABLE IF NOT EXISTS partidas (
+                jugador TEXT PRIMARY KEY,
+                pokemon_actual INTEGER NOT NULL,
+                equipo TEXT NOT NULL,
+                historial INTEGER NOT NULL,
+                actualizada REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS historial (
+                jugador TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                entrada TEXT NOT NULL,
+                PRIMARY KEY (jugador, idx)
+            ) WITHOUT ROWID;
+        """)
+
+    def cerrar(self):
+        self.conexion.close()
+
+    def listar(self):
+        """Devuelve [(jugador, fecha de guardado)] ordenado por nombre."""
+        return self.conexion.execute("SELECT jugador, actualizada FROM partidas ORDER BY jugador").fetchall()
+
+    def guardar(self, jugador):
+        historial = jugador.historial_combates
+        actual = jugador.equipo.index(jugador.pokemon_actual) if jugador.pokemon_actual in jugador.equipo else 0
+        equipo = _codificar_json([datos_pokemon(p) for p in jugador.equipo])
+        previa = self._guardadas.get(jugador)
+        with self._transaccion():
+            fila = self.conexion.execute("SELECT historial, actualizada FROM partidas WHERE jugador = ?",
+                                         (jugador.nombre,)).fetchone()
+            if previa is None or fila != previa:
+                # Partida nueva con este nombre, u otra la guardó después: se escribe entera
+                self.conexion.execute("DELETE FROM historial WHERE jugador = ?", (jugador.nombre,))
+                guardadas = 0
+            else:
+                guardadas = previa[0]
+                if guardadas > len(historial):
+                    self.conexion.execute("DELETE FROM historial WHERE jugador = ? AND idx >= ?",
+                                          (jugador.nombre, len(historial)))
+                    guardadas = len(historial)
+            self.conexion.executemany(
+                "INSERT OR REPLACE INTO historial (jugador, idx, entrada) VALUES (?, ?, ?)",
+                ((jugador.nombre, i, historial[i]) for i in range(guardadas, len(historial))))
+            ahora = time.time()
+            self.conexion.execute(
+                "INSERT OR REPLACE INTO partidas (jugador, pokemon_actual, equipo, historial, actualizada) "
+                "VALUES (?, ?, ?, ?, ?)", (jugador.nombre, actual, equipo, len(historial), ahora))
+        self._guardadas[jugador] = (len(historial), ahora)
+
+    def cargar(self, nombre):
+        """Devuelve el Jugador guardado con ese nombre, o None."""
+        fila = self.conexion.execute(
+            "SELECT pokemon_actual, equipo, historial, actualizada FROM partidas WHERE jugador = ?",
+            (nombre,)).fetchone()
+        if fila is None:
+            return None
+        idx_actual, equipo, n, actualizada = fila
+        historial = [entrada for (entrada,) in self.conexion.execute(
+            "SELECT entrada FROM historial WHERE jugador = ? AND idx < ? ORDER BY idx", (nombre, n))]
+        jugador = MotorGuardado._crear_jugador(nombre, [pokemon_desde_datos(d) for d in json.loads(equipo)],
+                                               historial, idx_actual)
+        self._guardadas[jugador] = (n, actualizada)
+        return jugador
+
+    def borrar(self, nombre):
+        """Borra la partida de un jugador; devuelve False si no existía."""
+        with self._transaccion():
+            borradas = self.conexion.execute("DELETE FROM partidas WHERE jugador = ?", (nombre,)).rowcount
+            self.conexion.execute("DELETE FROM historial WHERE jugador = ?", (nombre,))
+        return borradas > 0
+
+    def importar(self, motor):
+        """Copia al almacén la partida de un MotorGuardado (el formato de un solo archivo)."""
+        jugador = motor.cargar()
+        if jugador is not None and self.cargar(jugador.nombre) is None:
+            self.guardar(jugador)
+        return jugador
+
+    @contextmanager
+    def _transaccion(self):
+        self.conexion.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conexion.execute("ROLLBACK")
+            raise
+        self.conexion.execute("COMMIT")
+
+
+# -----------------------------
+# Índice espacial del mapa
+# -----------------------------
+class IndiceEspacial:
+    """Celda (x, y) -> criaturas del mapa en esa celda, actualizado a medida que se mueven."""
+
+    def __init__(self):
+        self.celdas = {}
+
+    def agregar(self, criatura):
+        self.celdas.setdefault((criatura['x'], criatura['y']), []).append(criatura)
+
+    def quitar(self, criatura):
+        celda = (criatura['x'], criatura['y'])
+        ocupantes = self.celdas[celda]
+        ocupantes.remove(criatura)
+        if not ocupantes:
+            del self.celdas[celda]
+
+    def mover(self, criatura, x, y):
+        if criatura['x'] == x and criatura['y'] == y:
+            return
+        self.quitar(criatura)
+        criatura['x'] = x
+        criatura['y'] = y
+        self.agregar(criatura)
+
+    def en(self, x, y):
+        """Primera criatura en la celda (x, y), o None."""
+        ocupantes = self.celdas.get((x, y))
+        return ocupantes[0] if ocupantes else None
+
+    def emojis_por_celda(self):
+        return {celda: ocupantes[0]['emoji'] for celda, ocupantes in self.celdas.items()}
+
+
+class VistaCriatura(MutableMapping):
+    """Criatura de una PoblacionMapa vista como el dict {'x', 'y', 'pokemon', 'emoji'} de siempre."""
+    __slots__ = ('poblacion', 'i')
+
+    def __init__(self, poblacion, i):
+        self.poblacion = poblacion
+        self.i = i
+
+    def __getitem__(self, clave):
+        if clave == 'x':
+            return int(self.poblacion.xs[self.i])
+        if clave == 'y':
+            return int(self.poblacion.ys[self.i])
+        if clave == 'pokemon':
+            return self.poblacion.pokemon[self.i]
+        if clave == 'emoji':
+            return self.poblacion.emojis[self.i]
+        raise KeyError(clave)
+
+    def __setitem__(self, clave, valor):
+        if clave == 'x':
+            self.poblacion.mover(self.i, valor, self['y'])
+        elif clave == 'y':
+            self.poblacion.mover(self.i, self['x'], valor)
+        elif clave == 'pokemon':
+            self.poblacion.pokemon[self.i] = valor
+        elif clave == 'emoji':
+            self.poblacion.emojis[self.i] = valor
+        else:
+            raise KeyError(clave)
+
+    def __delitem__(self, clave):
+        raise TypeError("No se pueden borrar campos de una criatura")
+
+    def __iter__(self):
+        return iter(('x', 'y', 'pokemon', 'emoji'))
+
+    def __len__(self):
+        return 4
+
+
+class PoblacionMapa:
+    """
+    Criaturas del mapa con las coordenadas en arrays de NumPy: un paso de todas
+    ellas es una sola tirada vectorizada. Indexarla o recorrerla devuelve
+    VistaCriatura, así que el código que usaba la lista de dicts sigue funcionando.
+
+    Como IndiceEspacial, sabe qué hay en cada celda: celdas[y * tamano_mapa + x] es
+    la criatura de menor índice en esa celda (o -1), rehecho en cada paso con una
+    escritura vectorizada, así que en() es una sola lectura.
+    """
+
+    def __init__(self, xs, ys, pokemon, emojis, tamano_mapa, generador=None):
+        self.xs = np.asarray(xs, dtype=np.int64)
+        self.ys = np.asarray(ys, dtype=np.int64)
+        self.pokemon = list(pokemon)
+        self.emojis = list(emojis)
+        self.tamano_mapa = tamano_mapa
+        self.generador = generador or np.random.default_rng(random.getrandbits(64))
+        self.celdas = np.full(tamano_mapa * tamano_mapa, -1, dtype=np.int32)
+        # Al revés: si varias comparten celda se queda la de menor índice, como el barrido de antes
+        self._orden = np.arange(len(self.pokemon) - 1, -1, -1, dtype=np.int32)
+        self._claves = None
+        self._indexar()
+
+    def _indexar(self):
+        claves = self.ys * self.tamano_mapa + self.xs
+        if self._claves is None or self.celdas.size <= 32 * len(self):
+            self.celdas.fill(-1)
+        else:
+            self.celdas[self._claves] = -1  # mapa poco poblado: solo las celdas ocupadas antes
+        self.celdas[claves[::-1]] = self._orden
+        self._claves = claves
+
+    def mover(self, i, x, y):
+        """Pone la criatura i en (x, y) y rehace las dos celdas afectadas."""
+        celdas = {int(self._claves[i]), y * self.tamano_mapa + x}
+        self.xs[i] = x
+        self.ys[i] = y
+        self._claves[i] = y * self.tamano_mapa + x
+        for clave in celdas:
+            ocupantes = np.flatnonzero(self._claves == clave)
+            self.celdas[clave] = ocupantes[0] if ocupantes.size else -1
+
+    def __len__(self):
+        return len(self.pokemon)
+
+    def __getitem__(self, i):
+        if not -len(self) <= i < len(self):
+            raise IndexError(i)
+        return VistaCriatura(self, i % len(self))
+
+    def __iter__(self):
+        return (VistaCriatura(self, i) for i in range(len(self)))
+
+    def paso_aleatorio(self, tamano_mapa):
+        """Cada criatura se mueve -1, 0 o +1 en cada eje, sin salir del mapa."""
+        desplazamientos = self.generador.integers(-1, 2, size=(2, len(self)))
+        np.clip(self.xs + desplazamientos[0], 0, tamano_mapa - 1, out=self.xs)
+        np.clip(self.ys + desplazamientos[1], 0, tamano_mapa - 1, out=self.ys)
+        self._indexar()
+
+    def en(self, x, y):
+        """Primera criatura en la celda (x, y), o None."""
+        if not (0 <= x < self.tamano_mapa and 0 <= y < self.tamano_mapa):
+            return None
+        i = self.celdas[y * self.tamano_mapa + x]
+        return VistaCriatura(self, int(i)) if i >= 0 else None
+
+    def emojis_por_celda(self):
+        # Solo se recorren las celdas ocupadas, no todas las criaturas
+        ocupadas = np.flatnonzero(self.celdas >= 0)
+        t = self.tamano_mapa
+        return {(clave % t, clave // t): self.emojis[i]
+                for clave, i in zip(ocupadas.tolist(), self.celdas[ocupadas].tolist())}
+
+
+# -----------------------------
+# Mundo por trozos
+# -----------------------------
+TAMANO_TROZO = 16
+ARCHIVO_MUNDO = 'mundo.db'
+# Cómo se dibuja una celda vacía según el bioma del trozo
+SUELO_BIOMA = {'pradera': "· ", 'bosque': "♣ ", 'costa': "≈ ", 'volcan': "^ ", 'cueva': ": "}
+
+
+class Trozo:
+    """
+    Celdas TAMANO_TROZO x TAMANO_TROZO del mundo con sus salvajes: posición local,
+    especie y HP en columnas paralelas. sucio indica que ha cambiado desde que se
+    generó o se leyó del disco.
+    """
+    __slots__ = ('cx', 'cy', 'bioma', 'xs', 'ys', 'especies', 'hp', 'sucio')
+
+    def __init__(self, cx, cy, bioma, xs, ys, especies, hp):
+        self.cx = cx
+        self.cy = cy
+        self.bioma = bioma
+        self.xs = array('B', xs)
+        self.ys = array('B', ys)
+        self.especies = list(especies)
+        self.hp = array('H', hp)
+        self.sucio = False
+
+    def criatura_en(self, x, y):
+        """Índice del salvaje en la celda local (x, y), o None."""
+        for i in range(len(self.especies)):
+            if self.xs[i] == x and self.ys[i] == y:
+                return i
+        return None
+
+    def pokemon(self, i):
+        """Materializa el salvaje i como un Pokemon con su HP actual."""
+        pokemon = self.especies[i]()
+        pokemon.hp_actual = self.hp[i]
+        return pokemon
+
+    def quitar(self, i):
+        for columna in (self.xs, self.ys, self.especies, self.hp):
+            del columna[i]
+        self.sucio = True
+
+    def paso_aleatorio(self, rng=random):
+        """Cada salvaje se mueve -1, 0 o +1 en cada eje sin salir de su trozo."""
+        limite = TAMANO_TROZO - 1
+        for i in range(len(self.especies)):
+            self.xs[i] = max(0, min(limite, self.xs[i] + rng.randint(-1, 1)))
+            self.ys[i] = max(0, min(limite, self.ys[i] + rng.randint(-1, 1)))
+        if self.especies:
+            self.sucio = True
+
+    def codificar(self):
+        return marshal.dumps((self.bioma, self.xs.tobytes(), self.ys.tobytes(),
+                              tuple(e.nombre for e in self.especies), self.hp.tobytes()))
+
+    @classmethod
+    def decodificar(cls, cx, cy, datos):
+        bioma, xs, ys, nombres, hp = marshal.loads(datos)
+        hp_array = array('H')
+        hp_array.frombytes(hp)
+        return cls(cx, cy, bioma, xs, ys, [REGISTRO_ESPECIES[n] for n in nombres], hp_array)
+
+
+class MundoTrozos:
+    """
+    Mundo sin bordes hecho de trozos. Un trozo se genera la primera vez que hace falta,
+    siempre igual para la misma (semilla, cx, cy), y queda en una caché LRU de como
+    mucho max_trozos. Al salir de la caché, si cambió (salvajes derrotados o movidos)
+    se escribe en una base SQLite; si no, se descarta y se volverá a generar igual.
+    """
+
+    def __init__(self, ruta=ARCHIVO_MUNDO, semilla=None, max_trozos=64, tabla_aparicion=None,
+                 salvajes_por_trozo=(0, 6)):
+        self.ruta = ruta
+        self.max_trozos = max_trozos
+        self.tabla_aparicion = tabla_aparicion or TablaAparicion(ESPECIES_SALVAJES)
+        self.biomas = sorted({b for e in self.tabla_aparicion.especies for b in e.biomas})
+        self.salvajes_por_trozo = salvajes_por_trozo
+        self.trozos = OrderedDict()
+        self.generados = self.leidos = self.escritos = 0
+        self.conexion = sqlite3.connect(ruta, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.executescript("""
+            CREATE TABLE IF NOT EXISTS mundo (
+                clave TEXT PRIMARY KEY,
+                valor TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS trozos (
+                cx INTEGER NOT NULL,
+                cy INTEGER NOT NULL,
+                datos BLOB NOT NULL,
+                PRIMARY KEY (cx, cy)
+            ) WITHOUT ROWID;
+        """)
+        # Un mundo ya creado conserva su semilla y la posición del jugador
+        meta = dict(self.conexion.execute("SELECT clave, valor FROM mundo"))
+        if 'semilla' in meta:
+            self.semilla = int(meta['semilla'])
+        else:
+            self.semilla = random.getrandbits(63) if semilla is None else semilla
+            self.conexion.execute("INSERT INTO mundo (clave, valor) VALUES ('semilla', ?)", (str(self.semilla),))
+        self.posicion = tuple(json.loads(meta.get('posicion', '[0, 0]')))
+
+    def cerrar(self):
+        self.guardar()
+        self.conexion.close()
+
+    def generar(self, cx, cy):
+        """El trozo (cx, cy) tal como nace: solo depende de la semilla y de sus coordenadas."""
+        rng = random.Random(f"{self.semilla}:{cx}:{cy}")
+        bioma = rng.choice(self.biomas)
+        xs, ys, especies = self.tabla_aparicion.colocar(rng.randint(*self.salvajes_por_trozo), TAMANO_TROZO,
+                                                        bioma, rng)
+        self.generados += 1
+        return Trozo(cx, cy, bioma, xs, ys, especies, [e.hp for e in especies])
+
+    def trozo(self, cx, cy):
+        trozo = self.trozos.get((cx, cy))
+        if trozo is not None:
+            self.trozos.move_to_end((cx, cy))
+            return trozo
+        fila = self.conexion.execute("SELECT datos FROM trozos WHERE cx = ? AND cy = ?", (cx, cy)).fetchone()
+        if fila is not None:
+            trozo = Trozo.decodificar(cx, cy, fila[0])
+            self.leidos += 1
+        else:
+            trozo = self.generar(cx, cy)
+        self.trozos[(cx, cy)] = trozo
+        while len(self.trozos) > self.max_trozos:
+            _, viejo = self.trozos.popitem(last=False)
+            if viejo.sucio:
+                self._escribir([viejo])
+        return trozo
+
+    def _escribir(self, trozos):
+        self.conexion.executemany("INSERT OR REPLACE INTO trozos (cx, cy, datos) VALUES (?, ?, ?)",
+                                  ((t.cx, t.cy, t.codificar()) for t in trozos))
+        for trozo in trozos:
+            trozo.sucio = False
+        self.escritos += len(trozos)
+
+    def guardar(self):
+        """Escribe los trozos cambiados y la posición del jugador en una sola transacción."""
+        self.conexion.execute("BEGIN IMMEDIATE")
+        try:
+            self._escribir([t for t in self.trozos.values() if t.sucio])
+            self.conexion.execute("INSERT OR REPLACE INTO mundo (clave, valor) VALUES ('posicion', ?)",
+                                  (json.dumps(list(self.posicion)),))
+        except BaseException:
+            self.conexion.execute("ROLLBACK")
+            raise
+        self.conexion.execute("COMMIT")
+
+    def trozos_en(self, x0, y0, ancho, alto):
+        """Trozos que cubren el rectángulo de celdas [x0, x0 + ancho) x [y0, y0 + alto)."""
+        return [self.trozo(cx, cy)
+                for cy in range(y0 // TAMANO_TROZO, (y0 + alto - 1) // TAMANO_TROZO + 1)
+                for cx in range(x0 // TAMANO_TROZO, (x0 + ancho - 1) // TAMANO_TROZO + 1)]
+
+    def en(self, x, y):
+        """(trozo, índice) del salvaje en la celda global (x, y), o None."""
+        trozo = self.trozo(x // TAMANO_TROZO, y // TAMANO_TROZO)
+        i = trozo.criatura_en(x % TAMANO_TROZO, y % TAMANO_TROZO)
+        return None if i is None else (trozo, i)
+
+    def paso_salvajes(self, x0, y0, ancho, alto, rng=random):
+        """Mueve solo a los salvajes de los trozos visibles; el resto del mundo queda quieto."""
+        for trozo in self.trozos_en(x0, y0, ancho, alto):
+            trozo.paso_aleatorio(rng)
+
+    def vista(self, x0, y0, ancho, alto):
+        """Celdas de texto del rectángulo visible, leyendo solo los trozos que lo cubren."""
+        celdas = []
+        suelos = {}
+        for y in range(y0, y0 + alto):
+            fila = []
+            for x in range(x0, x0 + ancho):
+                clave = (x // TAMANO_TROZO, y // TAMANO_TROZO)
+                suelo = suelos.get(clave)
+                if suelo is None:
+                    suelo = suelos[clave] = SUELO_BIOMA.get(self.trozo(*clave).bioma, "· ")
+                fila.append(suelo)
+            celdas.append(fila)
+        for trozo in self.trozos_en(x0, y0, ancho, alto):
+            base_x, base_y = trozo.cx * TAMANO_TROZO - x0, trozo.cy * TAMANO_TROZO - y0
+            for x, y in zip(trozo.xs, trozo.ys):
+                if 0 <= base_x + x < ancho and 0 <= base_y + y < alto:
+                    celdas[base_y + y][base_x + x] = "🐾"
+        return celdas
+
+
+# -----------------------------
+# Renderizado por diferencias
+# -----------------------------
+_ANCHOS = {}
+
+
+def ancho_en_pantalla(texto):
+    """Columnas que ocupa un texto en la terminal (emojis y caracteres anchos ocupan 2)."""
+    ancho = _ANCHOS.get(texto)
+    if ancho is None:
+        ancho = ultimo = 0
+        for caracter in texto:
+            if caracter == '\ufe0f':
+                # Selector de presentación emoji: '❤' ocupa 1 columna, '❤️' ocupa 2
+                if ultimo == 1:
+                    ancho += 1
+                    ultimo = 2
+                continue
+            if unicodedata.combining(caracter) or caracter == '\u200d':
+                continue
+            ultimo = 2 if unicodedata.east_asian_width(caracter) in ('W', 'F') else 1
+            ancho += ultimo
+        _ANCHOS[texto] = ancho
+    return ancho
+
+
+class RenderizadorTerminal:
+    """
+    Dibuja fotogramas (listas de filas, cada fila una lista de celdas de texto) y
+    recuerda el anterior: solo reescribe las celdas que cambiaron, moviendo el cursor
+    con secuencias ANSI. Redibuja todo la primera vez, tras invalidar(), si cambia
+    el tamaño de la terminal o si el fotograma no cabe en ella (una fila partida en dos
+    desplazaría las de debajo y las posiciones del diff ya no serían las de la pantalla).
+    Las columnas se cuentan con ancho_en_pantalla; una fila en la que alguna celda
+    cambia de ancho se reescribe entera.
+    """
+
+    def __init__(self, salida=None):
+        self.salida = salida
+        self.anterior = None
+        self.anchos = None  # ancho en pantalla de cada fila de anterior
+        self.tamano_terminal = None
+        if os.name == 'nt':
+            os.system('')  # activa las secuencias ANSI en la consola de Windows
+
+    def invalidar(self):
+        self.anterior = None
+
+    def limpiar(self):
+        (self.salida or sys.stdout).write("\x1b[H\x1b[2J")
+        self.invalidar()
+
+    def dibujar(self, filas):
+        salida = self.salida or sys.stdout
+        filas = [tuple(fila) for fila in filas]
+        tamano = shutil.get_terminal_size()
+        anterior = self.anterior
+        completo = (anterior is None or len(anterior) != len(filas) or tamano != self.tamano_terminal
+                    or len(filas) >= tamano.lines)
+        if not completo:
+            partes = []
+            anchos = list(self.anchos)
+            for y, (fila, fila_anterior) in enumerate(zip(filas, anterior)):
+                if fila == fila_anterior:
+                    continue
+                if len(fila) != len(fila_anterior):
+                    anchos[y] = sum(map(ancho_en_pantalla, fila))
+                    partes.append(f"\x1b[{y + 1};1H{''.join(fila)}\x1b[K")
+                    continue
+                columna = 1
+                pendiente = None  # columna donde empieza el tramo de celdas cambiadas
+                trozos = []
+                for celda, celda_anterior in zip(fila, fila_anterior):
+                    ancho_anterior = ancho_en_pantalla(celda_anterior)
+                    if celda != celda_anterior:
+                        if ancho_en_pantalla(celda) != ancho_anterior:
+                            # Una celda que cambia de ancho mueve las de detrás: se reescribe la fila
+                            trozos = None
+                            break
+                        if pendiente is None:
+                            pendiente = columna
+                            trozos.append(f"\x1b[{y + 1};{columna}H")
+                        trozos.append(celda)
+                    else:
+                        pendiente = None
+                    columna += ancho_anterior
+                if trozos is None:
+                    anchos[y] = sum(map(ancho_en_pantalla, fila))
+                    partes.append(f"\x1b[{y + 1};1H{''.join(fila)}\x1b[K")
+                else:
+                    partes.extend(trozos)  # mismas columnas que antes: el ancho de la fila no cambia
+            # Cursor bajo el fotograma y borrar lo que quedó de la entrada anterior
+            partes.append(f"\x1b[{len(filas) + 1};1H\x1b[J")
+            completo = max(anchos, default=0) > tamano.columns
+        if completo:
+            anchos = [sum(map(ancho_en_pantalla, fila)) for fila in filas]
+            partes = ["\x1b[H\x1b[2J", "\n".join("".join(fila) for fila in filas), "\n"]
+        salida.write("".join(partes))
+        salida.flush()
+        self.anterior = filas
+        self.anchos = anchos
+        self.tamano_terminal = tamano
+
+
+# -----------------------------
+# Motor de combate y repeticiones
+# -----------------------------
+EVENTO_ATAQUE = ord('J')   # el jugador usa el movimiento valor
+EVENTO_SALVAJE = ord('S')  # el salvaje usa el movimiento valor
+EVENTO_CAMBIO = ord('C')   # el jugador saca al Pokémon valor del equipo
+EVENTO_HUIDA = ord('H')
+
+_CABECERA_COMBATE = struct.Struct('<2sBQ')  # 'CB', versión, semilla
+_STATS_COMBATE = struct.Struct('<4H')       # ataque, defensa, hp_max, hp_actual
+_LONGITUD = struct.Struct('<I')
+_TEXTO = struct.Struct('<H')
+VERSION_COMBATE = 2  # la 1 no guardaba tipo, habilidad ni movimientos: solo se repite con el catálogo
+MAX_BYTES_COMBATES = 8 * 1024 * 1024
+
+
+class MotorCombate:
+    """
+    Reglas de un combate contra un salvaje sin entrada ni pantalla. Todas las tiradas
+    salen de un generador propio sembrado con semilla, y cada decisión (movimientos,
+    cambios, huida) se anota en eventos, así que el combate se puede repetir exacto.
+    La política del salvaje usa un segundo generador para que al repetir baste con
+    los movimientos anotados.
+    """
+
+    def __init__(self, jugador, salvaje, semilla=None, politica_salvaje=None):
+        self.jugador = jugador
+        self.salvaje = salvaje
+        self.semilla = random.getrandbits(64) if semilla is None else semilla
+        self.rng = random.Random(self.semilla)
+        self.rng_politica = random.Random(self.semilla ^ 0x5A17)
+        self.politica_salvaje = politica_salvaje or politica_aleatoria
+        self.eventos = bytearray()
+        self.inicial = self.estado()
+        # Tipo, habilidad y movimientos de cada uno: con ellos la repetición no necesita el catálogo
+        self.fichas = _ficha(salvaje), [_ficha(p) for p in jugador.equipo]
+
+    def estado(self):
+        """(salvaje, equipo, índice del activo) con las stats de cada Pokémon."""
+        def stats(p):
+            return p.nombre, p.ataque, p.defensa, p.hp_max, p.hp_actual
+        equipo = self.jugador.equipo
+        activo = equipo.index(self.jugador.pokemon_actual) if self.jugador.pokemon_actual in equipo else 0
+        return stats(self.salvaje), [stats(p) for p in equipo], activo
+
+    def atacar(self, idx):
+        self.eventos += bytes((EVENTO_ATAQUE, idx))
+        return self.jugador.pokemon_actual.cuackatacar(idx, self.salvaje, self.rng)
+
+    def elegir_movimiento_salvaje(self):
+        return self.politica_salvaje(self.salvaje, self.jugador.pokemon_actual, self.rng_politica)
+
+    def atacar_salvaje(self, idx):
+        self.eventos += bytes((EVENTO_SALVAJE, idx))
+        return self.salvaje.cuackatacar(idx, self.jugador.pokemon_actual, self.rng)
+
+    def cambiar(self, idx):
+        self.eventos += bytes((EVENTO_CAMBIO, idx))
+        self.jugador.pokemon_actual = self.jugador.equipo[idx]
+
+    def huir(self):
+        self.eventos += bytes((EVENTO_HUIDA, 0))
+
+    def codificar(self):
+        """El combate como registro binario: semilla, estado inicial, eventos y estado final."""
+        salvaje, equipo, activo = self.inicial
+        ficha_salvaje, fichas_equipo = self.fichas
+        partes = [_CABECERA_COMBATE.pack(b'CB', VERSION_COMBATE, self.semilla),
+                  _codificar_stats(salvaje, ficha_salvaje), bytes((len(equipo),))]
+        partes += [_codificar_stats(p, ficha) for p, ficha in zip(equipo, fichas_equipo)]
+        partes += [bytes((activo,)), _LONGITUD.pack(len(self.eventos) // 2), bytes(self.eventos)]
+        salvaje, equipo, activo = self.estado()
+        partes += [struct.pack(f'<{1 + len(equipo)}HB', salvaje[4], *(p[4] for p in equipo), activo)]
+        return b''.join(partes)
+
+
+def _ficha(pokemon):
+    """(tipo, habilidad, movimientos): lo que no cambia durante el combate."""
+    return pokemon.tipo, pokemon.habilidad or '', tuple(pokemon.movimientos)
+
+
+def _codificar_texto(texto):
+    texto = texto.encode('utf-8')
+    return _TEXTO.pack(len(texto)) + texto
+
+
+def _decodificar_texto(datos, pos):
+    largo = _TEXTO.unpack_from(datos, pos)[0]
+    pos += _TEXTO.size
+    return datos[pos:pos + largo].decode('utf-8'), pos + largo
+
+
+def _codificar_stats(stats, ficha):
+    return _codificar_texto(stats[0]) + _STATS_COMBATE.pack(*stats[1:]) + _codificar_ficha(ficha)
+
+
+@lru_cache(maxsize=1024)
+def _codificar_ficha(ficha):
+    # Va como un bloque con su longitud: se repite mucho y así se codifica y decodifica una vez
+    tipo, habilidad, movimientos = ficha
+    partes = [_codificar_texto(tipo), _codificar_texto(habilidad), bytes((len(movimientos),))]
+    for movimiento in movimientos:
+        partes += [_codificar_texto(movimiento.nombre), _TEXTO.pack(movimiento.poder),
+                   _codificar_texto(movimiento.tipo)]
+    bloque = b''.join(partes)
+    return _TEXTO.pack(len(bloque)) + bloque
+
+
+@lru_cache(maxsize=1024)
+def _decodificar_ficha(datos):
+    tipo, pos = _decodificar_texto(datos, 0)
+    habilidad, pos = _decodificar_texto(datos, pos)
+    n_movimientos, pos = datos[pos], pos + 1
+    movimientos = []
+    for _ in range(n_movimientos):
+        nombre, pos = _decodificar_texto(datos, pos)
+        poder = _TEXTO.unpack_from(datos, pos)[0]
+        tipo_movimiento, pos = _decodificar_texto(datos, pos + _TEXTO.size)
+        movimientos.append(Movimiento(nombre, poder, tipo_movimiento))
+    return tipo, habilidad, tuple(movimientos)
+
+
+def _decodificar_stats(datos, pos, version):
+    """(stats, ficha, pos); la ficha es None en registros de la versión 1."""
+    if version == 1:
+        largo = datos[pos]
+        nombre = datos[pos + 1:pos + 1 + largo].decode('utf-8')
+        pos += 1 + largo
+        return (nombre,) + _STATS_COMBATE.unpack_from(datos, pos), None, pos + _STATS_COMBATE.size
+    nombre, pos = _decodificar_texto(datos, pos)
+    stats = (nombre,) + _STATS_COMBATE.unpack_from(datos, pos)
+    pos += _STATS_COMBATE.size
+    largo = _TEXTO.unpack_from(datos, pos)[0]
+    pos += _TEXTO.size
+    return stats, _decodificar_ficha(bytes(datos[pos:pos + largo])), pos + largo
+
+
+def decodificar_combate(datos):
+    """
+    Registro binario -> dict con semilla, estado inicial, eventos [(tipo, valor)] y estado
+    final. 'fichas' trae (ficha del salvaje, fichas del equipo), o None en la versión 1.
+    """
+    marca, version, semilla = _CABECERA_COMBATE.unpack_from(datos, 0)
+    if marca != b'CB' or version not in (1, VERSION_COMBATE):
+        raise ValueError("Registro de combate desconocido")
+    salvaje, ficha_salvaje, pos = _decodificar_stats(datos, _CABECERA_COMBATE.size, version)
+    n_equipo, pos = datos[pos], pos + 1
+    equipo, fichas_equipo = [], []
+    for _ in range(n_equipo):
+        stats, ficha, pos = _decodificar_stats(datos, pos, version)
+        equipo.append(stats)
+        fichas_equipo.append(ficha)
+    activo = datos[pos]
+    n_eventos = _LONGITUD.unpack_from(datos, pos + 1)[0]
+    pos += 1 + _LONGITUD.size
+    eventos = [(datos[i], datos[i + 1]) for i in range(pos, pos + 2 * n_eventos, 2)]
+    pos += 2 * n_eventos
+    final = struct.unpack_from(f'<{1 + len(equipo)}HB', datos, pos)
+    return {'semilla': semilla, 'salvaje': salvaje, 'equipo': equipo, 'activo': activo,
+            'fichas': None if version == 1 else (ficha_salvaje, fichas_equipo),
+            'eventos': eventos, 'final': (final[0], list(final[1:-1]), final[-1])}
+
+
+def _pokemon_de_registro(stats, ficha=None):
+    nombre, ataque, defensa, hp_max, hp_actual = stats
+    especie = REGISTRO_ESPECIES.get(nombre)
+    if ficha is not None:
+        # Con la ficha anotada no hace falta el catálogo (ni que siga igual que en el combate)
+        tipo, habilidad, movimientos = ficha
+        pokemon = Pokemon(nombre, tipo, ataque, defensa, hp_max, habilidad, movimientos, especie)
+    elif especie is None:
+        raise ValueError(f"No se puede repetir un combate con {nombre}: especie desconocida")
+    else:
+        pokemon = especie()
+    pokemon.ataque, pokemon.defensa, pokemon.hp_max, pokemon.hp_actual = ataque, defensa, hp_max, hp_actual
+    return pokemon
+
+
+def repetir_combate(registro):
+    """Repite un combate decodificado sin entrada ni pausas. Devuelve el MotorCombate al terminar."""
+    jugador = Jugador("repeticion")
+    ficha_salvaje, fichas_equipo = registro.get('fichas') or (None, [None] * len(registro['equipo']))
+    for stats, ficha in zip(registro['equipo'], fichas_equipo):
+        jugador.equipo.append(_pokemon_de_registro(stats, ficha))
+    if jugador.equipo:
+        jugador.pokemon_actual = jugador.equipo[registro['activo']]
+    motor = MotorCombate(jugador, _pokemon_de_registro(registro['salvaje'], ficha_salvaje), registro['semilla'])
+    motor.inicial = (registro['salvaje'], registro['equipo'], registro['activo'])
+    for tipo, valor in registro['eventos']:
+        if tipo == EVENTO_ATAQUE:
+            motor.atacar(valor)
+        elif tipo == EVENTO_SALVAJE:
+            motor.atacar_salvaje(valor)
+        elif tipo == EVENTO_CAMBIO:
+            motor.cambiar(valor)
+        elif tipo == EVENTO_HUIDA:
+            motor.huir()
+    return motor
+
+
+def verificar_combate(registro):
+    """True si repetir el combate lleva exactamente al estado final anotado."""
+    salvaje, equipo, activo = repetir_combate(registro).estado()
+    return (salvaje[4], [p[4] for p in equipo], activo) == registro['final']
+
+
+def ruta_combates(almacen=None):
+    """El registro de combates va junto a las partidas del almacén (o al archivo por defecto)."""
+    ruta = getattr(almacen, 'ruta', ARCHIVO_PARTIDAS)
+    return os.path.join(os.path.dirname(ruta), ARCHIVO_COMBATES)
+
+
+class RegistroCombates:
+    """
+    Archivo con un registro binario por combate, cada uno precedido de su longitud.
+    Cuando pasaría de max_bytes se renombra a ruta + '.1' (sustituyendo al anterior) y
+    se empieza uno nuevo, así que en disco nunca hay más de unas 2 * max_bytes.
+    """
+
+    def __init__(self, ruta=None, max_bytes=MAX_BYTES_COMBATES):
+        self.ruta = ruta_combates() if ruta is None else ruta
+        self.ruta_anterior = self.ruta + '.1'
+        self.max_bytes = max_bytes
+
+    def anotar(self, motor):
+        datos = motor.codificar()
+        datos = _LONGITUD.pack(len(datos)) + datos
+        tamano = os.path.getsize(self.ruta) if os.path.exists(self.ruta) else 0
+        if tamano and tamano + len(datos) > self.max_bytes:
+            os.replace(self.ruta, self.ruta_anterior)
+        with open(self.ruta, 'ab') as f:
+            f.write(datos)
+
+    def leer(self):
+        """Recorre los combates anotados (primero los rotados) uno a uno sin cargar los archivos enteros."""
+        for ruta in (self.ruta_anterior, self.ruta):
+            if os.path.exists(ruta):
+                yield from self._leer_archivo(ruta)
+
+    @staticmethod
+    def _leer_archivo(ruta):
+        with open(ruta, 'rb') as f:
+            while True:
+                cabecera = f.read(_LONGITUD.size)
+                if len(cabecera) < _LONGITUD.size:
+                    return
+                largo = _LONGITUD.unpack(cabecera)[0]
+                datos = f.read(largo)
+                if len(datos) < largo:
+                    return  # último registro a medio escribir
+                yield decodificar_combate(datos)
+
+    def verificar(self):
+        """Repite todos los combates anotados. Devuelve (correctos, fallidos)."""
+        correctos = fallidos = 0
+        for registro in self.leer():
+            if verificar_combate(registro):
+                correctos += 1
+            else:
+                fallidos += 1
+        return correctos, fallidos
+
+
+# -----------------------------
+# Ritmo y entrada
+# -----------------------------
+MODOS_RITMO = ('interactivo', 'rapido', 'guion')
+
+
+class Ritmo:
+    """
+    Pausas y lectura de órdenes del juego. En modo 'interactivo' se esperan las pausas
+    y se lee del teclado como siempre; en 'rapido' se saltan las pausas; en 'guion'
+    tampoco hay pausas y las respuestas salen de un archivo (una por línea) o de
+    cualquier iterable de cadenas, mostrándolas tras el mensaje como si se tecleasen.
+    """
+
+    def __init__(self, modo='interactivo', guion=None):
+        if modo not in MODOS_RITMO:
+            raise ValueError(f"Modo de ritmo desconocido: {modo}")
+        if modo == 'guion' and guion is None:
+            raise ValueError("El modo 'guion' necesita un archivo o una lista de respuestas")
+        self.modo = modo
+        self._respuestas = None
+        if modo == 'guion':
+            if isinstance(guion, str):
+                with open(guion, encoding='utf-8') as f:
+                    guion = f.read().splitlines()
+            self._respuestas = iter(guion)
+
+    def pausa(self, segundos):
+        if self.modo == 'interactivo':
+            time.sleep(segundos)
+
+    def leer(self, mensaje=""):
+        if self._respuestas is None:
+            return input(mensaje)
+        respuesta = next(self._respuestas, None)
+        if respuesta is None:
+            raise EOFError("El guion no tiene más respuestas")
+        print(f"{mensaje}{respuesta}")
+        return respuesta
+
+
 # -----------------------------
 # Juego
 # -----------------------------
+class Encuentro:
+    """
+    Un combate contra el salvaje que devolvió Juego.paso(), sin entrada ni salida: cada
+    acción aplica las reglas (por MotorCombate), anota el historial y devuelve las líneas
+    que hay que mostrar. fase dice qué espera ahora: 'turno' (luchar, estado o huir),
+    'salvaje' (el movimiento del salvaje), 'cambio' (otro Pokémon) o 'fin'. Al terminar
+    anota el combate y deja el mapa como tras_encuentro(). Lo usan la terminal (Juego)
+    y el servidor (SesionJuego), que solo difieren en cómo leen y muestran.
+    """
+
+    def __init__(self, juego, salvaje):
+        self.juego = juego
+        self.jugador = juego.jugador
+        self.salvaje = salvaje
+        self.motor = MotorCombate(self.jugador, salvaje, politica_salvaje=juego.politica_salvaje)
+        self.fase = 'turno'
+        self.lineas_inicio = [f"¡Un {salvaje.nombre} salvaje apareció!"]
+        if not (self.jugador.pokemon_actual and self.jugador.pokemon_actual.hp_actual > 0):
+            self.lineas_inicio.append("Tu equipo no puede luchar.")
+            self.terminar()
+
+    def atacar(self, idx):
+        """Movimiento idx del Pokémon activo (ya validado por quien llama)."""
+        propio = self.jugador.pokemon_actual
+        lineas = [f"{propio.nombre} usa {propio.movimientos[idx].nombre}!", self.motor.atacar(idx)]
+        if self.salvaje.hp_actual <= 0:
+            self.jugador.historial_combates.append(f"Victoria contra {self.salvaje.nombre}")
+            lineas.append(f"¡{self.salvaje.nombre} salvaje fue derrotado!")
+            self.terminar()
+        else:
+            self.fase = 'salvaje'
+        return lineas
+
+    def turno_salvaje(self, idx=None):
+        """Responde el salvaje con el movimiento idx (por defecto, el que elija su política)."""
+        if idx is None:
+            idx = self.motor.elegir_movimiento_salvaje()
+        propio = self.jugador.pokemon_actual
+        lineas = [f"{self.salvaje.nombre} salvaje usa {self.salvaje.movimientos[idx].nombre}!",
+                  self.motor.atacar_salvaje(idx)]
+        self.fase = 'turno'
+        if propio.hp_actual <= 0:
+            lineas.append(f"¡Tu {propio.nombre} fue derrotado!")
+            self.jugador.historial_combates.append(f"Derrota contra {self.salvaje.nombre}")
+            if any(p.hp_actual > 0 for p in self.jugador.equipo):
+                self.fase = 'cambio'
+            else:
+                lineas.append("¡Todos tus Pokémon fueron derrotados!")
+                self.terminar()
+        return lineas
+
+    def cambiar(self, idx):
+        """Saca al Pokémon idx del equipo; si no es válido o está debilitado, al primero vivo."""
+        equipo = self.jugador.equipo
+        self.fase = 'turno'
+        if idx is not None and 0 <= idx < len(equipo) and equipo[idx].hp_actual > 0:
+            self.motor.cambiar(idx)
+            return f"¡Adelante {self.jugador.pokemon_actual.nombre}!"
+        self.motor.cambiar(next(i for i, p in enumerate(equipo) if p.hp_actual > 0))
+        return f"Se seleccionó automáticamente a {self.jugador.pokemon_actual.nombre}."
+
+    def huir(self):
+        self.motor.huir()
+        self.jugador.historial_combates.append(f"Huiste de {self.salvaje.nombre}")
+        self.terminar()
+        return "Lograste huir del combate"
+
+    def terminar(self):
+        """Cierra el combate (una sola vez, también si se corta a medias)."""
+        if self.fase == 'fin':
+            return
+        self.fase = 'fin'
+        if self.juego.registro_combates is not None:
+            self.juego.registro_combates.anotar(self.motor)
+        self.juego.tras_encuentro(self.salvaje)
+
+
 class Juego:
-    def __init__(self):
+    def __init__(self, tamano_mapa=15, num_salvajes=5, politica_salvaje=None, ritmo=None, mundo=None,
+                 almacen=None):
         self.jugador = None
-        # Guardamos clases (no instancias) para crear nuevos salvajes cada vez
-        self.pokemon_salvajes = [Sparkit, Wavefin, Bushbug, Fluffball,
-                                 Rocktoise, Glowfly, Flameragon, Aquatle, Leafox, Normie]
+        # Pausas y entrada (ver Ritmo); por defecto, las de siempre
+        self.ritmo = ritmo or Ritmo()
+        # Cómo elige movimiento el salvaje (ver politica_aleatoria y PoliticaExpectimax)
+        self.politica_salvaje = politica_salvaje or politica_aleatoria
+        # Especies del catálogo (no instancias) para crear nuevos salvajes cada vez;
+        # cada una sale con probabilidad proporcional a su peso en tabla_aparicion
+        self.pokemon_salvajes = list(ESPECIES_SALVAJES)
+        self.tabla_aparicion = TablaAparicion(self.pokemon_salvajes)
+        self.bioma = None  # None: cualquier especie salvaje
         self.mapa = []
-        self.tamano_mapa = 15
-        self.posicion_jugador = [7, 7]
+        self.tamano_mapa = tamano_mapa
+        self.num_salvajes = num_salvajes
+        self.posicion_jugador = [tamano_mapa // 2, tamano_mapa // 2]
         self.pokemon_en_mapa = []
-        self.inicializar_mapa()
+        self.indice = IndiceEspacial()
+        # Con NumPy las posiciones van en una PoblacionMapa, que hace también de índice
+        self.vectorizado = np is not None
+        self.renderizador = RenderizadorTerminal()
+        # Dónde se guardan las partidas: AlmacenPartidas si no se elige otro (p. ej. MotorGuardado)
+        self._almacen = almacen
+        self.registro_combates = RegistroCombates(ruta_combates(almacen))
+        # Con un MundoTrozos el mapa no tiene bordes y tamano_mapa es solo la ventana visible
+        self.mundo = mundo
+        if mundo is not None:
+            self.posicion_jugador = list(mundo.posicion)
+        else:
+            self.inicializar_mapa()
+
+    @property
+    def almacen(self):
+        # Se abre al usarlo por primera vez; una partida del formato de un solo archivo se importa
+        if self._almacen is None:
+            self._almacen = AlmacenPartidas()
+            if not self._almacen.listar() and MotorGuardado().existe():
+                self._almacen.importar(MotorGuardado())
+        return self._almacen
+
+    def limpiar_pantalla(self):
+        sys.stdout.flush()
+        self.renderizador.limpiar()
 
     def inicializar_mapa(self):
         # Re-crear mapa y colocar pokémon frescos
         self.mapa = [['.' for _ in range(self.tamano_mapa)] for _ in range(self.tamano_mapa)]
-        self.pokemon_en_mapa = []
-        for _ in range(5):
-            x = random.randint(0, self.tamano_mapa - 1)
-            y = random.randint(0, self.tamano_mapa - 1)
-            pokemon_cls = random.choice(self.pokemon_salvajes)
-            pokemon = pokemon_cls()  # instancia nueva
-            self.pokemon_en_mapa.append({'x': x, 'y': y, 'pokemon': pokemon, 'emoji': '🐾'})
-
-    def mostrar_mapa(self):
-        os.system('cls' if os.name == 'nt' else 'clear')
-        print("╔" + "═" * (self.tamano_mapa * 2 - 1) + "╗")
+        # Cada salvaje en una celda distinta
+        cantidad = min(self.num_salvajes, self.tamano_mapa * self.tamano_mapa)
+        if self.vectorizado:
+            generador = np.random.default_rng(random.getrandbits(64))
+            xs, ys, indices = self.tabla_aparicion.colocar(cantidad, self.tamano_mapa, self.bioma, generador)
+            especies = self.tabla_aparicion.muestreador(self.bioma).elementos
+            pokemon = [especies[i]() for i in indices.tolist()]
+            self.indice = PoblacionMapa(xs, ys, pokemon, ['🐾'] * cantidad, self.tamano_mapa, generador)
+            self.pokemon_en_mapa = self.indice
+            return
 
+        self.pokemon_en_mapa = []
+        self.indice = IndiceEspacial()
+        for x, y, especie in zip(*self.tabla_aparicion.colocar(cantidad, self.tamano_mapa, self.bioma)):
+            pokemon = especie()  # instancia nueva
+            criatura = {'x': x, 'y': y, 'pokemon': pokemon, 'emoji': '🐾'}
+            self.pokemon_en_mapa.append(criatura)
+            self.indice.agregar(criatura)
+
+    def sortear_salvajes(self, k):
+        """k especies del bioma actual al azar, según tabla_aparicion."""
+        return self.tabla_aparicion.sortear(k, self.bioma)
+
+    def filas_mapa(self):
+        """Fotograma del mapa como filas de celdas (marco incluido), en O(celdas + criaturas)."""
+        jugador_x, jugador_y = self.posicion_jugador
+        filas = [["╔" + "═" * (self.tamano_mapa * 2 - 1) + "╗"]]
+        if self.mundo is not None:
+            # Ventana centrada en el jugador
+            mitad = self.tamano_mapa // 2
+            celdas = self.mundo.vista(jugador_x - mitad, jugador_y - mitad, self.tamano_mapa, self.tamano_mapa)
+            celdas[mitad][mitad] = "😀"
+            for celdas_fila in celdas:
+                filas.append(["║"] + celdas_fila + ["║"])
+            filas.append(["╚" + "═" * (self.tamano_mapa * 2 - 1) + "╝"])
+            return filas
+        emojis = self.indice.emojis_por_celda()
         for y in range(self.tamano_mapa):
-            linea = "║"
+            fila = ["║"]
             for x in range(self.tamano_mapa):
-                if x == self.posicion_jugador[0] and y == self.posicion_jugador[1]:
-                    linea += "😀"
+                if x == jugador_x and y == jugador_y:
+                    fila.append("😀")
                 else:
-                    emoji_encontrado = False
-                    for pokemon in self.pokemon_en_mapa:
-                        if pokemon['x'] == x and pokemon['y'] == y:
-                            linea += pokemon['emoji']
-                            emoji_encontrado = True
-                            break
-                    if not emoji_encontrado:
-                        linea += "· "
-            linea += "║"
-            print(linea)
+                    fila.append(emojis.get((x, y), "· "))
+            fila.append("║")
+            filas.append(fila)
+        filas.append(["╚" + "═" * (self.tamano_mapa * 2 - 1) + "╝"])
+        return filas
 
-        print("╚" + "═" * (self.tamano_mapa * 2 - 1) + "╝")
-        print("WASD - mover   E - Estado equipo   H - Historial   V - Volver   G - Guardar")
+    def lineas_mapa(self):
+        return ["".join(fila) for fila in self.filas_mapa()]
+
+    def mostrar_mapa(self):
+        filas = self.filas_mapa()
+        filas.append(["WASD - mover   E - Estado equipo   H - Historial   V - Volver   G - Guardar"])
+        self.renderizador.dibujar(filas)
 
     def mover_jugador(self, direccion):
+        movido, salvaje = self.paso(direccion)
+        if salvaje is not None:
+            # Lanzar combate con la instancia específica (al acabar, Encuentro llama a tras_encuentro)
+            self.combate(salvaje)
+        return movido
+
+    def paso(self, direccion):
+        """
+        Mueve al jugador y a los salvajes sin mostrar nada. Devuelve (movido, Pokémon
+        salvaje encontrado o None); el combate (un Encuentro) queda para quien llama.
+        """
+        if self.mundo is not None:
+            return self._paso_en_mundo(direccion)
         x, y = self.posicion_jugador
 
         if direccion == 'w' and y > 0:
@@ -339,41 +1823,97 @@ class Juego:
         elif direccion == 'd' and x < self.tamano_mapa - 1:
             x += 1
         else:
-            return False
+            return False, None
+
+        self.posicion_jugador = [x, y]
 
+        self.mover_salvajes()
+
+        # Verificar encuentro con Pokémon salvaje
+        pokemon_dict = self.indice.en(x, y)
+        return True, (pokemon_dict['pokemon'] if pokemon_dict else None)
+
+    def _paso_en_mundo(self, direccion):
+        desplazamiento = {'w': (0, -1), 's': (0, 1), 'a': (-1, 0), 'd': (1, 0)}.get(direccion)
+        if desplazamiento is None:
+            return False, None
+        x = self.posicion_jugador[0] + desplazamiento[0]
+        y = self.posicion_jugador[1] + desplazamiento[1]
         self.posicion_jugador = [x, y]
+        self.mundo.posicion = (x, y)
+
+        mitad = self.tamano_mapa // 2
+        self.mundo.paso_salvajes(x - mitad, y - mitad, self.tamano_mapa, self.tamano_mapa)
+
+        self._encuentro = self.mundo.en(x, y)
+        if self._encuentro is None:
+            return True, None
+        trozo, i = self._encuentro
+        return True, trozo.pokemon(i)
+
+    def tras_encuentro(self, salvaje):
+        """Actualiza el mapa después del combate con el salvaje que devolvió paso()."""
+        if self.mundo is None:
+            # Después del combate, reiniciamos el mapa (según petición)
+            self.inicializar_mapa()
+            return
+        # El mundo se conserva: el salvaje derrotado desaparece y el resto sigue donde estaba
+        trozo, i = self._encuentro
+        if salvaje.hp_actual <= 0:
+            trozo.quitar(i)
+        else:
+            trozo.hp[i] = salvaje.hp_actual
+            trozo.sucio = True
 
+    def mover_salvajes(self):
         # Mover Pokémon en el mapa aleatoriamente
+        if self.vectorizado:
+            self.indice.paso_aleatorio(self.tamano_mapa)
+            return
+        limite = self.tamano_mapa - 1
         for pokemon in self.pokemon_en_mapa:
             mov_x = random.choice([-1, 0, 1])
             mov_y = random.choice([-1, 0, 1])
-            nuevo_x = max(0, min(self.tamano_mapa - 1, pokemon['x'] + mov_x))
-            nuevo_y = max(0, min(self.tamano_mapa - 1, pokemon['y'] + mov_y))
-            pokemon['x'] = nuevo_x
-            pokemon['y'] = nuevo_y
-
-        # Verificar encuentro con Pokémon salvaje
-        for pokemon_dict in list(self.pokemon_en_mapa):
-            if pokemon_dict['x'] == x and pokemon_dict['y'] == y:
-                # Lanzar combate con la instancia específica
-                self.combate(pokemon_dict['pokemon'])
-                # Después del combate, reiniciamos el mapa (según petición)
-                self.inicializar_mapa()
-                return True
-
-        return True
+            nuevo_x = max(0, min(limite, pokemon['x'] + mov_x))
+            nuevo_y = max(0, min(limite, pokemon['y'] + mov_y))
+            self.indice.mover(pokemon, nuevo_x, nuevo_y)
 
     def combate(self, pokemon_salvaje):
-        os.system('cls' if os.name == 'nt' else 'clear')
-        print(f"¡Un {pokemon_salvaje.nombre} salvaje apareció!")
+        self.limpiar_pantalla()
+        encuentro = Encuentro(self, pokemon_salvaje)
+        print("\n".join(encuentro.lineas_inicio))
         pokemon_salvaje.mostrar_ascii()
-        time.sleep(1)
-
-        # Bucle de combate
-        while self.jugador.pokemon_actual and self.jugador.pokemon_actual.hp_actual > 0 and pokemon_salvaje.hp_actual > 0:
-            os.system('cls' if os.name == 'nt' else 'clear')
-            print(f"Tu {self.jugador.pokemon_actual.nombre}: {self.jugador.pokemon_actual.hp_actual}/{self.jugador.pokemon_actual.hp_max} HP")
-            self.jugador.pokemon_actual.mostrar_ascii()
+        self.ritmo.pausa(1)
+        try:
+            self._bucle_combate(encuentro)
+        finally:
+            encuentro.terminar()
+
+    def _mostrar(self, lineas, segundos):
+        print("\n" + "\n".join(lineas))
+        self.ritmo.pausa(segundos)
+
+    def _bucle_combate(self, encuentro):
+        pokemon_salvaje = encuentro.salvaje
+        # Bucle de combate: las reglas las aplica encuentro, aquí solo se lee y se muestra
+        while encuentro.fase != 'fin':
+            propio = self.jugador.pokemon_actual
+            if encuentro.fase == 'cambio':
+                print("\nElige otro Pokémon:")
+                for i, p in enumerate(self.jugador.equipo):
+                    estado = "💀" if p.hp_actual <= 0 else "❤️"
+                    print(f"{i+1}. {p.nombre} {estado} {p.hp_actual}/{p.hp_max} HP")
+                try:
+                    pokemon_opcion = int(self.ritmo.leer("> ")) - 1
+                except ValueError:
+                    pokemon_opcion = None
+                # Si la entrada no es válida se saca automáticamente al primero vivo
+                self._mostrar([encuentro.cambiar(pokemon_opcion)], 1)
+                continue
+
+            self.limpiar_pantalla()
+            print(f"Tu {propio.nombre}: {propio.hp_actual}/{propio.hp_max} HP")
+            propio.mostrar_ascii()
             print(f"{pokemon_salvaje.nombre} salvaje: {pokemon_salvaje.hp_actual}/{pokemon_salvaje.hp_max} HP")
             pokemon_salvaje.mostrar_ascii()
 
@@ -382,90 +1922,39 @@ class Juego:
             print("2. Estado")
             print("3. Huir")
 
-            opcion = input("> ")
+            opcion = self.ritmo.leer("> ")
 
             if opcion == "1":
                 print("\nElige un movimiento:")
-                for i, movimiento in enumerate(self.jugador.pokemon_actual.movimientos):
+                for i, movimiento in enumerate(propio.movimientos):
                     print(f"{i+1}. {movimiento.nombre} ({movimiento.tipo})")
 
                 try:
-                    mov_opcion = int(input("> ")) - 1
-                    if 0 <= mov_opcion < len(self.jugador.pokemon_actual.movimientos):
-                        print(f"\n{self.jugador.pokemon_actual.nombre} usa {self.jugador.pokemon_actual.movimientos[mov_opcion].nombre}!")
-                        resultado = self.jugador.pokemon_actual.cuackatacar(mov_opcion, pokemon_salvaje)
-                        print(resultado)
-                    else:
-                        print("\nMovimiento no válido")
-                        time.sleep(1)
-                        continue
+                    mov_opcion = int(self.ritmo.leer("> ")) - 1
                 except ValueError:
-                    print("\nOpción no válida")
-                    time.sleep(1)
+                    self._mostrar(["Opción no válida"], 1)
+                    continue
+                if not 0 <= mov_opcion < len(propio.movimientos):
+                    self._mostrar(["Movimiento no válido"], 1)
                     continue
 
-                if pokemon_salvaje.hp_actual <= 0:
-                    print(f"\n¡{pokemon_salvaje.nombre} salvaje fue derrotado!")
-                    self.jugador.historial_combates.append(f"Victoria contra {pokemon_salvaje.nombre}")
-                    time.sleep(2)
-                    break
-
-                # Turno del Pokémon salvaje
-                mov_salvaje = random.randint(0, len(pokemon_salvaje.movimientos) - 1)
-                print(f"\n{pokemon_salvaje.nombre} salvaje usa {pokemon_salvaje.movimientos[mov_salvaje].nombre}!")
-                resultado = pokemon_salvaje.cuackatacar(mov_salvaje, self.jugador.pokemon_actual)
-                print(resultado)
-
-                if self.jugador.pokemon_actual.hp_actual <= 0:
-                    print(f"\n¡Tu {self.jugador.pokemon_actual.nombre} fue derrotado!")
-                    self.jugador.historial_combates.append(f"Derrota contra {pokemon_salvaje.nombre}")
-
-                    # Verificar si hay más Pokémon en el equipo
-                    pokemon_vivos = [p for p in self.jugador.equipo if p.hp_actual > 0]
-                    if pokemon_vivos:
-                        print("\nElige otro Pokémon:")
-                        for i, p in enumerate(self.jugador.equipo):
-                            estado = "💀" if p.hp_actual <= 0 else "❤️"
-                            print(f"{i+1}. {p.nombre} {estado} {p.hp_actual}/{p.hp_max} HP")
-
-                        try:
-                            pokemon_opcion = int(input("> ")) - 1
-                            if 0 <= pokemon_opcion < len(self.jugador.equipo) and self.jugador.equipo[pokemon_opcion].hp_actual > 0:
-                                self.jugador.pokemon_actual = self.jugador.equipo[pokemon_opcion]
-                                print(f"\n¡Adelante {self.jugador.pokemon_actual.nombre}!")
-                                time.sleep(1)
-                            else:
-                                # Si entrada inválida, seleccionar el primero vivo automáticamente
-                                self.jugador.pokemon_actual = pokemon_vivos[0]
-                                print(f"\nSe seleccionó automáticamente a {self.jugador.pokemon_actual.nombre}.")
-                                time.sleep(1)
-                        except ValueError:
-                            self.jugador.pokemon_actual = pokemon_vivos[0]
-                            print(f"\nSe seleccionó automáticamente a {self.jugador.pokemon_actual.nombre}.")
-                            time.sleep(1)
-                    else:
-                        print("\n¡Todos tus Pokémon fueron derrotados!")
-                        time.sleep(2)
-                        break
-
-                time.sleep(2)
+                lineas = encuentro.atacar(mov_opcion)
+                if encuentro.fase == 'salvaje':
+                    lineas += encuentro.turno_salvaje()
+                self._mostrar(lineas, 2)
 
             elif opcion == "2":
                 self.mostrar_estado_combate()
-                input("\nPresiona Enter para continuar...")
+                self.ritmo.leer("\nPresiona Enter para continuar...")
 
             elif opcion == "3":
-                print("\nLograste huir del combate")
-                self.jugador.historial_combates.append(f"Huiste de {pokemon_salvaje.nombre}")
-                time.sleep(1)
-                break
+                self._mostrar([encuentro.huir()], 1)
 
             else:
-                print("\nOpción no válida")
-                time.sleep(1)
+                self._mostrar(["Opción no válida"], 1)
 
     def mostrar_estado_equipo(self):
-        os.system('cls' if os.name == 'nt' else 'clear')
+        self.limpiar_pantalla()
         print(f"Estado del equipo de {self.jugador.nombre}:")
         print()
         for i, pokemon in enumerate(self.jugador.equipo):
@@ -475,10 +1964,10 @@ class Juego:
             print(f"   Movimientos: {', '.join([m.nombre for m in pokemon.movimientos])}")
             pokemon.mostrar_ascii()
             print()
-        input("\nPresiona Enter para continuar...")
+        self.ritmo.leer("\nPresiona Enter para continuar...")
 
     def mostrar_estado_combate(self):
-        os.system('cls' if os.name == 'nt' else 'clear')
+        self.limpiar_pantalla()
         if not self.jugador.pokemon_actual:
             print("No tienes un Pokémon activo.")
             return
@@ -492,154 +1981,87 @@ class Juego:
             print(f"  - {movimiento.nombre} ({movimiento.tipo}, Poder: {movimiento.poder})")
 
     def mostrar_historial(self):
-        os.system('cls' if os.name == 'nt' else 'clear')
+        self.limpiar_pantalla()
         print("Historial de combates:")
         if not self.jugador.historial_combates:
             print("No hay combates registrados")
         else:
             for i, combate in enumerate(self.jugador.historial_combates, 1):
                 print(f"{i}. {combate}")
-        input("\nPresiona Enter para continuar...")
+        self.ritmo.leer("\nPresiona Enter para continuar...")
 
     def guardar_partida(self):
-        datos = {
-            'nombre': self.jugador.nombre,
-            'equipo': [],
-            'pokemon_actual': 0,
-            'historial_combates': self.jugador.historial_combates
-        }
-
-        for i, pokemon in enumerate(self.jugador.equipo):
-            if pokemon == self.jugador.pokemon_actual:
-                datos['pokemon_actual'] = i
-
-            pokemon_data = {
-                'nombre': pokemon.nombre,
-                'tipo': pokemon.tipo,
-                'ataque': pokemon.ataque,
-                'defensa': pokemon.defensa,
-                'hp_max': pokemon.hp_max,
-                'hp_actual': pokemon.hp_actual,
-                'habilidad': pokemon.habilidad,
-                'movimientos': []
-            }
-
-            for movimiento in pokemon.movimientos:
-                pokemon_data['movimientos'].append({
-                    'nombre': movimiento.nombre,
-                    'poder': movimiento.poder,
-                    'tipo': movimiento.tipo
-                })
-
-            datos['equipo'].append(pokemon_data)
-
-        with open('partida_guardada.json', 'w', encoding='utf-8') as f:
-            json.dump(datos, f, ensure_ascii=False, indent=2)
-
+        self.almacen.guardar(self.jugador)
+        if self.mundo is not None:
+            self.mundo.guardar()
         print("Partida guardada correctamente")
-        time.sleep(1)
+        self.ritmo.pausa(1)
 
-    def cargar_partida(self):
+    def elegir_partida(self):
+        """Muestra las partidas guardadas y devuelve el nombre elegido, o None."""
+        partidas = self.almacen.listar()
+        if not partidas:
+            print("No hay partida guardada")
+            self.ritmo.pausa(1)
+            return None
+        print("\nPartidas guardadas:")
+        for i, (nombre, fecha) in enumerate(partidas, 1):
+            print(f"{i}. {nombre} ({time.strftime('%d/%m/%Y %H:%M', time.localtime(fecha))})")
         try:
-            with open('partida_guardada.json', 'r', encoding='utf-8') as f:
-                datos = json.load(f)
-
-            self.jugador = Jugador(datos['nombre'])
-            self.jugador.historial_combates = datos.get('historial_combates', [])
-
-            for pokemon_data in datos['equipo']:
-                movimientos = []
-                for mov_data in pokemon_data['movimientos']:
-                    movimientos.append(Movimiento(mov_data['nombre'], mov_data['poder'], mov_data['tipo']))
-
-                # Determinar la clase correcta del Pokémon
-                nombre = pokemon_data['nombre']
-                if nombre == "Flameragon":
-                    pokemon = Flameragon()
-                elif nombre == "Aquatle":
-                    pokemon = Aquatle()
-                elif nombre == "Leafox":
-                    pokemon = Leafox()
-                elif nombre == "Normie":
-                    pokemon = Normie()
-                elif nombre == "Sparkit":
-                    pokemon = Sparkit()
-                elif nombre == "Wavefin":
-                    pokemon = Wavefin()
-                elif nombre == "Bushbug":
-                    pokemon = Bushbug()
-                elif nombre == "Fluffball":
-                    pokemon = Fluffball()
-                elif nombre == "Rocktoise":
-                    pokemon = Rocktoise()
-                elif nombre == "Glowfly":
-                    pokemon = Glowfly()
-                else:
-                    pokemon = Pokemon(pokemon_data['nombre'], pokemon_data['tipo'],
-                                      pokemon_data['ataque'], pokemon_data['defensa'],
-                                      pokemon_data['hp_max'], pokemon_data.get('habilidad', ''), movimientos)
-
-                # Actualizar stats
-                pokemon.ataque = pokemon_data['ataque']
-                pokemon.defensa = pokemon_data['defensa']
-                pokemon.hp_max = pokemon_data['hp_max']
-                pokemon.hp_actual = pokemon_data['hp_actual']
-
-                self.jugador.equipo.append(pokemon)
-
-            # Establecer pokemon actual
-            idx_actual = datos.get('pokemon_actual', 0)
-            if 0 <= idx_actual < len(self.jugador.equipo):
-                self.jugador.pokemon_actual = self.jugador.equipo[idx_actual]
-            elif self.jugador.equipo:
-                self.jugador.pokemon_actual = self.jugador.equipo[0]
-
-            print("Partida cargada correctamente")
-            time.sleep(1)
-            return True
-
-        except FileNotFoundError:
+            idx = int(self.ritmo.leer("> ")) - 1
+        except ValueError:
+            idx = -1
+        if not 0 <= idx < len(partidas):
+            print("Opción no válida")
+            self.ritmo.pausa(1)
+            return None
+        return partidas[idx][0]
+
+    def cargar_partida(self, nombre=None):
+        if nombre is None:
+            nombre = self.elegir_partida()
+            if nombre is None:
+                return False
+        jugador = self.almacen.cargar(nombre)
+        if jugador is None:
             print("No hay partida guardada")
-            time.sleep(1)
+            self.ritmo.pausa(1)
             return False
+        self.jugador = jugador
+        print("Partida cargada correctamente")
+        self.ritmo.pausa(1)
+        return True
 
     def crear_partida(self):
-        os.system('cls' if os.name == 'nt' else 'clear')
-        nombre = input("Ingresa tu nombre: ")
+        self.limpiar_pantalla()
+        nombre = self.ritmo.leer("Ingresa tu nombre: ")
         self.jugador = Jugador(nombre)
 
         print("\nElige tu Pokémon inicial:")
-        print("1. Flameragon (Tipo fuego)")
-        print("2. Aquatle (Tipo agua)")
-        print("3. Leafox (Tipo planta)")
+        for i, especie in enumerate(ESPECIES_INICIALES, 1):
+            print(f"{i}. {especie.nombre} (Tipo {especie.tipo})")
 
         while True:
-            opcion = input("> ")
-            if opcion == "1":
-                self.jugador.agregar_pokemon(Flameragon())
-                break
-            elif opcion == "2":
-                self.jugador.agregar_pokemon(Aquatle())
-                break
-            elif opcion == "3":
-                self.jugador.agregar_pokemon(Leafox())
+            opcion = self.ritmo.leer("> ")
+            if opcion.isdigit() and 1 <= int(opcion) <= len(ESPECIES_INICIALES):
+                self.jugador.agregar_pokemon(ESPECIES_INICIALES[int(opcion) - 1]())
                 break
             else:
                 print("Opción no válida")
 
         print(f"\n¡Felicidades {nombre}! Has recibido un {self.jugador.pokemon_actual.nombre}")
-        time.sleep(2)
+        self.ritmo.pausa(2)
 
     def menu_principal(self):
         while True:
-            os.system('cls' if os.name == 'nt' else 'clear')
+            self.limpiar_pantalla()
             print("=== MENÚ PRINCIPAL ===")
             print("1. Crear partida")
             print("2. Continuar partida")
             print("3. Borrar partida")
             print("4. Salir")
 
-            opcion = input("> ")
+            opcion = self.ritmo.leer("> ")
 
             if opcion == "1":
                 self.crear_partida()
@@ -648,24 +2070,22 @@ class Juego:
                 if self.cargar_partida():
                     self.explorar()
             elif opcion == "3":
-                try:
-                    os.remove('partida_guardada.json')
+                nombre = self.elegir_partida()
+                if nombre is not None:
+                    self.almacen.borrar(nombre)
                     print("Partida borrada")
-                    time.sleep(1)
-                except FileNotFoundError:
-                    print("No hay partida guardada")
-                    time.sleep(1)
+                    self.ritmo.pausa(1)
             elif opcion == "4":
                 print("¡Hasta pronto!")
                 break
             else:
                 print("Opción no válida")
-                time.sleep(1)
+                self.ritmo.pausa(1)
 
     def explorar(self):
         while True:
             self.mostrar_mapa()
-            comando = input("> ").lower()
+            comando = self.ritmo.leer("> ").lower()
 
             if comando in ['w', 'a', 's', 'd']:
                 self.mover_jugador(comando)
@@ -680,7 +2100,1862 @@ class Juego:
                     self.guardar_partida()
             else:
                 print("Comando no válido")
-                time.sleep(1)
+                self.ritmo.pausa(1)
+
+
+# -----------------------------
+# Simulador sin interfaz
+# -----------------------------
+# Las políticas reciben (pokemon, oponente, rng) y devuelven el índice del movimiento.
+def politica_aleatoria(pokemon, oponente, rng):
+    """La misma elección uniforme que usa el Pokémon salvaje en Juego.combate."""
+    return rng.randint(0, len(pokemon.movimientos) - 1)
+
+
+def politica_mas_fuerte(pokemon, oponente, rng):
+    """Elige siempre el movimiento con más poder esperado (poder * STAB)."""
+    mejor_idx, mejor_valor = 0, -1.0
+    for i, movimiento in enumerate(pokemon.movimientos):
+        stab = 1.5 if movimiento.tipo_id == pokemon.tipo_id else 1.0
+        if movimiento.poder * stab > mejor_valor:
+            mejor_idx, mejor_valor = i, movimiento.poder * stab
+    return mejor_idx
+
+
+class EstadisticasEnfrentamiento:
+    """Resultados acumulados de muchos combates entre dos especies."""
+
+    def __init__(self, especie_a, especie_b):
+        self.especie_a = especie_a
+        self.especie_b = especie_b
+        self.victorias_a = 0
+        self.victorias_b = 0
+        self.empates = 0
+        self.turnos_totales = 0
+        self.danios_a = Counter()  # daño efectivo por golpe de A -> veces
+        self.danios_b = Counter()
+
+    @property
+    def combates(self):
+        return self.victorias_a + self.victorias_b + self.empates
+
+    @property
+    def tasa_victoria_a(self):
+        return self.victorias_a / self.combates if self.combates else 0.0
+
+    @property
+    def turnos_promedio(self):
+        return self.turnos_totales / self.combates if self.combates else 0.0
+
+    def combinar(self, otra):
+        self.victorias_a += otra.victorias_a
+        self.victorias_b += otra.victorias_b
+        self.empates += otra.empates
+        self.turnos_totales += otra.turnos_totales
+        self.danios_a.update(otra.danios_a)
+        self.danios_b.update(otra.danios_b)
+        return self
+
+
+def simular_combate(pokemon_a, pokemon_b, politica_a=politica_aleatoria, politica_b=politica_aleatoria,
+                    rng=random, max_turnos=500, danios_a=None, danios_b=None):
+    """
+    Combate sin entrada ni pausas con las reglas de Juego.combate: A ataca primero
+    (como el jugador) y B responde si sigue en pie. Un turno es un intercambio completo.
+    Devuelve (ganador, turnos) con ganador 'a', 'b' o None si se agotan los turnos.
+    Si se pasan Counters en danios_a/danios_b, acumula el daño efectivo de cada golpe.
+    """
+    turnos = 0
+    while turnos < max_turnos:
+        turnos += 1
+        hp_previo = pokemon_b.hp_actual
+        pokemon_a.cuackatacar(politica_a(pokemon_a, pokemon_b, rng), pokemon_b, rng)
+        if danios_a is not None:
+            danios_a[hp_previo - pokemon_b.hp_actual] += 1
+        if pokemon_b.hp_actual <= 0:
+            return 'a', turnos
+
+        hp_previo = pokemon_a.hp_actual
+        pokemon_b.cuackatacar(politica_b(pokemon_b, pokemon_a, rng), pokemon_a, rng)
+        if danios_b is not None:
+            danios_b[hp_previo - pokemon_a.hp_actual] += 1
+        if pokemon_a.hp_actual <= 0:
+            return 'b', turnos
+    return None, turnos
+
+
+def simular_combate_tabla(pokemon_a, pokemon_b, politica_a=politica_aleatoria, politica_b=politica_aleatoria,
+                          rng=random, max_turnos=500, danios_a=None, danios_b=None):
+    """
+    simular_combate con los golpes sacados de tabla_danio en lugar de pasar por
+    cuackatacar. Consume el generador exactamente igual (política y después la tirada
+    1-10 de atacar()), así que con la misma semilla da el mismo combate.
+    """
+    golpes_a = golpes_por_efecto(pokemon_a, pokemon_b)
+    golpes_b = golpes_por_efecto(pokemon_b, pokemon_a)
+    randint = rng.randint
+    turnos = 0
+    while turnos < max_turnos:
+        turnos += 1
+        danio = golpes_a[politica_a(pokemon_a, pokemon_b, rng)][randint(1, 10) - 1]
+        hp_previo = pokemon_b.hp_actual
+        pokemon_b.hp_actual = max(0, hp_previo - danio)
+        if danios_a is not None:
+            danios_a[hp_previo - pokemon_b.hp_actual] += 1
+        if pokemon_b.hp_actual <= 0:
+            return 'a', turnos
+
+        danio = golpes_b[politica_b(pokemon_b, pokemon_a, rng)][randint(1, 10) - 1]
+        hp_previo = pokemon_a.hp_actual
+        pokemon_a.hp_actual = max(0, hp_previo - danio)
+        if danios_b is not None:
+            danios_b[hp_previo - pokemon_a.hp_actual] += 1
+        if pokemon_a.hp_actual <= 0:
+            return 'b', turnos
+    return None, turnos
+
+
+def simular_enfrentamiento(especie_a, especie_b, n, semilla=0, politica_a=politica_aleatoria,
+                           politica_b=politica_aleatoria, rng=None, motor=simular_combate_tabla):
+    """Simula n combates entre dos especies reutilizando las mismas instancias."""
+    if rng is None:
+        # Semilla propia por pareja: el resultado no depende del resto de la matriz
+        rng = random.Random(f"{semilla}:{especie_a.nombre}:{especie_b.nombre}")
+    a, b = especie_a(), especie_b()
+    stats = EstadisticasEnfrentamiento(a.nombre, b.nombre)
+    for _ in range(n):
+        a.hp_actual = a.hp_max
+        b.hp_actual = b.hp_max
+        ganador, turnos = motor(a, b, politica_a, politica_b, rng,
+                                danios_a=stats.danios_a, danios_b=stats.danios_b)
+        if ganador == 'a':
+            stats.victorias_a += 1
+        elif ganador == 'b':
+            stats.victorias_b += 1
+        else:
+            stats.empates += 1
+        stats.turnos_totales += turnos
+    return stats
+
+
+def simular_matriz(especies=ESPECIES_SALVAJES, n=1000, semilla=0,
+                   politica_a=politica_aleatoria, politica_b=politica_aleatoria):
+    """Simula todas las parejas (a, b) de especies. Devuelve {(nombre_a, nombre_b): estadísticas}."""
+    resultados = {}
+    for especie_a in especies:
+        for especie_b in especies:
+            stats = simular_enfrentamiento(especie_a, especie_b, n, semilla, politica_a, politica_b)
+            resultados[(stats.especie_a, stats.especie_b)] = stats
+    return resultados
+
+
+def resumen_danios(danios):
+    """Devuelve (media, mediana, máximo) de una distribución de daño {daño: veces}."""
+    total = sum(danios.values())
+    if not total:
+        return 0.0, 0, 0
+    media = sum(d * veces for d, veces in danios.items()) / total
+    acumulado = 0
+    for d in sorted(danios):
+        acumulado += danios[d]
+        if acumulado * 2 >= total:
+            return media, d, max(danios)
+
+
+def mostrar_reporte_simulacion(resultados):
+    nombres = list(dict.fromkeys(a for a, _ in resultados))
+    print("% de victorias de la fila (ataca primero) contra la columna")
+    print(" " * 11 + "".join(f"{n[:9]:>10}" for n in nombres))
+    for a in nombres:
+        fila = "".join(f"{resultados[(a, b)].tasa_victoria_a * 100:>9.1f}%" for b in nombres)
+        print(f"{a:<11}{fila}")
+    print()
+    print(f"{'Enfrentamiento':<24}{'turnos':>8}{'daño A (media/med/máx)':>26}{'daño B (media/med/máx)':>26}")
+    for (a, b), stats in resultados.items():
+        ma, pa, xa = resumen_danios(stats.danios_a)
+        mb, pb, xb = resumen_danios(stats.danios_b)
+        print(f"{a + ' vs ' + b:<24}{stats.turnos_promedio:>8.2f}"
+              f"{f'{ma:.1f}/{pa}/{xa}':>26}{f'{mb:.1f}/{pb}/{xb}':>26}")
+
+
+def benchmark_simulador(n=2000):
+    inicio = time.perf_counter()
+    resultados = simular_matriz(n=n, semilla=1)
+    duracion = time.perf_counter() - inicio
+    total = sum(stats.combates for stats in resultados.values())
+    print(f"Simulador: {total} combates en {duracion:.2f}s ({total / duracion:,.0f} combates/s)")
+
+
+# -----------------------------
+# Motor vectorizado (NumPy)
+# -----------------------------
+def tablas_vectorizadas(especies=ESPECIES_SALVAJES):
+    """Estadísticas, tipos y movimientos de cada especie como arrays indexados por especie."""
+    if np is None:
+        raise RuntimeError("El motor vectorizado necesita NumPy (pip install numpy)")
+    ejemplares = [especie() for especie in especies]
+    max_movs = max(len(p.movimientos) for p in ejemplares)
+    poder = np.zeros((len(ejemplares), max_movs), dtype=np.int64)
+    tipo_mov = np.zeros((len(ejemplares), max_movs), dtype=np.int64)
+    for i, p in enumerate(ejemplares):
+        for j, m in enumerate(p.movimientos):
+            poder[i, j] = m.poder
+            tipo_mov[i, j] = m.tipo_id
+    tipo = np.array([p.tipo_id for p in ejemplares])
+    stab = np.where(tipo_mov == tipo[:, None], 1.5, 1.0)
+    return {
+        'nombres': [p.nombre for p in ejemplares],
+        'hp': np.array([p.hp_max for p in ejemplares], dtype=np.int64),
+        'ataque': np.array([p.ataque for p in ejemplares], dtype=np.int64),
+        'defensa': np.array([p.defensa for p in ejemplares], dtype=np.int64),
+        'tipo': tipo,
+        'n_movimientos': np.array([len(p.movimientos) for p in ejemplares], dtype=np.int64),
+        'poder': poder,
+        'stab': stab,
+        # Igual que politica_mas_fuerte: primer movimiento con mayor poder * STAB
+        'mas_fuerte': np.argmax(np.where(np.arange(max_movs) < np.array(
+            [len(p.movimientos) for p in ejemplares])[:, None], poder * stab, -1.0), axis=1),
+        'efectividad': matriz_efectividad_np(),
+    }
+
+
+def _danio_vectorizado(tablas, atacantes, defensores, generador, politica):
+    """Un golpe por combate: elige movimiento, tira el 1-10 de Movimiento.atacar y aplica la fórmula."""
+    k = len(atacantes)
+    if politica == 'mas_fuerte':
+        movs = tablas['mas_fuerte'][atacantes]
+    else:
+        movs = (generador.random(k) * tablas['n_movimientos'][atacantes]).astype(np.int64)
+    poder = tablas['poder'][atacantes, movs]
+    efecto = generador.integers(1, 11, size=k)
+    danio_base = np.where(efecto <= 2, 0,
+                          np.where(efecto <= 7, poder,
+                                   np.where(efecto <= 9, (poder * 1.5).astype(np.int64), 0)))
+    efectividad = tablas['efectividad'][tablas['tipo'][atacantes], tablas['tipo'][defensores]]
+    # Mismo orden de operaciones que Pokemon.cuackatacar para obtener el mismo redondeo
+    danio = (danio_base * tablas['ataque'][atacantes] / np.maximum(1, tablas['defensa'][defensores])) \
+        * tablas['stab'][atacantes, movs] * efectividad
+    return danio.astype(np.int64)
+
+
+def simular_vectorizado(especies_a, especies_b, tablas=None, semilla=0, politica_a='aleatoria',
+                        politica_b='aleatoria', max_turnos=500):
+    """
+    Resuelve K combates a la vez (K = len(especies_a)), un turno por paso, con las
+    reglas de simular_combate. especies_a/especies_b son índices de especie en las tablas.
+    Devuelve (ganador, turnos): ganador vale 1 si gana A, 2 si gana B y 0 si empatan.
+    """
+    if tablas is None:
+        tablas = tablas_vectorizadas()
+    generador = np.random.default_rng(semilla)
+    especies_a = np.asarray(especies_a, dtype=np.int64)
+    especies_b = np.asarray(especies_b, dtype=np.int64)
+    hp_a = tablas['hp'][especies_a].copy()
+    hp_b = tablas['hp'][especies_b].copy()
+    ganador = np.zeros(len(especies_a), dtype=np.int8)
+    turnos = np.full(len(especies_a), max_turnos, dtype=np.int32)
+    activos = np.arange(len(especies_a))
+
+    for turno in range(1, max_turnos + 1):
+        if not activos.size:
+            break
+        a, b = especies_a[activos], especies_b[activos]
+        hp_b[activos] = np.maximum(0, hp_b[activos] - _danio_vectorizado(tablas, a, b, generador, politica_a))
+        caidos = hp_b[activos] <= 0
+        ganador[activos[caidos]] = 1
+        turnos[activos[caidos]] = turno
+        activos = activos[~caidos]
+
+        a, b = especies_a[activos], especies_b[activos]
+        hp_a[activos] = np.maximum(0, hp_a[activos] - _danio_vectorizado(tablas, b, a, generador, politica_b))
+        caidos = hp_a[activos] <= 0
+        ganador[activos[caidos]] = 2
+        turnos[activos[caidos]] = turno
+        activos = activos[~caidos]
+    return ganador, turnos
+
+
+def benchmark_vectorizado():
+    tablas = tablas_vectorizadas()
+    n_especies = len(tablas['nombres'])
+    generador = np.random.default_rng(0)
+
+    # Referencia escalar: combates/s de simular_combate con parejas aleatorias
+    rng = random.Random(0)
+    ejemplares = [especie() for especie in ESPECIES_SALVAJES]
+    muestra = 20000
+    inicio = time.perf_counter()
+    for _ in range(muestra):
+        a, b = rng.choice(ejemplares), rng.choice(ejemplares)
+        if a is b:
+            b = b.especie()
+        a.hp_actual, b.hp_actual = a.hp_max, b.hp_max
+        simular_combate(a, b, rng=rng)
+    escalar = muestra / (time.perf_counter() - inicio)
+    print(f"Escalar: {escalar:,.0f} combates/s")
+
+    for k in (10 ** 4, 10 ** 5, 10 ** 6):
+        especies_a = generador.integers(0, n_especies, size=k)
+        especies_b = generador.integers(0, n_especies, size=k)
+        inicio = time.perf_counter()
+        simular_vectorizado(especies_a, especies_b, tablas, semilla=k)
+        duracion = time.perf_counter() - inicio
+        print(f"Vectorizado K={k:>9,}: {duracion:.3f}s ({k / duracion:,.0f} combates/s, "
+              f"x{k / duracion / escalar:.1f} frente al escalar)")
+
+    # Comprobación estadística: misma tasa de victoria que el motor escalar
+    print("Tasa de victoria de A (escalar vs vectorizado, 20000 combates):")
+    for i, j in ((6, 7), (7, 8), (3, 4)):
+        stats = simular_enfrentamiento(ESPECIES_SALVAJES[i], ESPECIES_SALVAJES[j], 20000, semilla=3)
+        ganador, _ = simular_vectorizado(np.full(20000, i), np.full(20000, j), tablas, semilla=3)
+        p_vec = float(np.mean(ganador == 1))
+        error = (2 * p_vec * (1 - p_vec) / 20000) ** 0.5
+        print(f"  {tablas['nombres'][i]} vs {tablas['nombres'][j]}: {stats.tasa_victoria_a:.4f} vs "
+              f"{p_vec:.4f} (z={(stats.tasa_victoria_a - p_vec) / max(error, 1e-12):+.2f})")
+
+
+# -----------------------------
+# Torneo multiproceso
+# -----------------------------
+def _ejecutar_fragmento(nombre_a, nombre_b, fragmento, n, semilla):
+    """Trabajo de un proceso: n combates con un flujo aleatorio propio derivado de la semilla maestra."""
+    rng = random.Random(f"{semilla}:{nombre_a}:{nombre_b}:{fragmento}")
+    return simular_enfrentamiento(REGISTRO_ESPECIES[nombre_a], REGISTRO_ESPECIES[nombre_b], n, rng=rng)
+
+
+def _leer_progreso(archivo, configuracion):
+    """Fragmentos ya terminados de una ejecución anterior con la misma configuración."""
+    hechos = {}
+    if not archivo or not os.path.exists(archivo):
+        return hechos
+    with open(archivo, 'r', encoding='utf-8') as f:
+        lineas = f.read().split('\n')
+    try:
+        if json.loads(lineas[0]) != configuracion:
+            raise ValueError(f"{archivo} pertenece a otro torneo; bórralo o usa otro archivo")
+    except json.JSONDecodeError:
+        return hechos
+    for linea in lineas[1:]:
+        try:
+            r = json.loads(linea)
+        except json.JSONDecodeError:
+            continue  # última línea a medio escribir si el proceso murió
+        stats = EstadisticasEnfrentamiento(r['a'], r['b'])
+        stats.victorias_a, stats.victorias_b, stats.empates, stats.turnos_totales = r['resultado']
+        stats.danios_a = Counter({int(d): v for d, v in r['danios_a'].items()})
+        stats.danios_b = Counter({int(d): v for d, v in r['danios_b'].items()})
+        hechos[(r['a'], r['b'], r['fragmento'])] = stats
+    return hechos
+
+
+def ejecutar_torneo(n=10000, semilla=0, procesos=None, tamano_fragmento=2000,
+                    archivo_progreso=None, especies=ESPECIES_SALVAJES):
+    """
+    Round-robin de todas las especies repartido en fragmentos de tamano_fragmento combates
+    entre procesos. Si se indica archivo_progreso, cada fragmento terminado se anota allí
+    y una ejecución interrumpida continúa desde el último fragmento completado.
+    Devuelve {(nombre_a, nombre_b): estadísticas}.
+    """
+    nombres = [especie.nombre for especie in especies]
+    configuracion = {'n': n, 'semilla': semilla, 'fragmento': tamano_fragmento, 'especies': nombres}
+    hechos = _leer_progreso(archivo_progreso, configuracion)
+
+    resultados = {(a, b): EstadisticasEnfrentamiento(a, b) for a in nombres for b in nombres}
+    for (a, b, _), stats in hechos.items():
+        resultados[(a, b)].combinar(stats)
+
+    pendientes = []
+    for a in nombres:
+        for b in nombres:
+            for fragmento, inicio in enumerate(range(0, n, tamano_fragmento)):
+                if (a, b, fragmento) not in hechos:
+                    pendientes.append((a, b, fragmento, min(tamano_fragmento, n - inicio)))
+    if not pendientes:
+        return resultados
+
+    progreso = None
+    if archivo_progreso:
+        progreso = open(archivo_progreso, 'a+', encoding='utf-8')
+        if not hechos:
+            progreso.truncate(0)
+            progreso.write(json.dumps(configuracion) + '\n')
+        elif progreso.tell():
+            # Cerrar la línea que quedó a medias si el proceso anterior murió escribiendo
+            progreso.seek(progreso.tell() - 1)
+            if progreso.read(1) != '\n':
+                progreso.write('\n')
+    try:
+        with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+            futuros = {ejecutor.submit(_ejecutar_fragmento, a, b, fragmento, cantidad, semilla): (a, b, fragmento)
+                       for a, b, fragmento, cantidad in pendientes}
+            for hechos_ahora, futuro in enumerate(as_completed(futuros), 1):
+                a, b, fragmento = futuros[futuro]
+                stats = futuro.result()
+                resultados[(a, b)].combinar(stats)
+                if progreso:
+                    progreso.write(json.dumps({
+                        'a': a, 'b': b, 'fragmento': fragmento,
+                        'resultado': [stats.victorias_a, stats.victorias_b, stats.empates, stats.turnos_totales],
+                        'danios_a': stats.danios_a, 'danios_b': stats.danios_b,
+                    }) + '\n')
+                    progreso.flush()
+                if hechos_ahora % 50 == 0 or hechos_ahora == len(pendientes):
+                    print(f"\rFragmentos: {hechos_ahora}/{len(pendientes)}", end="", flush=True)
+        print()
+    finally:
+        if progreso:
+            progreso.close()
+    return resultados
+
+
+def calcular_elo(resultados, iteraciones=300, k=8.0, base=1500.0):
+    """Ajusta un Elo por especie a partir de la matriz de victorias (los empates cuentan medio punto)."""
+    elo = {}
+    for a, b in resultados:
+        elo.setdefault(a, base)
+        elo.setdefault(b, base)
+    for _ in range(iteraciones):
+        for (a, b), stats in resultados.items():
+            if a == b or not stats.combates:
+                continue
+            puntos = (stats.victorias_a + 0.5 * stats.empates) / stats.combates
+            esperado = 1 / (1 + 10 ** ((elo[b] - elo[a]) / 400))
+            elo[a] += k * (puntos - esperado)
+            elo[b] -= k * (puntos - esperado)
+    return elo
+
+
+def mostrar_reporte_torneo(resultados):
+    mostrar_reporte_simulacion(resultados)
+    print()
+    print("Clasificación Elo:")
+    elo = calcular_elo(resultados)
+    for puesto, (nombre, puntos) in enumerate(sorted(elo.items(), key=lambda e: -e[1]), 1):
+        print(f"{puesto:>2}. {nombre:<11} {puntos:7.1f}")
+
+
+def benchmark_torneo(n=4000):
+    base = None
+    procesos = 1
+    while procesos <= (os.cpu_count() or 1):
+        inicio = time.perf_counter()
+        ejecutar_torneo(n=n, semilla=1, procesos=procesos, tamano_fragmento=500)
+        velocidad = n * len(ESPECIES_SALVAJES) ** 2 / (time.perf_counter() - inicio)
+        base = base or velocidad
+        print(f"Torneo con {procesos} procesos: {velocidad:,.0f} combates/s (x{velocidad / base:.2f})")
+        procesos *= 2
+
+
+def benchmark_efectividad(n=1000000):
+    def busqueda_lineal(tipo, tipo_oponente):
+        # La búsqueda original de calcular_efectividad, recorriendo la lista
+        for efectividad in type_effectiveness_table:
+            if efectividad[0] == tipo and efectividad[1] == tipo_oponente:
+                return efectividad[2]
+        return 1.0
+
+    parejas = [(a, b) for a in TIPOS for b in TIPOS] * (n // len(TIPOS) ** 2)
+    parejas_id = [(TIPOS[a], TIPOS[b]) for a, b in parejas]
+    inicio = time.perf_counter()
+    for a, b in parejas:
+        busqueda_lineal(a, b)
+    lineal = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    for a, b in parejas_id:
+        MATRIZ_EFECTIVIDAD[a][b]
+    matriz = time.perf_counter() - inicio
+    pokemon = REGISTRO_ESPECIES['Flameragon']()
+    inicio = time.perf_counter()
+    for _, b in parejas_id:
+        pokemon.calcular_efectividad(b)
+    metodo = time.perf_counter() - inicio
+    total = len(parejas)
+    print(f"Efectividad ({total} consultas): lista {lineal / total * 1e9:.0f} ns, "
+          f"matriz {matriz / total * 1e9:.0f} ns, calcular_efectividad {metodo / total * 1e9:.0f} ns "
+          f"(x{lineal / matriz:.1f})")
+
+
+def benchmark_memoria(n=100000):
+    class MovimientoConDict:
+        def __init__(self, nombre, poder, tipo):
+            self.nombre, self.poder, self.tipo = nombre, poder, tipo
+
+    class PokemonConDict:
+        # La representación anterior: __dict__ por instancia y movimientos nuevos en cada una
+        def __init__(self, p):
+            self.nombre, self.tipo, self.ataque, self.defensa = p.nombre, p.tipo, p.ataque, p.defensa
+            self.hp_max = self.hp_actual = p.hp_max
+            self.habilidad = p.habilidad
+            self.movimientos = [MovimientoConDict(m.nombre, m.poder, m.tipo) for m in p.movimientos]
+
+    def medir(crear):
+        tracemalloc.start()
+        antes = tracemalloc.get_traced_memory()[0]
+        datos = crear()
+        despues = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del datos
+        return (despues - antes) / n
+
+    modelos = [especie() for especie in ESPECIES_SALVAJES]
+
+    def crear_plantel():
+        plantel = Plantel()
+        for i, especie in enumerate(ESPECIES_SALVAJES):
+            plantel.agregar_especie(especie, n // len(modelos) + (i < n % len(modelos)))
+        return plantel
+
+    print(f"Memoria por criatura con {n} criaturas:")
+    print(f"  antes (dict + movimientos propios): {medir(lambda: [PokemonConDict(modelos[i % 10]) for i in range(n)]):7.1f} bytes")
+    print(f"  Pokemon con __slots__:              {medir(lambda: [ESPECIES_SALVAJES[i % 10]() for i in range(n)]):7.1f} bytes")
+    print(f"  Plantel (arrays paralelos):         {medir(crear_plantel):7.1f} bytes")
+
+
+def benchmark_mapa():
+    def lineas_por_barrido(juego):
+        # El dibujo anterior: recorre todas las criaturas en cada celda
+        lineas = []
+        for y in range(juego.tamano_mapa):
+            linea = "║"
+            for x in range(juego.tamano_mapa):
+                if [x, y] == juego.posicion_jugador:
+                    linea += "😀"
+                    continue
+                for pokemon in juego.pokemon_en_mapa:
+                    if pokemon['x'] == x and pokemon['y'] == y:
+                        linea += pokemon['emoji']
+                        break
+                else:
+                    linea += "· "
+            lineas.append(linea + "║")
+        return lineas
+
+    for tamano, salvajes in ((15, 5), (100, 1000), (300, 10000), (1000, 100000)):
+        juego = Juego(tamano, salvajes)
+        juego.vectorizado = False  # medir el índice por celdas (con NumPy ver 'bench paso')
+        juego.inicializar_mapa()
+        inicio = time.perf_counter()
+        juego.lineas_mapa()
+        dibujo = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        juego.mover_salvajes()
+        juego.indice.en(*juego.posicion_jugador)
+        paso = time.perf_counter() - inicio
+        linea = f"Mapa {tamano}x{tamano} con {salvajes} salvajes: dibujo {dibujo * 1000:.1f} ms, paso {paso * 1000:.1f} ms"
+        if tamano * tamano * salvajes <= 10 ** 7:
+            inicio = time.perf_counter()
+            lineas_por_barrido(juego)
+            linea += f" (dibujo con barrido lineal: {(time.perf_counter() - inicio) * 1000:.1f} ms)"
+        print(linea)
+
+
+def benchmark_renderizado(pasos=300):
+    # Terminal capturada de 200x80 para que el mapa grande quepa entero
+    tamano_previo = os.environ.get('COLUMNS'), os.environ.get('LINES')
+    os.environ['COLUMNS'], os.environ['LINES'] = '200', '80'
+    try:
+        _benchmark_renderizado(pasos)
+    finally:
+        for variable, valor in zip(('COLUMNS', 'LINES'), tamano_previo):
+            if valor is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = valor
+
+
+def _benchmark_renderizado(pasos):
+    for tamano, salvajes in ((15, 5), (60, 200)):
+        juego = Juego(tamano, salvajes)
+        captura = io.StringIO()
+
+        # Método anterior: lanzar 'clear' y concatenar cada fila en cada fotograma
+        inicio = time.perf_counter()
+        for _ in range(pasos):
+            juego.mover_salvajes()
+            os.system('cls >NUL' if os.name == 'nt' else 'clear >/dev/null 2>&1')
+            for linea in juego.lineas_mapa():
+                texto = ""
+                for caracter in linea:
+                    texto += caracter
+                captura.write(texto + "\n")
+        anterior = pasos / (time.perf_counter() - inicio)
+        bytes_anterior = captura.tell() / pasos
+
+        captura = io.StringIO()
+        juego.renderizador = RenderizadorTerminal(captura)
+        inicio = time.perf_counter()
+        for _ in range(pasos):
+            juego.mover_salvajes()
+            juego.mostrar_mapa()
+        nuevo = pasos / (time.perf_counter() - inicio)
+        print(f"Renderizado {tamano}x{tamano} ({salvajes} salvajes): clear+concatenar {anterior:,.0f} fps "
+              f"({bytes_anterior:,.0f} car/fotograma), diferencias {nuevo:,.0f} fps "
+              f"({captura.tell() / pasos:,.0f} car/fotograma)")
+
+
+def benchmark_paso():
+    for salvajes in (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6):
+        juego = Juego(1000, salvajes)
+        inicio = time.perf_counter()
+        for _ in range(5):
+            juego.mover_salvajes()
+            juego.indice.en(*juego.posicion_jugador)
+        vectorizado = (time.perf_counter() - inicio) / 5
+        linea = f"Paso con {salvajes:>9,} salvajes: NumPy {vectorizado * 1000:8.2f} ms"
+        if salvajes <= 10 ** 5:
+            juego.vectorizado = False
+            juego.inicializar_mapa()
+            inicio = time.perf_counter()
+            juego.mover_salvajes()
+            juego.indice.en(*juego.posicion_jugador)
+            linea += f", bucle por criatura {(time.perf_counter() - inicio) * 1000:8.2f} ms"
+        print(linea)
+
+
+def benchmark_guardado(entradas=10 ** 5):
+    directorio = tempfile.mkdtemp()
+    try:
+        jugador = Jugador("Ash")
+        for especie in ESPECIES_SALVAJES[:6]:
+            jugador.agregar_pokemon(especie())
+        jugador.historial_combates = [f"Victoria contra {ESPECIES_SALVAJES[i % 10].nombre}" for i in range(entradas)]
+
+        # Formato anterior: todo en un JSON con indent=2
+        ruta_antigua = os.path.join(directorio, 'antigua.json')
+        datos = {'nombre': jugador.nombre, 'equipo': [datos_pokemon(p) for p in jugador.equipo],
+                 'pokemon_actual': 0, 'historial_combates': jugador.historial_combates}
+        inicio = time.perf_counter()
+        with open(ruta_antigua, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, ensure_ascii=False, indent=2)
+        guardado_antiguo = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        with open(ruta_antigua, 'r', encoding='utf-8') as f:
+            json.load(f)
+        carga_antigua = time.perf_counter() - inicio
+
+        motor = MotorGuardado(os.path.join(directorio, 'partida.jsonl'))
+        inicio = time.perf_counter()
+        motor.guardar(jugador)
+        primero = time.perf_counter() - inicio
+        jugador.historial_combates.append("Victoria contra Leafox")
+        inicio = time.perf_counter()
+        motor.guardar(jugador)
+        incremental = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        MotorGuardado(motor.ruta).cargar()
+        carga = time.perf_counter() - inicio
+
+        print(f"Guardado con {entradas} entradas de historial:")
+        print(f"  antes: guardar {guardado_antiguo * 1000:.1f} ms (cada vez), cargar {carga_antigua * 1000:.1f} ms")
+        print(f"  ahora: primer guardado {primero * 1000:.1f} ms, guardado incremental {incremental * 1000:.2f} ms, "
+              f"cargar {carga * 1000:.1f} ms")
+    finally:
+        shutil.rmtree(directorio)
+
+
+def benchmark_almacen(partidas=10000, entradas=50):
+    directorio = tempfile.mkdtemp()
+    try:
+        almacen = AlmacenPartidas(os.path.join(directorio, 'partidas.db'))
+        jugadores = []
+        for i in range(partidas):
+            jugador = Jugador(f"jugador{i:05d}")
+            jugador.agregar_pokemon(ESPECIES_SALVAJES[i % 10]())
+            jugador.historial_combates = [f"Victoria contra {ESPECIES_SALVAJES[j % 10].nombre}"
+                                          for j in range(entradas)]
+            jugadores.append(jugador)
+        inicio = time.perf_counter()
+        for jugador in jugadores:
+            almacen.guardar(jugador)
+        guardar = (time.perf_counter() - inicio) / partidas
+
+        muestra = random.Random(0).sample(jugadores, 1000)
+        inicio = time.perf_counter()
+        for jugador in muestra:
+            almacen.cargar(jugador.nombre)
+        cargar = (time.perf_counter() - inicio) / len(muestra)
+        inicio = time.perf_counter()
+        for jugador in muestra:
+            jugador.historial_combates.append("Victoria contra Leafox")
+            almacen.guardar(jugador)
+        incremental = (time.perf_counter() - inicio) / len(muestra)
+        inicio = time.perf_counter()
+        almacen.listar()
+        listar = time.perf_counter() - inicio
+        almacen.cerrar()
+        print(f"Almacén con {partidas} partidas ({entradas} entradas de historial cada una): "
+              f"guardar {guardar * 1000:.2f} ms, cargar {cargar * 1000:.2f} ms, "
+              f"guardado incremental {incremental * 1000:.2f} ms, listar {listar * 1000:.1f} ms")
+    finally:
+        shutil.rmtree(directorio)
+
+
+# -----------------------------
+# IA con búsqueda expectimax
+# -----------------------------
+class _TiempoAgotado(Exception):
+    pass
+
+
+class PoliticaExpectimax:
+    """
+    Política de movimiento que busca unas cuantas jugadas por delante sobre los
+    resultados de Movimiento.atacar. Los nodos de azar promedian los cuatro resultados
+    con su probabilidad; el rival minimiza (rival='min') o elige al azar
+    (rival='aleatorio'). Los nodos de azar se podan cuando ni con los resultados
+    restantes en su mejor caso pueden mejorar la mejor jugada ya encontrada.
+
+    Profundiza de una en una (1, 2, ... hasta profundidad jugadas) mientras quede
+    presupuesto de tiempo y devuelve la mejor jugada de la última búsqueda completa.
+    Los valores de los estados (HP propio, HP rival, a quién le toca) se guardan en
+    una tabla de transposición LRU de como mucho max_cache entradas.
+    """
+
+    def __init__(self, profundidad=6, presupuesto=0.05, max_cache=200000, rival='min'):
+        self.profundidad = profundidad
+        self.presupuesto = presupuesto
+        self.max_cache = max_cache
+        self.rival = rival
+        self.cache = OrderedDict()
+        self.nodos = 0
+
+    def __call__(self, pokemon, oponente, rng=random):
+        self._limite = time.perf_counter() + self.presupuesto
+        self._golpes_propios = self._distribuciones(pokemon, oponente)
+        self._golpes_rival = self._distribuciones(oponente, pokemon)
+        self._hp_max = (pokemon.hp_max, oponente.hp_max)
+        self._enfrentamiento = (pokemon.especie, pokemon.tipo_id, pokemon.ataque, pokemon.defensa, pokemon.hp_max,
+                                oponente.especie, oponente.tipo_id, oponente.ataque, oponente.defensa, oponente.hp_max)
+        mejor = 0
+        for profundidad in range(1, self.profundidad + 1):
+            try:
+                mejor = self._mejor_movimiento(pokemon.hp_actual, oponente.hp_actual, profundidad)
+            except _TiempoAgotado:
+                break
+        return mejor
+
+    @staticmethod
+    def _distribuciones(atacante, defensor):
+        """Por movimiento, [(daño, probabilidad)] con los resultados de igual daño agrupados."""
+        distribuciones = []
+        for movimiento in atacante.movimientos:
+            danios = Counter()
+            for probabilidad, danio_base, _ in movimiento.resultados():
+                danios[atacante.calcular_danio(movimiento, danio_base, defensor)[0] if danio_base else 0] += probabilidad
+            distribuciones.append(sorted(danios.items(), reverse=True))
+        return distribuciones
+
+    def _mejor_movimiento(self, hp_propio, hp_rival, profundidad):
+        mejor, mejor_valor = 0, -2.0
+        for i, golpes in enumerate(self._golpes_propios):
+            valor = self._azar(golpes, hp_propio, hp_rival, profundidad, True, mejor_valor)
+            if valor > mejor_valor:
+                mejor, mejor_valor = i, valor
+        return mejor
+
+    def _azar(self, golpes, hp_propio, hp_rival, profundidad, turno_propio, cota):
+        """
+        Valor esperado de un movimiento. Si en su mejor caso no puede superar la cota
+        (para quien elige), devuelve ese mejor caso sin terminar de evaluarlo.
+        """
+        total, restante = 0.0, 1.0
+        for danio, probabilidad in golpes:
+            if turno_propio:
+                valor = self._valor(hp_propio, max(0, hp_rival - danio), profundidad - 1, False)
+            else:
+                valor = self._valor(max(0, hp_propio - danio), hp_rival, profundidad - 1, True)
+            total += probabilidad * valor
+            restante -= probabilidad
+            if turno_propio and total + restante <= cota:
+                return total + restante
+            if not turno_propio and total - restante >= cota:
+                return total - restante
+        return total
+
+    def _valor(self, hp_propio, hp_rival, profundidad, turno_propio):
+        """Valor entre -1 (perdemos) y 1 (ganamos) del estado con turno_propio por mover."""
+        if hp_rival <= 0:
+            return 1.0
+        if hp_propio <= 0:
+            return -1.0
+        if profundidad == 0:
+            return hp_propio / self._hp_max[0] - hp_rival / self._hp_max[1]
+
+        clave = (self._enfrentamiento, hp_propio, hp_rival, turno_propio, profundidad)
+        valor = self.cache.get(clave)
+        if valor is not None:
+            self.cache.move_to_end(clave)
+            return valor
+
+        self.nodos += 1
+        if not self.nodos & 1023 and time.perf_counter() > self._limite:
+            raise _TiempoAgotado
+        if turno_propio:
+            valor = -2.0
+            for golpes in self._golpes_propios:
+                valor = max(valor, self._azar(golpes, hp_propio, hp_rival, profundidad, True, valor))
+        elif self.rival == 'min':
+            valor = 2.0
+            for golpes in self._golpes_rival:
+                valor = min(valor, self._azar(golpes, hp_propio, hp_rival, profundidad, False, valor))
+        else:
+            valor = sum(self._azar(golpes, hp_propio, hp_rival, profundidad, False, 2.0)
+                        for golpes in self._golpes_rival) / len(self._golpes_rival)
+
+        self.cache[clave] = valor
+        if len(self.cache) > self.max_cache:
+            self.cache.popitem(last=False)
+        return valor
+
+
+def benchmark_ia(decisiones=20):
+    rng = random.Random(0)
+    for profundidad in (2, 4, 6, 8):
+        politica = PoliticaExpectimax(profundidad=profundidad, presupuesto=10.0)
+        latencias = []
+        for _ in range(decisiones):
+            a, b = rng.choice(ESPECIES_SALVAJES)(), rng.choice(ESPECIES_SALVAJES)()
+            a.hp_actual = rng.randint(1, a.hp_max)
+            b.hp_actual = rng.randint(1, b.hp_max)
+            politica.cache.clear()
+            inicio = time.perf_counter()
+            politica(a, b)
+            latencias.append(time.perf_counter() - inicio)
+        duracion = sum(latencias)
+        latencias.sort()
+        print(f"Expectimax profundidad {profundidad}: {politica.nodos / duracion:,.0f} nodos/s, "
+              f"latencia media {duracion / decisiones * 1000:.2f} ms, máx {latencias[-1] * 1000:.2f} ms")
+
+    # Contra el salvaje aleatorio de siempre, con la misma especie en ambos lados
+    politica = PoliticaExpectimax(presupuesto=0.01)
+    normie = REGISTRO_ESPECIES['Normie']
+    stats_ia = simular_enfrentamiento(normie, normie, 300, semilla=2, politica_a=politica)
+    stats_azar = simular_enfrentamiento(normie, normie, 300, semilla=2)
+    print(f"Normie vs Normie: gana {stats_ia.tasa_victoria_a:.1%} con expectimax y "
+          f"{stats_azar.tasa_victoria_a:.1%} eligiendo al azar")
+
+
+# -----------------------------
+# Probabilidades exactas de un duelo
+# -----------------------------
+# Las políticas del solucionador devuelven la probabilidad de usar cada movimiento.
+def distribucion_uniforme(atacante, defensor):
+    """Las mismas probabilidades que politica_aleatoria."""
+    return [1 / len(atacante.movimientos)] * len(atacante.movimientos)
+
+
+def distribucion_mas_fuerte(atacante, defensor):
+    """Las mismas probabilidades que politica_mas_fuerte."""
+    probabilidades = [0.0] * len(atacante.movimientos)
+    probabilidades[politica_mas_fuerte(atacante, defensor, None)] = 1.0
+    return probabilidades
+
+
+def distribucion_danio(atacante, defensor, politica):
+    """{daño final: probabilidad} de un ataque, combinando la política con los resultados de atacar()."""
+    danios = Counter()
+    for movimiento, prob_movimiento in zip(atacante.movimientos, politica(atacante, defensor)):
+        for probabilidad, danio_base, _ in movimiento.resultados():
+            danio = atacante.calcular_danio(movimiento, danio_base, defensor)[0] if danio_base else 0
+            danios[danio] += prob_movimiento * probabilidad
+    return danios
+
+
+def resolver_duelos(parejas, politica_a=distribucion_uniforme, politica_b=distribucion_uniforme):
+    """
+    Probabilidad exacta de victoria y turnos esperados de cada duelo (a, b) con las
+    reglas de simular_combate. Devuelve [(p_gana_a, p_gana_b, turnos_esperados)].
+
+    Programación dinámica sobre los estados (HP de A, HP de B) al empezar un turno:
+    dentro del turno A ataca y después B, así que el turno de cada uno queda implícito.
+    Cada intercambio que hace daño lleva a un estado con menos HP total, de modo que
+    los estados se resuelven por diagonales (HP de A + HP de B constante), cada
+    diagonal de todos los duelos a la vez con NumPy. El único ciclo es que ninguno
+    haga daño, y se despeja dividiendo por 1 - P(0 y 0).
+    """
+    if np is None:
+        raise RuntimeError("El solucionador exacto necesita NumPy (pip install numpy)")
+    n = len(parejas)
+    hp = max(max(a.hp_actual, b.hp_actual) for a, b in parejas)
+
+    def tablas_danio(distribuciones):
+        # Daños positivos en columnas (rellenas con probabilidad 0) y la probabilidad de no hacer daño aparte
+        columnas = max(1, max(sum(1 for d in dist if d > 0) for dist in distribuciones))
+        danios = np.zeros((n, columnas), dtype=np.int64)
+        probabilidades = np.zeros((n, columnas))
+        for i, dist in enumerate(distribuciones):
+            positivos = [(d, p) for d, p in dist.items() if d > 0]
+            for j, (d, p) in enumerate(positivos):
+                danios[i, j], probabilidades[i, j] = d, p
+        cero = np.array([dist.get(0, 0.0) for dist in distribuciones])
+        return danios, probabilidades, cero
+
+    danio_a, prob_a, cero_a = tablas_danio([distribucion_danio(a, b, politica_a) for a, b in parejas])
+    danio_b, prob_b, cero_b = tablas_danio([distribucion_danio(b, a, politica_b) for a, b in parejas])
+    bucle = (cero_a * cero_b)[:, None]
+    sin_fin = bucle >= 1.0  # ninguno puede hacer daño nunca
+    divisor = np.where(sin_fin, 1.0, 1.0 - bucle)
+
+    # W: P(gana A), T: turnos esperados; V y VT tras el ataque de B (V[a, b] = Σ_e q_e W[a-e, b])
+    W, T, V, VT = (np.zeros((n, hp + 1, hp + 1)) for _ in range(4))
+    duelos = np.arange(n)[:, None, None]
+    for diagonal in range(2, 2 * hp + 1):
+        hp_a = np.arange(max(1, diagonal - hp), min(hp, diagonal - 1) + 1)
+        hp_b = diagonal - hp_a
+
+        # U: ataque de B con daño positivo desde (a, b); si a - e <= 0 cae A (fila 0: W = T = 0)
+        destino_a = np.maximum(hp_a[None, None, :] - danio_b[:, :, None], 0)
+        U = (prob_b[:, :, None] * W[duelos, destino_a, hp_b[None, None, :]]).sum(axis=1)
+        UT = (prob_b[:, :, None] * T[duelos, destino_a, hp_b[None, None, :]]).sum(axis=1)
+
+        # Ataque de A con daño positivo: gana si b - d <= 0; si no, sigue B desde (a, b - d)
+        restante_b = hp_b[None, None, :] - danio_a[:, :, None]
+        gana = restante_b <= 0
+        origen_b = np.maximum(restante_b, 0)
+        continua_w = V[duelos, hp_a[None, None, :], origen_b]
+        continua_t = VT[duelos, hp_a[None, None, :], origen_b]
+        w = (prob_a[:, :, None] * np.where(gana, 1.0, continua_w)).sum(axis=1) + cero_a[:, None] * U
+        t = 1.0 + (prob_a[:, :, None] * np.where(gana, 0.0, continua_t)).sum(axis=1) + cero_a[:, None] * UT
+        W[:, hp_a, hp_b] = np.where(sin_fin, 0.0, w / divisor)
+        T[:, hp_a, hp_b] = np.where(sin_fin, 0.0, t / divisor)
+        V[:, hp_a, hp_b] = U + cero_b[:, None] * W[:, hp_a, hp_b]
+        VT[:, hp_a, hp_b] = UT + cero_b[:, None] * T[:, hp_a, hp_b]
+
+    resultados = []
+    for i, (a, b) in enumerate(parejas):
+        if sin_fin[i, 0]:
+            resultados.append((0.0, 0.0, float('inf')))
+        else:
+            p = float(W[i, a.hp_actual, b.hp_actual])
+            resultados.append((p, 1.0 - p, float(T[i, a.hp_actual, b.hp_actual])))
+    return resultados
+
+
+def resolver_duelo(pokemon_a, pokemon_b, politica_a=distribucion_uniforme, politica_b=distribucion_uniforme):
+    return resolver_duelos([(pokemon_a, pokemon_b)], politica_a, politica_b)[0]
+
+
+def benchmark_exacto(combates=20000):
+    parejas = [(a(), b()) for a in ESPECIES_SALVAJES for b in ESPECIES_SALVAJES]
+    inicio = time.perf_counter()
+    exactos = resolver_duelos(parejas)
+    print(f"Solución exacta de {len(parejas)} duelos: {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+    peor = 0.0
+    for (a, b), (p, _, turnos) in list(zip(parejas, exactos))[::7]:
+        stats = simular_enfrentamiento(a.especie, b.especie, combates, semilla=4)
+        z = (stats.tasa_victoria_a - p) / max((p * (1 - p) / combates) ** 0.5, 1e-12)
+        peor = max(peor, abs(z))
+        print(f"  {a.nombre} vs {b.nombre}: exacto {p:.4f} ({turnos:.3f} turnos), "
+              f"simulado {stats.tasa_victoria_a:.4f} ({stats.turnos_promedio:.3f} turnos), z={z:+.2f}")
+    print(f"  Mayor |z| frente al simulador: {peor:.2f}")
+
+
+def benchmark_tabla_danio(golpes=200000):
+    a, b = REGISTRO_ESPECIES['Flameragon'](), REGISTRO_ESPECIES['Leafox']()
+    rng = random.Random(0)
+    inicio = time.perf_counter()
+    for _ in range(golpes):
+        b.hp_actual = b.hp_max
+        a.cuackatacar(0, b, rng)
+    por_cuackatacar = (time.perf_counter() - inicio) / golpes
+    movimiento = a.movimientos[0]
+    inicio = time.perf_counter()
+    for _ in range(golpes):
+        a.calcular_danio(movimiento, movimiento.poder, b)
+    formula = (time.perf_counter() - inicio) / golpes
+    inicio = time.perf_counter()
+    for _ in range(golpes):
+        tabla_danio(a, movimiento, b)
+    tabla = (time.perf_counter() - inicio) / golpes
+    print(f"Por golpe: cuackatacar {por_cuackatacar * 1e9:.0f} ns, fórmula {formula * 1e9:.0f} ns, "
+          f"tabla {tabla * 1e9:.0f} ns")
+
+    for motor in (simular_combate, simular_combate_tabla):
+        inicio = time.perf_counter()
+        resultados = {(a, b): simular_enfrentamiento(a, b, 1000, semilla=5, motor=motor)
+                      for a in ESPECIES_SALVAJES for b in ESPECIES_SALVAJES}
+        duracion = time.perf_counter() - inicio
+        golpes = sum(sum(s.danios_a.values()) + sum(s.danios_b.values()) for s in resultados.values())
+        print(f"Simulador con {motor.__name__}: {golpes / duracion:,.0f} golpes/s, "
+              f"{sum(s.combates for s in resultados.values()) / duracion:,.0f} combates/s")
+        if motor is simular_combate:
+            referencia = {k: (s.victorias_a, s.turnos_totales, s.danios_a) for k, s in resultados.items()}
+    iguales = referencia == {k: (s.victorias_a, s.turnos_totales, s.danios_a) for k, s in resultados.items()}
+    print(f"Mismos resultados con ambos motores: {'sí' if iguales else 'NO'}")
+
+
+def benchmark_repeticion(combates=5000):
+    directorio = tempfile.mkdtemp()
+    try:
+        registro = RegistroCombates(os.path.join(directorio, 'combates.log'))
+        rng = random.Random(0)
+        for _ in range(combates):
+            # Combates sin interfaz con decisiones al azar, como los haría un jugador
+            jugador = Jugador("bot")
+            for especie in rng.sample(ESPECIES_SALVAJES, 3):
+                jugador.agregar_pokemon(especie())
+            motor = MotorCombate(jugador, rng.choice(ESPECIES_SALVAJES)(), rng.getrandbits(64))
+            salvaje = motor.salvaje
+            while jugador.pokemon_actual.hp_actual > 0 and salvaje.hp_actual > 0:
+                if rng.random() < 0.02:
+                    motor.huir()
+                    break
+                motor.atacar(rng.randrange(len(jugador.pokemon_actual.movimientos)))
+                if salvaje.hp_actual <= 0:
+                    break
+                motor.atacar_salvaje(motor.elegir_movimiento_salvaje())
+                vivos = [i for i, p in enumerate(jugador.equipo) if p.hp_actual > 0]
+                if jugador.pokemon_actual.hp_actual <= 0 and vivos:
+                    motor.cambiar(rng.choice(vivos))
+            registro.anotar(motor)
+
+        tamano = os.path.getsize(registro.ruta)
+        inicio = time.perf_counter()
+        correctos, fallidos = registro.verificar()
+        duracion = time.perf_counter() - inicio
+        print(f"Repetición: {correctos + fallidos} combates verificados en {duracion:.2f}s "
+              f"({(correctos + fallidos) / duracion:,.0f} combates/s, {tamano / combates:.0f} bytes por combate), "
+              f"{fallidos} distintos")
+    finally:
+        shutil.rmtree(directorio)
+
+
+def benchmark_sesion(sesiones=20):
+    directorio = tempfile.mkdtemp()
+    try:
+        duraciones = []
+        for i in range(sesiones):
+            random.seed(i)
+
+            def guion():
+                # Crear partida, pasear hasta un combate (luchando con el primer movimiento),
+                # guardar, volver al menú y salir
+                yield from ("1", f"entrenador{i}", "1")
+                pasos = cycle(("d", "1", "1", "d", "1", "1", "a", "1", "1", "a", "1", "1"))
+                while not juego.jugador or not juego.jugador.historial_combates:
+                    yield next(pasos)
+                yield from ("g", "v", "4")
+
+            juego = Juego(num_salvajes=40, ritmo=Ritmo('guion', guion()))
+            juego._almacen = AlmacenPartidas(os.path.join(directorio, 'partidas.db'))
+            juego.registro_combates = RegistroCombates(os.path.join(directorio, 'combates.log'))
+            salida = io.StringIO()
+            juego.renderizador = RenderizadorTerminal(salida)
+            inicio = time.perf_counter()
+            with redirect_stdout(salida):
+                juego.menu_principal()
+            duraciones.append(time.perf_counter() - inicio)
+            juego.almacen.cerrar()
+        duraciones.sort()
+        combates, _ = RegistroCombates(os.path.join(directorio, 'combates.log')).verificar()
+        print(f"Sesión menú→explorar→combate→guardar con guion: mediana {duraciones[len(duraciones) // 2] * 1000:.1f} ms, "
+              f"máximo {duraciones[-1] * 1000:.1f} ms ({sesiones} sesiones, {combates} combates)")
+    finally:
+        shutil.rmtree(directorio)
+
+
+def benchmark_catalogo(especies=5000, consultas=1000000):
+    directorio = tempfile.mkdtemp()
+    try:
+        # Un catálogo grande con los tipos de siempre y especies inventadas
+        rng = random.Random(0)
+        tipos = list(NOMBRES_TIPO)
+        datos = {'efectividades': [list(e) for e in type_effectiveness_table], 'rarezas': RAREZAS, 'especies': [
+            {'nombre': f"Especie{i}", 'tipo': rng.choice(tipos), 'ataque': rng.randint(30, 70),
+             'defensa': rng.randint(30, 70), 'hp': rng.randint(30, 60), 'habilidad': "Ninguna",
+             'aparicion': rng.randint(1, 10),
+             'movimientos': [[f"Movimiento{rng.randrange(400)}", rng.choice((0, 25, 30, 35, 40)), rng.choice(tipos)]
+                             for _ in range(4)],
+             'arte': ["", "    (o_o)", "    "]}
+            for i in range(especies)]}
+        ruta = os.path.join(directorio, 'especies.json')
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, ensure_ascii=False)
+
+        inicio = time.perf_counter()
+        leer_catalogo(ruta)
+        frio = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        tuplas = leer_catalogo(ruta)
+        cache = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        catalogo = construir_catalogo(tuplas)[2]
+        construir = time.perf_counter() - inicio
+        movimientos = {id(m) for e in catalogo.values() for m in e.movimientos}
+
+        nombres = [f"Especie{rng.randrange(especies)}" for _ in range(consultas)]
+        inicio = time.perf_counter()
+        for nombre in nombres:
+            catalogo[nombre]
+        busqueda = (time.perf_counter() - inicio) / consultas
+        print(f"Catálogo de {especies} especies: leer JSON {frio * 1000:.1f} ms, desde caché {cache * 1000:.1f} ms, "
+              f"crear especies {construir * 1000:.1f} ms, búsqueda por nombre {busqueda * 1e9:.0f} ns, {len(movimientos)} movimientos distintos "
+              f"para {especies * 4} entradas")
+    finally:
+        shutil.rmtree(directorio)
+
+
+def benchmark_aparicion(especies=5000, n=10 ** 6):
+    rng = random.Random(0)
+    biomas = ('pradera', 'bosque', 'costa', 'volcan', 'cueva')
+    muestra = ESPECIES_SALVAJES[0]
+    catalogo = [Especie(f"Especie{i}", muestra.tipo, 40, 40, 40, "", muestra.movimientos, "",
+                        rng.randint(1, 10), False, rng.choice(list(RAREZAS)), tuple(rng.sample(biomas, 2)))
+                for i in range(especies)]
+    tabla = TablaAparicion(catalogo)
+    inicio = time.perf_counter()
+    tabla.muestreador('bosque')
+    construir = time.perf_counter() - inicio
+    print(f"Aparición con {especies} especies: construir un bioma {construir * 1000:.1f} ms")
+
+    muestreador = tabla.muestreador('bosque')
+    pesos = [tabla.peso(e) for e in muestreador.elementos]
+    inicio = time.perf_counter()
+    referencia = random.choices(range(len(pesos)), weights=pesos, k=n)
+    elecciones = time.perf_counter() - inicio
+    for _ in range(3):
+        tabla.sortear(10, 'bosque')
+    inicio = time.perf_counter()
+    indices = muestreador.indices(n, random.Random(1))
+    alias = time.perf_counter() - inicio
+    print(f"  {n:,} apariciones: random.choices {elecciones:.2f}s, alias {alias:.2f}s "
+          f"(reconstrucciones: {tabla.reconstrucciones})")
+
+    # Frecuencias frente a los pesos: distancia de variación total
+    def distancia(muestras):
+        total = sum(pesos)
+        cuenta = Counter(muestras)
+        return sum(abs(cuenta[i] / n - p / total) for i, p in enumerate(pesos)) / 2
+    print(f"  Distancia a la distribución esperada: alias {distancia(indices):.4f}, "
+          f"random.choices {distancia(referencia):.4f}")
+
+    rng = random.Random(2)
+    inicio = time.perf_counter()
+    xs, ys, _ = tabla.colocar(n, 2000, 'bosque', rng)
+    colocar = time.perf_counter() - inicio
+    distintas = len(set(zip(xs, ys)))
+    print(f"  Colocar {n:,} en un mapa 2000x2000: {colocar:.2f}s, {distintas:,} celdas distintas")
+    if np is not None:
+        generador = np.random.default_rng(3)
+        inicio = time.perf_counter()
+        xs, ys, _ = tabla.colocar(n, 2000, 'bosque', generador)
+        colocar_np = time.perf_counter() - inicio
+        distintas = len(np.unique(ys * 2000 + xs))
+        print(f"  Colocar {n:,} con NumPy: {colocar_np:.2f}s, {distintas:,} celdas distintas")
+
+
+def benchmark_mundo(pasos=20000, vista=15):
+    directorio = tempfile.mkdtemp()
+    try:
+        mundo = MundoTrozos(os.path.join(directorio, 'mundo.db'), semilla=7, max_trozos=64)
+        mitad = vista // 2
+
+        def paso(x, y):
+            mundo.paso_salvajes(x - mitad, y - mitad, vista, vista)
+            mundo.vista(x - mitad, y - mitad, vista, vista)
+            mundo.en(x, y)
+
+        # Un salvaje derrotado cerca del origen tiene que seguir derrotado a la vuelta
+        trozo = next(t for t in (mundo.trozo(cx, 0) for cx in range(100)) if t.especies)
+        origen = (trozo.cx, trozo.cy)
+        antes = len(trozo.especies)
+        trozo.quitar(0)
+
+        rng = random.Random(0)
+        x = y = 0
+
+        def caminar(n, tiempos_frontera=None, tiempos_dentro=None):
+            nonlocal x, y
+            for _ in range(n):
+                # Casi siempre hacia el este, con algún rodeo
+                dx, dy = (1, 0) if rng.random() < 0.8 else rng.choice(((0, 1), (0, -1), (-1, 0)))
+                frontera = (x // TAMANO_TROZO != (x + dx) // TAMANO_TROZO or
+                            y // TAMANO_TROZO != (y + dy) // TAMANO_TROZO)
+                x, y = x + dx, y + dy
+                inicio = time.perf_counter()
+                paso(x, y)
+                if tiempos_frontera is not None:
+                    (tiempos_frontera if frontera else tiempos_dentro).append(time.perf_counter() - inicio)
+
+        tiempos_frontera, tiempos_dentro = [], []
+        caminar(pasos, tiempos_frontera, tiempos_dentro)
+        # Memoria: lo que crece entre dos puntos de un paseo largo (sin contar las mediciones)
+        memoria = []
+        tracemalloc.start()
+        for _ in range(3):
+            caminar(pasos // 4)
+            memoria.append(tracemalloc.get_traced_memory()[0])
+        tracemalloc.stop()
+
+        def percentil(tiempos, p):
+            tiempos = sorted(tiempos)
+            return tiempos[min(len(tiempos) - 1, int(len(tiempos) * p))] * 1000
+
+        print(f"Mundo por trozos: {pasos + 3 * (pasos // 4)} pasos hasta x={x}, {mundo.generados} trozos generados, "
+              f"{mundo.escritos} escritos, {len(mundo.trozos)} en memoria")
+        print(f"  Paso sin cambiar de trozo: mediana {percentil(tiempos_dentro, 0.5):.3f} ms, "
+              f"p99 {percentil(tiempos_dentro, 0.99):.3f} ms")
+        print(f"  Paso cruzando de trozo:    mediana {percentil(tiempos_frontera, 0.5):.3f} ms, "
+              f"p99 {percentil(tiempos_frontera, 0.99):.3f} ms, máx {max(tiempos_frontera) * 1000:.3f} ms")
+        print(f"  Memoria reservada durante el paseo, cada {pasos // 4} pasos: "
+              + ", ".join(f"{m / 1024:.0f} KiB" for m in memoria))
+
+        vuelta = mundo.trozo(*origen)
+        mundo.cerrar()
+        otro = MundoTrozos(os.path.join(directorio, 'otro.db'), semilla=7)
+        igual = otro.generar(5, -3).codificar() == MundoTrozos(os.path.join(directorio, 'tercero.db'),
+                                                               semilla=7).generar(5, -3).codificar()
+        print(f"  Salvajes en el trozo {origen} a la vuelta: {len(vuelta.especies)} (eran {antes}, "
+              f"derrotado 1); misma semilla, mismo trozo: {'sí' if igual else 'NO'}")
+        otro.cerrar()
+    finally:
+        shutil.rmtree(directorio)
+
+
+# -----------------------------
+# Servidor multijugador
+# -----------------------------
+PUERTO_SERVIDOR = 8765
+HOST_SERVIDOR = '127.0.0.1'  # solo esta máquina; para abrirlo a la red hay que pedirlo (p. ej. 0.0.0.0)
+INDICADOR = "\n> "  # cada respuesta del servidor termina con el indicador de orden
+
+# En los procesos de IA la política se crea una vez (ver ServidorJuego)
+_politica_proceso = None
+
+
+def _iniciar_proceso_ia(politica):
+    global _politica_proceso
+    _politica_proceso = politica
+
+
+def _decidir_en_proceso(salvaje, rival, semilla):
+    return _politica_proceso(salvaje, rival, random.Random(semilla))
+
+
+class SesionJuego:
+    """
+    Partida de un jugador conectado, sin entrada ni salida: procesar() recibe una orden
+    y devuelve el texto que hay que mostrarle. El mapa es el de un Juego (paso,
+    lineas_mapa) y los combates son un Encuentro, como en la terminal, así que una
+    sesión nunca espera a nadie; solo la decisión del salvaje puede ir a otro proceso.
+    Guardar (SQLite, que puede esperar al bloqueo de otro proceso) va al ejecutor
+    guardados para no parar el bucle.
+    """
+
+    def __init__(self, politica_salvaje=None, pool=None, registro_combates=None, almacen=None,
+                 tamano_mapa=15, num_salvajes=5, guardados=None):
+        self.juego = Juego(tamano_mapa, num_salvajes, politica_salvaje)
+        self.juego.registro_combates = registro_combates
+        self.pool = pool
+        self.almacen = almacen
+        self.guardados = guardados
+        self.jugador = None
+        self.encuentro = None
+        self.estado = 'nombre'
+
+    @property
+    def terminada(self):
+        return self.estado == 'fin'
+
+    def bienvenida(self):
+        return "=== POKÉMON EN RED ===\nIngresa tu nombre:"
+
+    async def procesar(self, orden):
+        return await getattr(self, f"_en_{self.estado}")(orden.strip())
+
+    # --- Creación ---
+    async def _en_nombre(self, orden):
+        if not orden:
+            return "Ingresa tu nombre:"
+        self.jugador = self.juego.jugador = Jugador(orden)
+        self.estado = 'inicial'
+        return "\n".join(["Elige tu Pokémon inicial:"] +
+                         [f"{i}. {e.nombre} (Tipo {e.tipo})" for i, e in enumerate(ESPECIES_INICIALES, 1)])
+
+    async def _en_inicial(self, orden):
+        if not (orden.isdigit() and 1 <= int(orden) <= len(ESPECIES_INICIALES)):
+            return "Opción no válida"
+        self.jugador.agregar_pokemon(ESPECIES_INICIALES[int(orden) - 1]())
+        self.estado = 'explorar'
+        return f"¡Felicidades {self.jugador.nombre}! Has recibido un {self.jugador.pokemon_actual.nombre}\n" + self.mapa()
+
+    # --- Exploración ---
+    def mapa(self):
+        return "\n".join(self.juego.lineas_mapa() + ["WASD - mover   E - Estado equipo   H - Historial   V - Salir   G - Guardar"])
+
+    async def _en_explorar(self, orden):
+        orden = orden.lower()
+        if orden in ('w', 'a', 's', 'd'):
+            _, salvaje = self.juego.paso(orden)
+            if salvaje is not None:
+                return self._empezar_combate(salvaje)
+            return self.mapa()
+        if orden == 'e':
+            return "\n".join(f"{i}. {p.nombre} ({p.tipo}) {p.hp_actual}/{p.hp_max} HP"
+                             for i, p in enumerate(self.jugador.equipo, 1))
+        if orden == 'h':
+            return "\n".join(f"{i}. {c}" for i, c in enumerate(self.jugador.historial_combates, 1)) or \
+                "No hay combates registrados"
+        if orden == 'g':
+            if self.almacen is None:
+                return "Este servidor no guarda partidas"
+            # La sesión espera a que termine, las demás siguen
+            await asyncio.get_running_loop().run_in_executor(self.guardados, self.almacen.guardar, self.jugador)
+            return "Partida guardada correctamente"
+        if orden == 'v':
+            self.estado = 'fin'
+            return "¡Hasta pronto!"
+        return "Comando no válido"
+
+    # --- Combate ---
+    def _empezar_combate(self, salvaje):
+        self.encuentro = Encuentro(self.juego, salvaje)
+        return "\n".join(self.encuentro.lineas_inicio + [self._siguiente()])
+
+    def _siguiente(self):
+        """Lo que toca tras una acción del combate: el menú, elegir otro Pokémon o el mapa."""
+        self.estado = self.encuentro.fase
+        if self.estado == 'turno':
+            self.estado = 'combate'
+            return self._menu_combate()
+        if self.estado == 'cambio':
+            return "Elige otro Pokémon:\n" + "\n".join(
+                f"{i}. {p.nombre} {p.hp_actual}/{p.hp_max} HP" for i, p in enumerate(self.jugador.equipo, 1))
+        self.encuentro = None
+        self.estado = 'explorar'
+        return self.mapa()
+
+    def _menu_combate(self):
+        propio, salvaje = self.jugador.pokemon_actual, self.encuentro.salvaje
+        return (f"Tu {propio.nombre}: {propio.hp_actual}/{propio.hp_max} HP\n"
+                f"{salvaje.nombre} salvaje: {salvaje.hp_actual}/{salvaje.hp_max} HP\n"
+                "¿Qué deseas hacer?\n1. Luchar\n2. Estado\n3. Huir")
+
+    async def _en_combate(self, orden):
+        if orden == '1':
+            self.estado = 'movimiento'
+            return "Elige un movimiento:\n" + "\n".join(
+                f"{i}. {m.nombre} ({m.tipo})" for i, m in enumerate(self.jugador.pokemon_actual.movimientos, 1))
+        if orden == '2':
+            p = self.jugador.pokemon_actual
+            return (f"{p.nombre}: {p.hp_actual}/{p.hp_max} HP, tipo {p.tipo}, habilidad {p.cuackhabilidad()}\n"
+                    + self._menu_combate())
+        if orden == '3':
+            return self.encuentro.huir() + "\n" + self._siguiente()
+        return "Opción no válida\n" + self._menu_combate()
+
+    async def _en_movimiento(self, orden):
+        if not (orden.isdigit() and 1 <= int(orden) <= len(self.jugador.pokemon_actual.movimientos)):
+            self.estado = 'combate'
+            return "Movimiento no válido\n" + self._menu_combate()
+        lineas = self.encuentro.atacar(int(orden) - 1)
+        if self.encuentro.fase == 'salvaje':
+            lineas += self.encuentro.turno_salvaje(await self._movimiento_salvaje())
+        return "\n".join(lineas + [self._siguiente()])
+
+    async def _movimiento_salvaje(self):
+        motor = self.encuentro.motor
+        if self.pool is None:
+            return motor.elegir_movimiento_salvaje()
+        semilla = motor.rng_politica.getrandbits(64)
+        return await asyncio.get_running_loop().run_in_executor(
+            self.pool, _decidir_en_proceso, motor.salvaje, self.jugador.pokemon_actual, semilla)
+
+    async def _en_cambio(self, orden):
+        idx = int(orden) - 1 if orden.isdigit() else None
+        return self.encuentro.cambiar(idx) + "\n" + self._siguiente()
+
+
+class ServidorJuego:
+    """
+    Muchas SesionJuego en un solo bucle de asyncio, una por conexión TCP o de socket
+    local. Protocolo de líneas: el cliente manda una orden por línea y cada respuesta
+    termina con INDICADOR. Con procesos > 0 las decisiones del salvaje (por ejemplo
+    con PoliticaExpectimax) se calculan en un ProcessPoolExecutor.
+    """
+
+    def __init__(self, politica_salvaje=None, procesos=0, registro_combates=None, almacen=None,
+                 tamano_mapa=15, num_salvajes=5):
+        self.politica_salvaje = politica_salvaje or politica_aleatoria
+        self.pool = None
+        if procesos:
+            self.pool = ProcessPoolExecutor(procesos, initializer=_iniciar_proceso_ia,
+                                            initargs=(self.politica_salvaje,))
+            # Arrancar ya los procesos, antes de abrir ningún socket: si se bifurcasen con
+            # conexiones abiertas heredarían sus descriptores y los clientes no verían el
+            # cierre. Con fork el primer envío lanza los `procesos` a la vez; con spawn o
+            # forkserver se crean a demanda, pero esos no heredan los sockets.
+            for tarea in [self.pool.submit(int) for _ in range(procesos)]:
+                tarea.result()
+        self.registro_combates = registro_combates
+        self.almacen = almacen
+        # Un solo hilo: el almacén tiene una conexión y no admite dos transacciones a la vez
+        self.guardados = ThreadPoolExecutor(1) if almacen is not None else None
+        self.tamano_mapa = tamano_mapa
+        self.num_salvajes = num_salvajes
+        self.sesiones = 0
+        self.ordenes = 0
+
+    async def atender(self, lector, escritor):
+        sesion = SesionJuego(self.politica_salvaje, self.pool, self.registro_combates, self.almacen,
+                             self.tamano_mapa, self.num_salvajes, self.guardados)
+        self.sesiones += 1
+        try:
+            escritor.write((sesion.bienvenida() + INDICADOR).encode('utf-8'))
+            while not sesion.terminada:
+                linea = await lector.readline()
+                if not linea:
+                    break
+                respuesta = await sesion.procesar(linea.decode('utf-8', 'replace'))
+                self.ordenes += 1
+                escritor.write((respuesta + ("\n" if sesion.terminada else INDICADOR)).encode('utf-8'))
+                await escritor.drain()
+        except ConnectionError:
+            pass
+        except Exception as e:
+            # Una sesión rota no debe tumbar al resto: se avisa y se cierra solo esa
+            print(f"Sesión cerrada por error: {e!r}", file=sys.stderr)
+        finally:
+            self.sesiones -= 1
+            escritor.close()
+
+    async def iniciar(self, host=HOST_SERVIDOR, puerto=PUERTO_SERVIDOR, ruta_socket=None):
+        """Empieza a aceptar conexiones (en ruta_socket si se da, si no por TCP) y devuelve el servidor de asyncio."""
+        if ruta_socket is not None:
+            return await asyncio.start_unix_server(self.atender, path=ruta_socket, backlog=4096)
+        return await asyncio.start_server(self.atender, host, puerto, backlog=4096)
+
+    def cerrar(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+        if self.guardados is not None:
+            self.guardados.shutdown()
+
+
+async def _bot(conectar, ordenes, semilla, latencias, pausa_media):
+    """Un cliente que crea partida, pasea y lucha siempre con el primer movimiento."""
+    rng = random.Random(semilla)
+    # Los jugadores no llegan ni teclean todos a la vez
+    await asyncio.sleep(rng.uniform(0, 2 * pausa_media))
+    lector, escritor = await conectar()
+    respuesta = (await lector.readuntil(INDICADOR.encode())).decode('utf-8')
+    siguientes = [f"bot{semilla}", "1"]
+    for _ in range(ordenes):
+        if siguientes:
+            orden = siguientes.pop(0)
+        elif "¿Qué deseas hacer?" in respuesta or "Elige un movimiento" in respuesta or "Elige otro" in respuesta:
+            orden = "1"
+        else:
+            orden = rng.choice("wasd")
+        if pausa_media:
+            await asyncio.sleep(rng.expovariate(1 / pausa_media))
+        inicio = time.perf_counter()
+        escritor.write(f"{orden}\n".encode('utf-8'))
+        respuesta = (await lector.readuntil(INDICADOR.encode())).decode('utf-8')
+        latencias.append(time.perf_counter() - inicio)
+    # Salir del combate si hace falta y despedirse
+    while "¿Qué deseas hacer?" in respuesta or "Elige" in respuesta:
+        escritor.write(b"3\n" if "¿Qué deseas hacer?" in respuesta else b"1\n")
+        respuesta = (await lector.readuntil(INDICADOR.encode())).decode('utf-8')
+    escritor.write(b"v\n")
+    await lector.read()
+    escritor.close()
+
+
+async def generar_carga(conectar, bots=1000, ordenes=20, pausa_media=0.0):
+    """
+    Lanza bots clientes contra un servidor; conectar() abre una conexión y devuelve
+    (lector, escritor). Cada bot espera de media pausa_media segundos antes de cada
+    orden, como un jugador pensando. Devuelve las latencias de todas las órdenes en segundos.
+    """
+    latencias = []
+    await asyncio.gather(*(_bot(conectar, ordenes, i, latencias, pausa_media) for i in range(bots)))
+    return latencias
+
+
+def mostrar_reporte_carga(latencias, duracion, bots):
+    latencias = sorted(latencias)
+
+    def percentil(p):
+        return latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000
+
+    print(f"{bots} bots, {len(latencias):,} órdenes en {duracion:.2f}s ({len(latencias) / duracion:,.0f} órdenes/s): "
+          f"p50 {percentil(0.5):.2f} ms, p99 {percentil(0.99):.2f} ms, máx {latencias[-1] * 1000:.2f} ms")
+
+
+def benchmark_servidor(bots=1000, ordenes=20, pausa_media=0.5):
+    async def probar(servidor, bots):
+        directorio = tempfile.mkdtemp()
+        ruta = os.path.join(directorio, 'servidor.sock')
+        try:
+            servidor_asyncio = await servidor.iniciar(ruta_socket=ruta)
+            inicio = time.perf_counter()
+            latencias = await generar_carga(lambda: asyncio.open_unix_connection(ruta, limit=2 ** 20),
+                                            bots, ordenes, pausa_media)
+            duracion = time.perf_counter() - inicio
+            while servidor.sesiones:
+                await asyncio.sleep(0.01)
+            servidor_asyncio.close()
+            await servidor_asyncio.wait_closed()
+            return latencias, duracion
+        finally:
+            shutil.rmtree(directorio)
+
+    for nombre, servidor, n in (("azar", ServidorJuego(), bots),
+                                ("expectimax en 2 procesos",
+                                 ServidorJuego(PoliticaExpectimax(presupuesto=0.005), procesos=2), bots // 10)):
+        try:
+            latencias, duracion = asyncio.run(probar(servidor, n))
+        finally:
+            servidor.cerrar()
+        print(f"Servidor ({nombre}, {pausa_media * 1000:.0f} ms entre órdenes): ", end="")
+        mostrar_reporte_carga(latencias, duracion, n)
+
+
+# -----------------------------
+# Emparejamiento PvP
+# -----------------------------
+RATING_INICIAL = 1500
+
+
+def combate_equipos(jugador_a, jugador_b, rng=random, politica_a=politica_aleatoria,
+                    politica_b=politica_aleatoria, max_turnos=2000):
+    """
+    Combate entre los equipos de dos jugadores con las reglas de cuackatacar, sin
+    entrada ni pausas. Todos empiezan con la vida llena; A ataca primero y, cuando un
+    Pokémon cae, sale el siguiente de su equipo en el turno siguiente. Es un combate
+    amistoso: al acabar cada Pokémon vuelve a los PS que tenía. Devuelve (ganador, turnos)
+    con ganador 'a', 'b' o None si se agotan los turnos.
+    """
+    equipo_a, equipo_b = jugador_a.equipo, jugador_b.equipo
+    if not equipo_a or not equipo_b:
+        raise ValueError("Los dos jugadores necesitan al menos un Pokémon")
+    hp_previos = [p.hp_actual for p in equipo_a] + [p.hp_actual for p in equipo_b]
+    for p in equipo_a + equipo_b:
+        p.hp_actual = p.hp_max
+    try:
+        ia = ib = 0
+        turnos = 0
+        while turnos < max_turnos:
+            turnos += 1
+            a, b = equipo_a[ia], equipo_b[ib]
+            a.cuackatacar(politica_a(a, b, rng), b, rng)
+            if b.hp_actual <= 0:
+                ib += 1
+                if ib == len(equipo_b):
+                    return 'a', turnos
+                continue
+            b.cuackatacar(politica_b(b, a, rng), a, rng)
+            if a.hp_actual <= 0:
+                ia += 1
+                if ia == len(equipo_a):
+                    return 'b', turnos
+        return None, turnos
+    finally:
+        for p, hp in zip(equipo_a + equipo_b, hp_previos):
+            p.hp_actual = hp
+
+
+def actualizar_elo(rating_a, rating_b, resultado_a, k=32):
+    """Ratings nuevos tras un combate; resultado_a es 1 si gana A, 0 si pierde y 0.5 si empatan."""
+    esperado_a = 1 / (1 + 10 ** ((rating_b - rating_a) / 400))
+    cambio = k * (resultado_a - esperado_a)
+    return rating_a + cambio, rating_b - cambio
+
+
+class EnCola:
+    __slots__ = ('clave', 'rating', 'cubo', 'llegada', 'orden')
+
+    def __init__(self, clave, rating, cubo, llegada, orden):
+        self.clave = clave
+        self.rating = rating
+        self.cubo = cubo
+        self.llegada = llegada
+        self.orden = orden
+
+
+def _antiguedad(entrada):
+    return entrada.llegada, entrada.orden
+
+
+class ColaEmparejamiento:
+    """
+    Jugadores esperando rival, repartidos en cubos de ancho_cubo puntos de rating. Cada
+    cubo es un montículo por hora de llegada, así que su cabeza es quien más lleva
+    esperando. Un jugador acepta rivales de su cubo y, por cada intervalo segundos de
+    espera, de un cubo vecino más a cada lado (hasta max_cubos).
+
+    Encolar, cancelar y emparejar a uno cuestan O(log n): se miran como mucho
+    2 * max_cubos + 1 cabezas de montículo. Las bajas son perezosas: cancelar solo
+    quita la clave de esperando y las entradas viejas se descartan al llegar a la cabeza.
+    """
+
+    def __init__(self, ancho_cubo=100, intervalo=5.0, max_cubos=5, reloj=time.monotonic):
+        self.ancho_cubo = ancho_cubo
+        self.intervalo = intervalo
+        self.max_cubos = max_cubos
+        self.reloj = reloj
+        # Los montículos guardan (llegada, orden, EnCola): se comparan tuplas en C y orden
+        # es único, así que nunca se llega a comparar la entrada
+        self.cubos = {}  # cubo -> montículo
+        self.llegadas = []  # todos, por orden de llegada, para emparejar() a los que más esperan
+        self.esperando = {}  # clave -> EnCola vigente
+        self.contador = 0
+
+    def __len__(self):
+        return len(self.esperando)
+
+    def __contains__(self, clave):
+        return clave in self.esperando
+
+    def ventana(self, entrada, ahora):
+        """Cuántos cubos a cada lado acepta la entrada tras lo que lleva esperando."""
+        return min(self.max_cubos, int((ahora - entrada.llegada) / self.intervalo))
+
+    def _cabeza(self, cubo, excepto=None):
+        """El que más espera en un cubo (sin contar a excepto), limpiando las bajas."""
+        monticulo = self.cubos.get(cubo)
+        if not monticulo:
+            return None
+        self._limpiar(monticulo)
+        if not monticulo:
+            del self.cubos[cubo]
+            return None
+        if monticulo[0][2] is not excepto:
+            return monticulo[0][2]
+        # La cabeza es quien busca: se aparta un momento para ver al siguiente. El cubo
+        # no se borra aunque no quede nadie más, porque quien busca vuelve a él
+        propia = heapq.heappop(monticulo)
+        try:
+            self._limpiar(monticulo)
+            return monticulo[0][2] if monticulo else None
+        finally:
+            heapq.heappush(monticulo, propia)
+
+    def _limpiar(self, monticulo):
+        """Descarta las bajas que haya en la cabeza del montículo."""
+        esperando = self.esperando
+        while monticulo and esperando.get(monticulo[0][2].clave) is not monticulo[0][2]:
+            heapq.heappop(monticulo)
+
+    def _buscar(self, entrada, ventana):
+        """Rival para entrada en su cubo o en los vecinos hasta ventana; prefiere el más cercano."""
+        centro = entrada.cubo
+        for distancia in range(ventana + 1):
+            candidatos = [c for c in ((self._cabeza(centro - distancia, entrada),
+                                       self._cabeza(centro + distancia, entrada)) if distancia else
+                                      (self._cabeza(centro, entrada),)) if c is not None]
+            if candidatos:
+                return min(candidatos, key=_antiguedad)
+        return None
+
+    def _quitar(self, entrada):
+        del self.esperando[entrada.clave]
+
+    def encolar(self, clave, rating, ahora=None, buscar=True):
+        """
+        Pone a clave en la cola. Si buscar es cierto y hay alguien en su mismo cubo, lo
+        empareja en el acto y devuelve la clave del rival (ninguno de los dos queda en
+        la cola); si no, devuelve None y espera a emparejar().
+        """
+        if clave in self.esperando:
+            raise ValueError(f"{clave!r} ya está en la cola")
+        ahora = self.reloj() if ahora is None else ahora
+        self.contador += 1
+        entrada = EnCola(clave, rating, int(rating // self.ancho_cubo), ahora, self.contador)
+        if buscar:
+            rival = self._buscar(entrada, 0)
+            if rival is not None:
+                self._quitar(rival)
+                return rival.clave
+        self.esperando[clave] = entrada
+        elemento = (ahora, self.contador, entrada)
+        heapq.heappush(self.cubos.setdefault(entrada.cubo, []), elemento)
+        heapq.heappush(self.llegadas, elemento)
+        return None
+
+    def cancelar(self, clave):
+        """Saca a clave de la cola; devuelve False si no estaba."""
+        return self.esperando.pop(clave, None) is not None
+
+    def emparejar(self, ahora=None, limite=None):
+        """
+        Empareja empezando por quien más espera, cada uno con la ventana que le toca.
+        Al que más espera le toca la ventana más ancha, así que el rival también lo
+        acepta. Se para al llegar a quien aún no ha ensanchado (esos ya se buscaron al
+        encolar) o tras limite parejas. Devuelve una lista de (clave, clave_rival).
+        """
+        ahora = self.reloj() if ahora is None else ahora
+        parejas, sin_rival = [], []
+        llegadas, esperando = self.llegadas, self.esperando
+        while llegadas and (limite is None or len(parejas) < limite):
+            entrada = llegadas[0][2]
+            if esperando.get(entrada.clave) is not entrada:
+                heapq.heappop(llegadas)
+                continue
+            ventana = self.ventana(entrada, ahora)
+            if ventana == 0:
+                break
+            elemento = heapq.heappop(llegadas)
+            rival = self._buscar(entrada, ventana)
+            if rival is None:
+                sin_rival.append(elemento)
+                continue
+            self._quitar(entrada)
+            self._quitar(rival)
+            parejas.append((entrada.clave, rival.clave))
+        for elemento in sin_rival:
+            heapq.heappush(llegadas, elemento)
+        return parejas
+
+
+class ServicioEmparejamiento:
+    """
+    Busca rival a los jugadores según su rating (Elo), los hace combatir con
+    combate_equipos y apunta el resultado en su historial_combates. Los jugadores se
+    identifican por nombre, como en AlmacenPartidas.
+    """
+
+    def __init__(self, cola=None, politica=politica_aleatoria, semilla=None, k=32):
+        self.cola = cola or ColaEmparejamiento()
+        self.politica = politica
+        self.rng = random.Random(semilla)
+        self.k = k
+        self.ratings = {}
+        self.jugadores = {}  # nombre -> Jugador, mientras espera
+
+    def rating(self, nombre):
+        return self.ratings.get(nombre, RATING_INICIAL)
+
+    def buscar_rival(self, jugador, ahora=None):
+        """Pone al jugador en la cola; si encuentra rival al momento, combate y devuelve el resultado."""
+        if not jugador.equipo:
+            raise ValueError("Hace falta al menos un Pokémon para combatir")
+        rival = self.cola.encolar(jugador.nombre, self.rating(jugador.nombre), ahora)
+        if rival is None:
+            self.jugadores[jugador.nombre] = jugador
+            return None
+        return self.combatir(self.jugadores.pop(rival), jugador)
+
+    def cancelar(self, jugador):
+        self.jugadores.pop(jugador.nombre, None)
+        return self.cola.cancelar(jugador.nombre)
+
+    def emparejar(self, ahora=None, limite=None):
+        """Empareja a los que llevan tiempo esperando y devuelve los resultados de sus combates."""
+        return [self.combatir(self.jugadores.pop(a), self.jugadores.pop(b))
+                for a, b in self.cola.emparejar(ahora, limite)]
+
+    def combatir(self, jugador_a, jugador_b):
+        """Combate A (que ataca primero) contra B y devuelve (ganador, turnos, rating_a, rating_b)."""
+        ganador, turnos = combate_equipos(jugador_a, jugador_b, self.rng, self.politica, self.politica)
+        resultado_a = {'a': 1, 'b': 0, None: 0.5}[ganador]
+        rating_a, rating_b = actualizar_elo(self.rating(jugador_a.nombre), self.rating(jugador_b.nombre),
+                                           resultado_a, self.k)
+        self.ratings[jugador_a.nombre] = rating_a
+        self.ratings[jugador_b.nombre] = rating_b
+        for jugador, rival, resultado in ((jugador_a, jugador_b, resultado_a), (jugador_b, jugador_a, 1 - resultado_a)):
+            texto = {1: "Victoria", 0: "Derrota", 0.5: "Empate"}[resultado]
+            jugador.historial_combates.append(f"{texto} PvP contra {rival.nombre}")
+        return ganador, turnos, rating_a, rating_b
+
+
+def benchmark_emparejamiento(jugadores=100_000, combates=2000):
+    rng = random.Random(0)
+    ahora = 0.0
+    cola = ColaEmparejamiento(reloj=lambda: ahora)
+    ratings = [rng.gauss(RATING_INICIAL, 300) for _ in range(2 * jugadores)]
+
+    def percentil(tiempos, p):
+        tiempos = sorted(tiempos)
+        return tiempos[min(len(tiempos) - 1, int(len(tiempos) * p))] * 1e6
+
+    def medir(nombre, tiempos):
+        print(f"  {nombre}: mediana {percentil(tiempos, 0.5):.2f} µs, p99 {percentil(tiempos, 0.99):.2f} µs, "
+              f"máx {max(tiempos) * 1e6:.0f} µs")
+
+    # Llenar la cola sin emparejar para tener jugadores esperando
+    tiempos = []
+    reloj = time.perf_counter
+    for i in range(jugadores):
+        inicio = reloj()
+        cola.encolar(i, ratings[i], buscar=False)
+        tiempos.append(reloj() - inicio)
+    print(f"Emparejamiento con {len(cola):,} jugadores en cola ({len(cola.cubos)} cubos de {cola.ancho_cubo} puntos):")
+    medir("Encolar sin rival", tiempos)
+
+    # Cada llegada nueva encuentra rival en su cubo y lo saca de la cola
+    tiempos, emparejados = [], 0
+    for i in range(jugadores, jugadores + jugadores // 2):
+        inicio = reloj()
+        rival = cola.encolar(i, ratings[i])
+        tiempos.append(reloj() - inicio)
+        emparejados += rival is not None
+    medir(f"Encolar y emparejar en el acto ({emparejados:,} de {jugadores // 2:,})", tiempos)
+
+    tiempos = []
+    for clave in rng.sample(sorted(cola.esperando), 10_000):
+        inicio = reloj()
+        cola.cancelar(clave)
+        tiempos.append(reloj() - inicio)
+    medir("Cancelar", tiempos)
+
+    # Con el tiempo las ventanas se ensanchan y emparejar() vacía la cola
+    quedaban = len(cola)
+    for segundos in (5, 10, 15, 30):
+        ahora = segundos
+        inicio = reloj()
+        parejas = cola.emparejar()
+        duracion = reloj() - inicio
+        if parejas:
+            print(f"  A los {segundos:>2}s: {len(parejas):,} parejas en {duracion * 1000:.1f} ms "
+                  f"({duracion / len(parejas) * 1e6:.2f} µs por pareja), quedan {len(cola):,}")
+    print(f"  Quedaban {quedaban:,}, sin rival al final: {len(cola):,}")
+
+    # Combates entre equipos completos a través del servicio
+    servicio = ServicioEmparejamiento(semilla=1)
+    equipos = []
+    for i in range(2 * combates):
+        jugador = Jugador(f"pvp{i}")
+        for especie in rng.sample(ESPECIES, rng.randint(1, 6)):
+            jugador.agregar_pokemon(especie())
+        equipos.append(jugador)
+    inicio = reloj()
+    for jugador in equipos:
+        servicio.buscar_rival(jugador, ahora=0.0)
+    for segundos in range(5, 31, 5):
+        servicio.emparejar(ahora=float(segundos))
+    duracion = reloj() - inicio
+    jugados = sum(len(j.historial_combates) for j in equipos) // 2
+    print(f"  {jugados:,} combates de equipos en {duracion:.2f}s ({jugados / duracion:,.0f}/s); "
+          f"ejemplo: {equipos[0].nombre} -> {equipos[0].historial_combates[:1]}, "
+          f"rating {servicio.rating(equipos[0].nombre):.0f}")
+
+
+# Benchmarks disponibles con: python "pokemon IA.py" bench <nombre>
+BENCHMARKS = {
+    'simulador': benchmark_simulador,
+    'vectorizado': benchmark_vectorizado,
+    'torneo': benchmark_torneo,
+    'efectividad': benchmark_efectividad,
+    'memoria': benchmark_memoria,
+    'mapa': benchmark_mapa,
+    'renderizado': benchmark_renderizado,
+    'paso': benchmark_paso,
+    'guardado': benchmark_guardado,
+    'almacen': benchmark_almacen,
+    'ia': benchmark_ia,
+    'exacto': benchmark_exacto,
+    'tabla_danio': benchmark_tabla_danio,
+    'repeticion': benchmark_repeticion,
+    'sesion': benchmark_sesion,
+    'catalogo': benchmark_catalogo,
+    'aparicion': benchmark_aparicion,
+    'mundo': benchmark_mundo,
+    'servidor': benchmark_servidor,
+    'emparejamiento': benchmark_emparejamiento,
+}
 
 
 # -----------------------------
@@ -688,8 +3963,90 @@ class Juego:
 # -----------------------------
 
 def main():
-    juego = Juego()
-    juego.menu_principal()
+    args = sys.argv[1:]
+    if args and args[0] == 'simular':
+        # python "pokemon IA.py" simular [combates por pareja] [semilla]
+        n = int(args[1]) if len(args) > 1 else 1000
+        semilla = int(args[2]) if len(args) > 2 else 0
+        mostrar_reporte_simulacion(simular_matriz(n=n, semilla=semilla))
+        return
+    if args and args[0] == 'torneo':
+        # python "pokemon IA.py" torneo [combates por pareja] [semilla] [procesos] [archivo de progreso]
+        n = int(args[1]) if len(args) > 1 else 10000
+        semilla = int(args[2]) if len(args) > 2 else 0
+        procesos = int(args[3]) if len(args) > 3 else None
+        archivo = args[4] if len(args) > 4 else 'torneo_progreso.jsonl'
+        mostrar_reporte_torneo(ejecutar_torneo(n, semilla, procesos, archivo_progreso=archivo))
+        return
+    if args and args[0] == 'verificar':
+        # python "pokemon IA.py" verificar [archivo de combates]
+        correctos, fallidos = RegistroCombates(args[1] if len(args) > 1 else None).verificar()
+        print(f"{correctos} combates reproducidos correctamente, {fallidos} distintos")
+        return
+    if args and args[0] == 'servidor':
+        # python "pokemon IA.py" servidor [puerto] [procesos de IA] [host]
+        puerto = int(args[1]) if len(args) > 1 else PUERTO_SERVIDOR
+        procesos = int(args[2]) if len(args) > 2 else 0
+        host = args[3] if len(args) > 3 else HOST_SERVIDOR
+        almacen = AlmacenPartidas()
+        servidor = ServidorJuego(PoliticaExpectimax() if procesos else None, procesos,
+                                 RegistroCombates(ruta_combates(almacen)), almacen)
+
+        async def servir():
+            servidor_asyncio = await servidor.iniciar(host, puerto)
+            print(f"Servidor escuchando en {host}:{puerto}")
+            async with servidor_asyncio:
+                await servidor_asyncio.serve_forever()
+        try:
+            asyncio.run(servir())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.cerrar()
+        return
+    if args and args[0] == 'carga':
+        # python "pokemon IA.py" carga [bots] [órdenes por bot] [segundos entre órdenes] [host] [puerto]
+        bots = int(args[1]) if len(args) > 1 else 1000
+        ordenes = int(args[2]) if len(args) > 2 else 20
+        pausa = float(args[3]) if len(args) > 3 else 0.5
+        host = args[4] if len(args) > 4 else HOST_SERVIDOR
+        puerto = int(args[5]) if len(args) > 5 else PUERTO_SERVIDOR
+        inicio = time.perf_counter()
+        latencias = asyncio.run(generar_carga(lambda: asyncio.open_connection(host, puerto, limit=2 ** 20),
+                                              bots, ordenes, pausa))
+        mostrar_reporte_carga(latencias, time.perf_counter() - inicio, bots)
+        return
+    if args and args[0] == 'bench':
+        nombres = args[1:] or list(BENCHMARKS)
+        for nombre in nombres:
+            BENCHMARKS[nombre]()
+        return
+
+    # python "pokemon IA.py" [mundo] [archivo RUTA] [rapido | guion archivo]
+    mundo = None
+    if args and args[0] == 'mundo':
+        mundo = MundoTrozos()
+        args = args[1:]
+    almacen = None
+    if len(args) > 1 and args[0] == 'archivo':
+        # Una sola partida en RUTA (y RUTA.historial) en vez de la base de partidas
+        almacen = MotorGuardado(args[1])
+        args = args[2:]
+    if args and args[0] == 'rapido':
+        ritmo = Ritmo('rapido')
+    elif args and args[0] == 'guion':
+        ritmo = Ritmo('guion', args[1])
+    else:
+        ritmo = Ritmo()
+    juego = Juego(ritmo=ritmo, mundo=mundo, almacen=almacen)
+    try:
+        juego.menu_principal()
+    except EOFError:
+        # Se acabó el guion o la entrada redirigida: se sale sin traza
+        print("\nFin de la entrada. ¡Hasta pronto!")
+    finally:
+        if mundo is not None:
+            mundo.cerrar()
 
 
 if __name__ == "__main__":
@@ -1,5 +1,5 @@
 """
-PyRPG - Sistema de Gestión de Aventuras RPG (conserva en JSON)
+PyRPG - Sistema de Gestión de Aventuras RPG (conserva en SQLite; un players.json antiguo se migra solo)
 Mejoras:
 - Menús y elecciones totalmente numéricas (consistencia).
 - Si el usuario ingresa una opción inválida: vuelve al menú padre.
@@ -7,10 +7,32 @@ Mejoras:
 Ejecutar: python pyrpg.py
 """
 
+import atexit
+import bisect
+import contextlib
+import hashlib
+import io
+import itertools
 import json
 import os
 import random
+import shutil
+import sqlite3
+import struct
 import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+# Bloqueos entre procesos con fcntl; donde no existe (Windows) no se bloquea
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 # Intentar usar colorama si está disponible (opcional)
 try:
@@ -21,27 +43,940 @@ except Exception:
     def c(text, color=None): return text
 
 PLAYERS_FILE = "players.json"
+PLAYERS_DB = "players.db"
+FLUSH_INTERVAL = 10.0  # segundos que un cambio puede esperar en memoria (se mira al guardar y en cada menú)
+FLUSH_THRESHOLD = 200  # jugadores modificados que fuerzan la escritura antes
+PAGE_SIZE = 10         # jugadores por página al cargar partida
 
 # -------------------------
 # Utilidades de almacenamiento
 # -------------------------
-def load_all_players():
-    if not os.path.exists(PLAYERS_FILE):
+def read_players_file(path):
+    if not os.path.exists(path):
         return {}
-    with open(PLAYERS_FILE, "r", encoding="utf-8") as f:
+    with open(path, "r", encoding="utf-8") as f:
         try:
             return json.load(f)
         except json.JSONDecodeError:
             return {}
 
+def write_players_file(path, players):
+    """Escribe en un temporal del mismo directorio y lo renombra: o queda el archivo viejo o el nuevo, nunca medio."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".players-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(players, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+@contextmanager
+def locked(f):
+    """Bloqueo exclusivo (consultivo, flock) sobre un archivo abierto mientras dura el with."""
+    if fcntl is None:
+        yield f
+        return
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    try:
+        yield f
+    finally:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def sumar_items(inv, cambios):
+    """Suma cambios (ítem -> cantidad) a un inventario; lo que queda en 0 o menos se quita."""
+    for item, delta in cambios.items():
+        inv[item] = inv.get(item, 0) + delta
+        if inv[item] <= 0:
+            del inv[item]
+
+class VersionConflict(Exception):
+    """Otro proceso guardó al jugador después de que lo leyéramos."""
+
+def check_version(stored, player):
+    """
+    Compare-and-swap de la versión: player["version"] tiene que ser la guardada (None si
+    el jugador es nuevo). Devuelve la versión que le toca tras escribirlo.
+    """
+    esperada = player.get("version")
+    actual = None if stored is None else stored.get("version", 0)
+    if esperada != actual:
+        raise VersionConflict(player["nombre"])
+    return (esperada or 0) + 1
+
+class JsonPlayerFile:
+    """
+    Backend de players.json: todo el archivo en memoria y cada escritura lo reescribe
+    entero. Las escrituras bloquean players.json.lock y releen el archivo antes de
+    cambiarlo, así que dos procesos no se pisan los jugadores.
+    """
+
+    def __init__(self, path=PLAYERS_FILE):
+        self.path = path
+        self.players = None  # se lee la primera vez que hace falta
+        self.leido = None  # (mtime, tamaño) del archivo leído
+
+    def _firma(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def all(self):
+        # Se relee si otro proceso lo ha reescrito
+        if self.players is None or self._firma() != self.leido:
+            self.leido = self._firma()
+            self.players = read_players_file(self.path)
+        return self.players
+
+    def names(self):
+        return list(self.all())
+
+    def names_page(self, prefix="", after=None, limit=PAGE_SIZE):
+        # Aquí no hay índice: se ordena en cada llamada (el archivo ya está entero en memoria)
+        names = sorted(self.all())
+        start = bisect.bisect_right(names, after) if after is not None and after >= prefix else \
+            bisect.bisect_left(names, prefix)
+        return [n for n in names[start:start + limit] if n.startswith(prefix)]
+
+    def load(self, name):
+        player = self.all().get(name)
+        if player is None:
+            return None
+        player = json.loads(json.dumps(player))
+        player.setdefault("version", 0)  # los guardados antes de haber versiones
+        return player
+
+    @contextmanager
+    def _exclusive(self):
+        with open(self.path + ".lock", "a") as f, locked(f):
+            yield self.all()
+
+    def _commit(self, players):
+        write_players_file(self.path, players)
+        self.leido = self._firma()
+
+    def write(self, changes, replaced=()):
+        """
+        changes: nombre -> jugador, o None si hay que borrarlo. Los nombres de replaced se
+        borran antes y su jugador entra como nuevo, sea cual sea su versión. Devuelve
+        los nombres en conflicto.
+        """
+        conflicts = []
+        with self._exclusive() as players:
+            for name, player in changes.items():
+                if player is None:
+                    players.pop(name, None)
+                    continue
+                try:
+                    if name in replaced:
+                        players.pop(name, None)
+                        version = 1
+                    else:
+                        version = check_version(players.get(name), player)
+                except VersionConflict:
+                    conflicts.append(name)
+                    continue
+                player["version"] = version
+                players[name] = json.loads(json.dumps(player))
+            self._commit(players)
+        return conflicts
+
+    def update_player(self, name, cambio):
+        """Aplica cambio(jugador) sobre lo último guardado, con el archivo bloqueado."""
+        with self._exclusive() as players:
+            player = players.get(name)
+            if player is None:
+                return None
+            cambio(player)
+            player["version"] = player.get("version", 0) + 1
+            self._commit(players)
+            return json.loads(json.dumps(player))
+
+    def add_items(self, name, cambios):
+        """Como SQLitePlayerRepository.add_items, con el archivo bloqueado (aquí se reescribe entero)."""
+        player = self.update_player(name, lambda p: sumar_items(p["inventario"], cambios))
+        if player is None:
+            return None
+        return {item: player["inventario"].get(item, 0) for item in cambios}, player["version"]
+
+    def close(self):
+        pass
+
+# -------------------------
+# Diario de decisiones
+# -------------------------
+# Cada registro lleva delante su longitud: un uint16 con cuántos códigos (decisiones) o bytes (textos) siguen
+LONGITUD = struct.Struct("<H")
+# Registro de _indice.log: +1/-1, código y longitud del nombre (que va detrás en UTF-8)
+INDICE = struct.Struct("<bHH")
+CABECERA_INDICE = b"IDX1"
+MAX_NOMBRE_ARCHIVO = 255  # bytes de un nombre de archivo en casi todos los sistemas
+
+class DecisionJournal:
+    """
+    Decisiones de cada jugador en un archivo propio al que solo se añade. Cada texto
+    distinto se guarda una vez en _textos.log y las decisiones son su código (uint16),
+    así que guardar cuesta lo que ocupan las decisiones nuevas, no el historial. Un
+    registro a medio escribir (corte de luz) al final del archivo se ignora al leer.
+
+    _indice.log apunta cada vez que un jugador toma una decisión por primera vez (+1) o
+    deja de tenerla (-1, al deshacer o borrar su diario), así que count_players_with()
+    no abre ningún diario. Los nombres que no caben en hexadecimal como nombre de
+    archivo van por su SHA-256 y se apuntan en _nombres.log para players().
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.textos = []
+        self.codigos = {}
+        self.longitudes = {}  # nombre -> (decisiones, bytes) del diario ya contados
+        self._fin_textos = 0  # bytes de _textos.log ya leídos
+        self._leer_textos()
+        self.codigos_de = {}  # nombre (UTF-8) -> códigos que ha tomado, según _indice.log
+        self.con_codigo = Counter()  # código -> cuántos jugadores lo han tomado
+        self._indice = None
+        self._fin_indice = len(CABECERA_INDICE)
+        self.largos = {}  # nombre de archivo por hash -> nombre del jugador
+        self._fin_nombres = 0
+        self._crear_indice()
+
+    def _leer_textos(self):
+        """Lee los textos que aún no conozca (otro proceso puede haberlos añadido)."""
+        path = os.path.join(self.directory, "_textos.log")
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            f.seek(self._fin_textos)
+            datos = f.read()
+        pos = 0
+        while pos + LONGITUD.size <= len(datos):
+            (n,) = LONGITUD.unpack_from(datos, pos)
+            if pos + LONGITUD.size + n > len(datos):
+                break
+            texto = datos[pos + LONGITUD.size:pos + LONGITUD.size + n].decode("utf-8")
+            self.codigos[texto] = len(self.textos)
+            self.textos.append(texto)
+            pos += LONGITUD.size + n
+        self._fin_textos += pos
+
+    def _codigo(self, texto):
+        codigo = self.codigos.get(texto)
+        if codigo is None:
+            with open(os.path.join(self.directory, "_textos.log"), "ab") as f, locked(f):
+                # Con el archivo bloqueado: puede que otro proceso lo acabe de añadir
+                self._leer_textos()
+                codigo = self.codigos.get(texto)
+                if codigo is None:
+                    if len(self.textos) > 0xFFFF:
+                        raise ValueError("Demasiados textos de decisión distintos para códigos de 16 bits")
+                    datos = texto.encode("utf-8")
+                    f.write(LONGITUD.pack(len(datos)) + datos)
+                    f.flush()
+                    codigo = self.codigos[texto] = len(self.textos)
+                    self.textos.append(texto)
+                    self._fin_textos += LONGITUD.size + len(datos)
+        return codigo
+
+    def _archivo(self, name):
+        # En hexadecimal: cualquier nombre sirve de archivo y se puede recuperar. Si así
+        # no cabe, su SHA-256 (el nombre se recupera de _nombres.log)
+        archivo = name.encode("utf-8").hex() + ".log"
+        if len(archivo) > MAX_NOMBRE_ARCHIVO:
+            archivo = "h-" + hashlib.sha256(name.encode("utf-8")).hexdigest() + ".log"
+        return archivo
+
+    def _path(self, name):
+        return os.path.join(self.directory, self._archivo(name))
+
+    def _path_para_escribir(self, name):
+        """Como _path, apuntando antes en _nombres.log el nombre si va por hash."""
+        archivo = self._archivo(name)
+        if archivo.startswith("h-") and archivo not in self.largos:
+            with open(os.path.join(self.directory, "_nombres.log"), "ab") as f, locked(f):
+                self._leer_nombres()
+                if archivo not in self.largos:
+                    datos = name.encode("utf-8")
+                    f.write(LONGITUD.pack(len(datos)) + datos)
+                    f.flush()
+                    self.largos[archivo] = name
+        return os.path.join(self.directory, archivo)
+
+    def _leer_nombres(self):
+        path = os.path.join(self.directory, "_nombres.log")
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            f.seek(self._fin_nombres)
+            datos = f.read()
+        pos = 0
+        while pos + LONGITUD.size <= len(datos):
+            (n,) = LONGITUD.unpack_from(datos, pos)
+            if pos + LONGITUD.size + n > len(datos):
+                break
+            name = datos[pos + LONGITUD.size:pos + LONGITUD.size + n].decode("utf-8")
+            self.largos[self._archivo(name)] = name
+            pos += LONGITUD.size + n
+        self._fin_nombres += pos
+
+    def _crear_indice(self):
+        """
+        Un directorio de antes del índice: se construye una vez recorriendo los diarios.
+        La cabecera se escribe aunque no haya ninguno, antes de que este proceso añada
+        nada, así que nadie vuelve a contar después lo que se apunte en el índice.
+        """
+        with open(os.path.join(self.directory, "_indice.log"), "ab") as f, locked(f):
+            if f.tell():
+                return
+            f.write(CABECERA_INDICE)
+            for name in self.players():
+                self._escribir_indice(f, name, 1, self._codigos_en(self._path(name)))
+
+    def _leer_indice(self):
+        """Aplica lo que otros procesos (o este) hayan apuntado en _indice.log desde la última vez."""
+        # Abierto siempre: en cada append se mira si hay algo nuevo y casi nunca lo hay
+        if self._indice is None:
+            self._indice = open(os.path.join(self.directory, "_indice.log"), "rb")
+        self._indice.seek(self._fin_indice)
+        datos = self._indice.read()
+        pos = 0
+        while pos + INDICE.size <= len(datos):
+            signo, codigo, n = INDICE.unpack_from(datos, pos)
+            if pos + INDICE.size + n > len(datos):
+                break
+            name = datos[pos + INDICE.size:pos + INDICE.size + n]  # en bytes: no hace falta decodificarlo
+            if signo > 0:
+                self.codigos_de.setdefault(name, set()).add(codigo)
+            else:
+                self.codigos_de.get(name, set()).discard(codigo)
+            self.con_codigo[codigo] += signo
+            pos += INDICE.size + n
+        self._fin_indice += pos
+
+    def _escribir_indice(self, f, name, signo, codigos):
+        datos = name.encode("utf-8")
+        f.write(b"".join(INDICE.pack(signo, codigo, len(datos)) + datos for codigo in sorted(codigos)))
+        f.flush()
+
+    def _ajustar_indice(self, name, codigos, solo_añadir=False):
+        """
+        Deja en el índice que name tiene esos códigos (o, con solo_añadir, también esos),
+        apuntando solo las diferencias. Se llama con el diario del jugador bloqueado, así
+        que nadie más cambia sus entradas mientras tanto.
+        """
+        self._leer_indice()
+        tenia = self.codigos_de.get(name.encode("utf-8"), set())
+        nuevos, quitados = codigos - tenia, set() if solo_añadir else tenia - codigos
+        if nuevos or quitados:
+            with open(os.path.join(self.directory, "_indice.log"), "ab") as f, locked(f):
+                self._escribir_indice(f, name, 1, nuevos)
+                self._escribir_indice(f, name, -1, quitados)
+            self._leer_indice()
+
+    def _codigos_en(self, path):
+        codigos = set()
+        for registro in self._registros(path):
+            codigos.update(registro)
+        return codigos
+
+    @contextmanager
+    def _bloqueado(self, path, modo):
+        """
+        Abre el diario y lo bloquea. Si mientras se esperaba el bloqueo otro proceso lo
+        borró o lo apartó, lo bloqueado ya no es el diario: se vuelve a abrir. Con
+        modo "r+b" y sin diario, FileNotFoundError.
+        """
+        while True:
+            with open(path, modo) as f, locked(f):
+                try:
+                    vigente = os.path.samestat(os.fstat(f.fileno()), os.stat(path))
+                except FileNotFoundError:
+                    vigente = False
+                if vigente:
+                    yield f
+                    return
+
+    def _registros(self, path, desde=0):
+        """Los códigos de cada registro del archivo a partir del byte desde, leyendo a trozos."""
+        for codigos, _ in self._registros_con_fin(path, desde):
+            yield codigos
+
+    def _registros_con_fin(self, path, desde=0):
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(desde)
+            while True:
+                cabecera = f.read(LONGITUD.size)
+                if len(cabecera) < LONGITUD.size:
+                    return
+                (n,) = LONGITUD.unpack(cabecera)
+                datos = f.read(2 * n)
+                if len(datos) < 2 * n:
+                    return
+                codigos = array("H", datos)
+                if sys.byteorder == "big":
+                    codigos.byteswap()  # en disco siempre little-endian, como las cabeceras
+                yield codigos, f.tell()
+
+    def length(self, name):
+        """Decisiones en el diario; solo se leen los registros que aún no se habían contado."""
+        total, leidos = self.longitudes.get(name, (0, 0))
+        for codigos, leidos in self._registros_con_fin(self._path(name), leidos):
+            total += len(codigos)
+        self.longitudes[name] = (total, leidos)
+        return total
+
+    def _append(self, f, name, decisiones):
+        codigos = array("H", map(self._codigo, decisiones))
+        nuevos = set(codigos)
+        if sys.byteorder == "big":
+            codigos.byteswap()
+        f.write(b"".join(LONGITUD.pack(len(trozo)) + trozo.tobytes()
+                         for trozo in (codigos[i:i + 0xFFFF] for i in range(0, len(codigos), 0xFFFF))))
+        f.flush()
+        self._ajustar_indice(name, nuevos, solo_añadir=True)
+
+    def append(self, name, decisiones):
+        """Añade decisiones al diario del jugador en un solo registro por cada 65535."""
+        if decisiones:
+            with self._bloqueado(self._path_para_escribir(name), "ab") as f:
+                self._append(f, name, decisiones)
+
+    def append_new(self, name, decisiones):
+        """
+        Añade solo las decisiones de la lista completa que aún no estén en el diario. Con
+        el archivo del jugador bloqueado, por si otro proceso está añadiendo a la vez.
+        Devuelve el byte donde empezó lo añadido (para undo) o None si no había nada.
+        """
+        with self._bloqueado(self._path_para_escribir(name), "ab") as f:
+            total, leidos = self.longitudes.get(name, (0, 0))
+            tamano = os.fstat(f.fileno()).st_size
+            if tamano != leidos:
+                total = self.length(name)  # otro proceso ha escrito: se leen solo sus registros
+            nuevas = decisiones[total:]
+            if not nuevas:
+                return None
+            self._append(f, name, nuevas)
+            self.longitudes[name] = (total + len(nuevas), f.tell())
+            return tamano
+
+    def undo(self, name, desde):
+        """Deshace un append_new cortando el archivo por donde empezó (si aún existe)."""
+        self.longitudes.pop(name, None)
+        try:
+            with self._bloqueado(self._path(name), "r+b") as f:
+                f.truncate(desde)
+                self._ajustar_indice(name, self._codigos_en(self._path(name)))
+        except FileNotFoundError:
+            pass
+
+    def set_aside(self, name):
+        """
+        Aparta el diario del jugador para empezar uno vacío (un jugador nuevo con el nombre
+        de otro). Devuelve la ruta apartada, para restore() o borrarla, o None si no tenía.
+        """
+        self.longitudes.pop(name, None)
+        path = self._path(name)
+        aside = path + ".old"
+        try:
+            with self._bloqueado(path, "r+b"):
+                # El índice antes que el archivo: quien espere el bloqueo aún no puede
+                # crear un diario nuevo con este nombre y apuntar sus códigos
+                self._ajustar_indice(name, set())
+                os.replace(path, aside)
+        except FileNotFoundError:
+            return None
+        return aside
+
+    def restore(self, name, aside):
+        """Deshace un set_aside: vuelve el diario apartado."""
+        self.longitudes.pop(name, None)
+        with open(aside, "r+b") as f, locked(f):
+            self._ajustar_indice(name, self._codigos_en(aside))
+            os.replace(aside, self._path(name))
+
+    def read(self, name):
+        """Las decisiones del jugador como textos, sin cargar el archivo entero."""
+        for codigos in self._registros(self._path(name)):
+            if codigos and max(codigos) >= len(self.textos):
+                self._leer_textos()  # otro proceso añadió textos nuevos
+            for codigo in codigos:
+                yield self.textos[codigo]
+
+    def delete(self, name):
+        self.longitudes.pop(name, None)
+        path = self._path(name)
+        try:
+            with self._bloqueado(path, "r+b"):
+                self._ajustar_indice(name, set())  # antes que el archivo, como en set_aside
+                os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def players(self):
+        """Nombres de los jugadores con diario, según se recorre el directorio."""
+        with os.scandir(self.directory) as entradas:
+            for entrada in entradas:
+                if not entrada.name.endswith(".log") or entrada.name.startswith("_"):
+                    continue
+                if entrada.name.startswith("h-"):
+                    if entrada.name not in self.largos:
+                        self._leer_nombres()
+                    yield self.largos[entrada.name]
+                else:
+                    yield bytes.fromhex(entrada.name[:-4]).decode("utf-8")
+
+    def count_players_with(self, texto):
+        """Cuántos jugadores tomaron alguna vez esa decisión (p. ej. "Tomó camino oscuro"), según el índice."""
+        self._leer_textos()  # puede que otro proceso lo haya añadido
+        codigo = self.codigos.get(texto)
+        if codigo is None:
+            return 0
+        self._leer_indice()
+        return self.con_codigo[codigo]
+
+    def close(self):
+        if self._indice is not None:
+            self._indice.close()
+            self._indice = None
+
+    def frequencies(self):
+        """Cuántas veces se tomó cada decisión entre todos los jugadores."""
+        cuenta = Counter()
+        for name in self.players():
+            for codigos in self._registros(self._path(name)):
+                cuenta.update(codigos)
+        self._leer_textos()
+        return Counter({self.textos[codigo]: n for codigo, n in cuenta.items()})
+
+PLAYER_FIELDS = ("nombre", "clase", "nivel", "xp", "hp_max", "hp", "ataque", "defensa")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    nombre TEXT PRIMARY KEY,
+    clase TEXT NOT NULL,
+    nivel INTEGER NOT NULL,
+    xp INTEGER NOT NULL,
+    hp_max INTEGER NOT NULL,
+    hp INTEGER NOT NULL,
+    ataque INTEGER NOT NULL,
+    defensa INTEGER NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS inventory (
+    nombre TEXT NOT NULL REFERENCES players(nombre) ON DELETE CASCADE,
+    item TEXT NOT NULL,
+    cantidad INTEGER NOT NULL,
+    PRIMARY KEY (nombre, item)
+) WITHOUT ROWID;
+"""
+
+INSERT_PLAYER = (f"INSERT INTO players ({', '.join(PLAYER_FIELDS)}, version) "
+                 f"VALUES ({', '.join('?' * (len(PLAYER_FIELDS) + 1))})")
+# Compare-and-swap: solo se escribe si nadie lo ha guardado desde que se leyó
+UPDATE_PLAYER = (f"UPDATE players SET {', '.join(f'{field} = ?' for field in PLAYER_FIELDS[1:])}, "
+                 f"version = version + 1 WHERE nombre = ? AND version = ?")
+# Upsert y no INSERT OR REPLACE: REPLACE borra la fila y el borrado se llevaría en cascada el inventario
+UPSERT_PLAYER = (f"INSERT INTO players ({', '.join(PLAYER_FIELDS)}) VALUES ({', '.join('?' * len(PLAYER_FIELDS))}) "
+                 f"ON CONFLICT (nombre) DO UPDATE SET "
+                 + ", ".join(f"{field} = excluded.{field}" for field in PLAYER_FIELDS[1:]))
+
+class SQLitePlayerRepository:
+    """
+    Jugadores en SQLite (modo WAL), una fila por jugador y por ítem del inventario; las
+    decisiones van a un DecisionJournal junto a la base. La tabla del inventario tiene el
+    nombre como prefijo de su clave primaria, así que cargar, cambiar un ítem o borrar a
+    un jugador son búsquedas por índice que no dependen de cuántos jugadores haya.
+
+    Varios procesos pueden usar la misma base: cada jugador lleva un número de versión
+    y se guarda solo si sigue siendo el que se leyó (si no, VersionConflict).
+    update_player() reintenta leer, cambiar y guardar hasta que no hay conflicto.
+    """
+
+    def __init__(self, path=PLAYERS_DB, journal_dir=None):
+        self.path = path
+        self.retries = 0
+        self.db = sqlite3.connect(path, isolation_level=None, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(SCHEMA)
+        if "version" not in {col[1] for col in self.db.execute("PRAGMA table_info(players)")}:
+            self.db.execute("ALTER TABLE players ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        self.journal = DecisionJournal(journal_dir or os.path.splitext(path)[0] + "_decisiones")
+        self._migrate_decision_rows()
+
+    def _migrate_decision_rows(self):
+        """Las bases de antes guardaban las decisiones en una tabla: se pasan al diario y se borra."""
+        if not self.db.execute("SELECT 1 FROM sqlite_master WHERE name = 'decisions'").fetchone():
+            return
+        filas = self.db.execute("SELECT nombre, decision FROM decisions ORDER BY nombre, seq")
+        for name, grupo in itertools.groupby(filas, key=lambda fila: fila[0]):
+            self.journal.append_new(name, [d for _, d in grupo])
+        self.db.execute("DROP TABLE decisions")
+
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM players").fetchone()[0]
+
+    def names(self):
+        """Nombres en orden alfabético, leídos del índice según se van pidiendo."""
+        return (name for (name,) in self.db.execute("SELECT nombre FROM players ORDER BY nombre"))
+
+    def names_page(self, prefix="", after=None, limit=PAGE_SIZE):
+        """
+        Hasta limit nombres que empiezan por prefix, en orden, posteriores a after (el
+        último de la página anterior). Es un rango de la clave primaria: cuesta lo que
+        mide la página, no la posición ni el total de jugadores.
+        """
+        desde = after if after is not None and after >= prefix else prefix
+        operador = ">" if desde == after else ">="
+        return [name for (name,) in self.db.execute(
+            f"SELECT nombre FROM players WHERE nombre {operador} ? AND nombre < ? ORDER BY nombre LIMIT ?",
+            (desde, prefix + "\U0010ffff", limit))]
+
+    def load(self, name):
+        # En una transacción de lectura: la fila y el inventario son de la misma versión
+        with self.transaction("DEFERRED"):
+            row = self.db.execute(f"SELECT {', '.join(PLAYER_FIELDS)}, version FROM players WHERE nombre = ?",
+                                  (name,)).fetchone()
+            if row is None:
+                return None
+            player = dict(zip(PLAYER_FIELDS + ("version",), row))
+            player["inventario"] = dict(self.db.execute(
+                "SELECT item, cantidad FROM inventory WHERE nombre = ?", (name,)))
+        player["decisiones"] = list(self.journal.read(name))
+        return player
+
+    def _save(self, player, replace=False):
+        """
+        Escribe al jugador si su versión es la guardada y devuelve la nueva; si no,
+        VersionConflict. Con replace borra antes lo que hubiera con su nombre y lo
+        inserta como nuevo.
+        """
+        name = player["nombre"]
+        valores = [player[field] for field in PLAYER_FIELDS]
+        version = player.get("version")
+        if replace:
+            # El borrado se lleva en cascada el inventario
+            self.db.execute("DELETE FROM players WHERE nombre = ?", (name,))
+            version = None
+        if version is None:
+            try:
+                self.db.execute(INSERT_PLAYER, valores + [1])
+            except sqlite3.IntegrityError:
+                raise VersionConflict(name) from None
+        elif self.db.execute(UPDATE_PLAYER, valores[1:] + [name, version]).rowcount == 0:
+            raise VersionConflict(name)
+        self.db.execute("DELETE FROM inventory WHERE nombre = ?", (name,))
+        self.db.executemany("INSERT INTO inventory VALUES (?, ?, ?)",
+                            ((name, item, qty) for item, qty in player["inventario"].items()))
+        return (version or 0) + 1
+
+    def save(self, player):
+        if self.write({player["nombre"]: player}):
+            raise VersionConflict(player["nombre"])
+
+    def add_items(self, name, cambios):
+        """
+        Suma a cada casilla del inventario lo que diga cambios (ítem -> cantidad, puede
+        ser negativa; si queda en 0 o menos se quita) y sube la versión del jugador. Solo
+        toca esas filas y la suma la hace SQLite, así que dos partidas añadiendo a la vez
+        no se pisan. Devuelve (ítem -> cantidad final, versión), o None si no existe.
+        """
+        with self.transaction():
+            fila = self.db.execute("UPDATE players SET version = version + 1 WHERE nombre = ? RETURNING version",
+                                   (name,)).fetchall()
+            if not fila:
+                return None
+            cantidades = {}
+            for item, delta in cambios.items():
+                (cantidades[item],) = self.db.execute(
+                    "INSERT INTO inventory VALUES (?, ?, ?) ON CONFLICT (nombre, item) "
+                    "DO UPDATE SET cantidad = cantidad + excluded.cantidad RETURNING cantidad",
+                    (name, item, delta)).fetchall()[0]
+                if cantidades[item] <= 0:
+                    self.db.execute("DELETE FROM inventory WHERE nombre = ? AND item = ?", (name, item))
+        return cantidades, fila[0][0]
+
+    def delete(self, name):
+        self.write({name: None})
+
+    def write(self, changes, replaced=()):
+        """
+        changes: nombre -> jugador, o None si hay que borrarlo. Cada jugador va en su
+        propio savepoint: los que están en conflicto se deshacen y se devuelven sus
+        nombres, y el resto se guarda. Los nombres de replaced son un borrado seguido de
+        un jugador nuevo: se borran fila, inventario y diario y se inserta sin mirar versión.
+
+        Las decisiones se añaden al diario dentro de la transacción, con el bloqueo de
+        escritura: si se añadieran tras el COMMIT, otro proceso podría cargar al jugador
+        antes y guardarlo sin ellas. Si la transacción se deshace, lo añadido se corta
+        (DecisionJournal.undo) y los diarios apartados vuelven; los borrados del diario
+        sí esperan al COMMIT.
+        """
+        conflicts, versiones, añadidos, apartados = [], {}, [], []
+        try:
+            with self.transaction():
+                for name, player in changes.items():
+                    if player is None:
+                        self.db.execute("DELETE FROM players WHERE nombre = ?", (name,))
+                        continue
+                    self.db.execute("SAVEPOINT jugador")
+                    try:
+                        versiones[name] = self._save(player, name in replaced)
+                    except VersionConflict:
+                        self.db.execute("ROLLBACK TO jugador")
+                        conflicts.append(name)
+                    else:
+                        if name in replaced:
+                            aside = self.journal.set_aside(name)
+                            if aside is not None:
+                                apartados.append((name, aside))
+                        desde = self.journal.append_new(name, player["decisiones"])
+                        if desde is not None:
+                            añadidos.append((name, desde))
+                    self.db.execute("RELEASE jugador")
+        except BaseException:
+            for name, desde in añadidos:
+                self.journal.undo(name, desde)
+            for name, aside in apartados:
+                self.journal.restore(name, aside)
+            raise
+        for _, aside in apartados:
+            os.unlink(aside)
+        for name, player in changes.items():
+            if player is None:
+                self.journal.delete(name)
+            elif name in versiones:
+                player["version"] = versiones[name]
+        return conflicts
+
+    def update_player(self, name, cambio, intentos=1000):
+        """
+        Lee al jugador, le aplica cambio(jugador) y lo guarda con compare-and-swap,
+        repitiendo si otro proceso lo guardó entremedias. Devuelve el jugador guardado.
+        """
+        for _ in range(intentos):
+            player = self.load(name)
+            if player is None:
+                return None
+            cambio(player)
+            if not self.write({name: player}):
+                return player
+            self.retries += 1
+        raise VersionConflict(name)
+
+    @contextmanager
+    def transaction(self, modo="IMMEDIATE"):
+        # IMMEDIATE toma el bloqueo de escritura al empezar: sin esperas a mitad ni interbloqueos
+        self.db.execute(f"BEGIN {modo}")
+        try:
+            yield
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    def migrate_from_json(self, path=PLAYERS_FILE, batch=10_000):
+        """
+        Copia todos los jugadores de un players.json; devuelve cuántos se copiaron y los
+        nombres que no (porque ya estaban en la base).
+        """
+        players = read_players_file(path)
+        items = list(players.values())
+        for player in items:
+            player.pop("version", None)  # la versión del JSON no vale aquí: entran como nuevos
+        conflicts = []
+        for start in range(0, len(items), batch):
+            conflicts += self.write({player["nombre"]: player for player in items[start:start + batch]})
+        return len(items) - len(conflicts), conflicts
+
+    def close(self):
+        self.db.close()
+        self.journal.close()
+
+def open_repository(db_path=PLAYERS_DB, json_path=PLAYERS_FILE):
+    """Abre la base de jugadores; la primera vez se trae lo que hubiera en players.json."""
+    nueva = not os.path.exists(db_path)
+    repo = SQLitePlayerRepository(db_path)
+    if nueva and os.path.exists(json_path):
+        n, conflicts = repo.migrate_from_json(json_path)
+        print(f"Migrados {n} jugadores de {json_path} a {db_path}.")
+        if conflicts:
+            print(c(f"No se migraron (ya estaban en la base): {', '.join(conflicts)}", None))
+    return repo
+
+class PlayerStore:
+    """
+    Jugadores cargados en memoria con escritura diferida sobre un backend
+    (SQLitePlayerRepository o JsonPlayerFile). Guardar un jugador solo lo marca como
+    sucio; los sucios se escriben juntos cuando hay flush_threshold o han pasado
+    flush_interval segundos desde la última escritura, y siempre al salir del programa.
+    No hay temporizador: el plazo se comprueba en cada cambio y en cada vuelta de menú
+    (flush_pendientes), así que mientras el juego espera una tecla no se escribe nada.
+    """
+
+    def __init__(self, backend, flush_interval=FLUSH_INTERVAL, flush_threshold=FLUSH_THRESHOLD,
+                 clock=time.monotonic):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.clock = clock
+        self.cache = {}  # nombre -> jugador, o None si está borrado y sin escribir
+        self.dirty = set()
+        # Borrados sin escribir; si luego se guarda otro jugador con el nombre, lo reemplaza
+        self.deleted = set()
+        self.last_flush = clock()
+        self.flushes = 0
+
+    def names(self):
+        self.flush()  # que el backend vea también a los recién creados
+        return self.backend.names()
+
+    def names_page(self, prefix="", after=None, limit=PAGE_SIZE):
+        self.flush()
+        return self.backend.names_page(prefix, after, limit)
+
+    def get(self, name):
+        if name in self.cache:
+            return self.cache[name]
+        player = self.backend.load(name)
+        if player is not None:
+            self.cache[name] = player
+        return player
+
+    def put(self, player):
+        self.cache[player["nombre"]] = player
+        self.dirty.add(player["nombre"])
+        self.maybe_flush()
+
+    def delete(self, name):
+        self.cache[name] = None
+        self.dirty.add(name)
+        self.deleted.add(name)
+        self.maybe_flush()
+
+    def replace(self, player):
+        """Guarda a un jugador nuevo en lugar del que ya tuviera su nombre (borra el viejo y su diario)."""
+        player.pop("version", None)
+        self.delete(player["nombre"])
+        self.put(player)
+
+    def maybe_flush(self):
+        if len(self.dirty) >= self.flush_threshold or self.clock() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.dirty:
+            # Un borrado seguido de put() no se pierde: se escribe como reemplazo
+            replaced = {name for name in self.deleted if self.cache[name] is not None}
+            conflicts = self.backend.write({name: self.cache[name] for name in self.dirty}, replaced)
+            for name in self.dirty:
+                if self.cache[name] is None:
+                    del self.cache[name]
+            self.dirty.clear()
+            self.deleted.clear()
+            self.flushes += 1
+            for name in conflicts:
+                # Otra partida lo guardó antes: manda lo guardado y se avisa de lo que se pierde
+                print(c(f"Aviso: {name} se modificó desde otra partida; se recarga lo guardado.", None))
+                self._refresh(self.cache[name], self.backend.load(name))
+        self.last_flush = self.clock()
+
+    def _refresh(self, player, saved):
+        # Se cambia el mismo diccionario: el juego sigue usando el objeto que ya tenía
+        if saved is not None:
+            player.clear()
+            player.update(saved)
+
+    def update(self, player, cambio):
+        """
+        Aplica cambio(jugador) directamente sobre lo último guardado (con compare-and-swap
+        y reintentos en el backend) y deja el resultado en player. Para cambios que se
+        suman, como añadir ítems, que así no se pierden aunque otra partida escriba a la vez.
+        """
+        # Primero se escribe player tal como está: XP, HP... que el juego haya cambiado sin
+        # guardar aún. Si no, lo guardado sería más viejo y se perdería al recargarlo.
+        name = player["nombre"]
+        self.cache[name] = player
+        self.dirty.add(name)
+        self.flush()
+        saved = self.backend.update_player(name, cambio)
+        if saved is None:
+            # Aún no está en el backend (p. ej. se acaba de borrar): cambio local
+            cambio(player)
+            self.put(player)
+            return
+        self._refresh(player, saved)
+        self.cache[name] = player
+
+    def add_items(self, player, cambios):
+        """
+        Suma cambios (ítem -> cantidad) al inventario con una escritura por casilla en el
+        backend, sin reescribir al jugador. Como update(), no se pierde nada aunque otra
+        partida escriba a la vez, y antes se escribe player tal como está.
+        """
+        name = player["nombre"]
+        self.cache[name] = player
+        self.dirty.add(name)
+        self.flush()
+        hecho = self.backend.add_items(name, cambios)
+        if hecho is None:
+            # Aún no está en el backend (p. ej. se acaba de borrar): cambio local
+            sumar_items(player["inventario"], cambios)
+            self.put(player)
+            return
+        cantidades, version = hecho
+        if version != player.get("version", 0) + 1:
+            # Otra partida lo guardó entremedias: se recarga, ya con los ítems sumados
+            self._refresh(player, self.backend.load(name))
+            return
+        player["version"] = version
+        for item, cantidad in cantidades.items():
+            if cantidad > 0:
+                player["inventario"][item] = cantidad
+            else:
+                player["inventario"].pop(item, None)
+
+    def close(self):
+        self.flush()
+        self.backend.close()
+
+STORE = None
+
+def store():
+    """El almacén del juego, abierto la primera vez que se usa."""
+    global STORE
+    if STORE is None:
+        STORE = PlayerStore(open_repository())
+        atexit.register(STORE.close)
+    return STORE
+
+def load_all_players():
+    return {name: store().get(name) for name in store().names()}
+
 def save_all_players(players):
-    with open(PLAYERS_FILE, "w", encoding="utf-8") as f:
-        json.dump(players, f, indent=2, ensure_ascii=False)
+    for name in set(store().names()) - set(players):
+        store().delete(name)
+    for player in players.values():
+        store().put(player)
+    store().flush()
 
 def save_player(player):
-    players = load_all_players()
-    players[player["nombre"]] = player
-    save_all_players(players)
+    store().put(player)
+
+def flush_pendientes():
+    """En cada vuelta de menú: escribe lo que lleve flush_interval segundos esperando."""
+    if STORE is not None:
+        STORE.maybe_flush()
 
 # -------------------------
 # Helpers de entrada/validación
@@ -82,6 +1017,14 @@ def crear_jugador():
     if not nombre:
         print("Nombre no puede estar vacío.")
         return None
+    existe = store().get(nombre) is not None
+    if existe:
+        print(f"Ya hay un jugador llamado {nombre}. ¿Reemplazarlo por uno nuevo? (se pierde el anterior)")
+        print("1) Sí\n2) No")
+        conf = ask_number("> ", valid_set={1,2})
+        if conf is None or conf == 2:
+            print("Creación cancelada.")
+            return None
     clase = elegir_clase_input()
     if clase is None:
         print("Creación cancelada (entrada inválida).")
@@ -100,23 +1043,57 @@ def crear_jugador():
     }
     player["hp"] = player["hp_max"]
     print(c(f"¡Bienvenido, {player['nombre']} el {player['clase']}!", None))
-    save_player(player)
+    if existe:
+        store().replace(player)
+    else:
+        save_player(player)
     return player
 
 def cargar_jugador():
-    players = load_all_players()
-    if not players:
-        print("No hay jugadores guardados.")
-        return None
-    names = list(players.keys())
-    print("Jugadores disponibles:")
-    for i, name in enumerate(names, 1):
-        print(f"{i}) {name}")
-    idx = ask_number("Elige el número del jugador a cargar: ", valid_set=set(range(1, len(names)+1)))
-    if idx is None:
-        return None
+    # Se pide una página cada vez; pages guarda dónde empieza cada una para poder volver
+    prefix = ""
+    pages = [None]
+    while True:
+        names = store().names_page(prefix, pages[-1], PAGE_SIZE + 1)
+        more = len(names) > PAGE_SIZE
+        names = names[:PAGE_SIZE]
+        if not names and not prefix:
+            print("No hay jugadores guardados.")
+            return None
+        filtro = f" que empiezan por '{prefix}'" if prefix else ""
+        print(f"Jugadores disponibles{filtro} (página {len(pages)}):")
+        if not names:
+            print("Ninguno.")
+        for i, name in enumerate(names, 1):
+            print(f"{i}) {name}")
+        opciones = {}
+        n = len(names)
+        if more:
+            n += 1
+            opciones[n] = "siguiente"
+            print(f"{n}) Página siguiente")
+        if len(pages) > 1:
+            n += 1
+            opciones[n] = "anterior"
+            print(f"{n}) Página anterior")
+        n += 1
+        opciones[n] = "buscar"
+        print(f"{n}) Buscar por nombre")
+        idx = ask_number("Elige el número del jugador a cargar: ", valid_set=set(range(1, n + 1)))
+        if idx is None:
+            return None
+        if idx > len(names):
+            if opciones[idx] == "siguiente":
+                pages.append(names[-1])
+            elif opciones[idx] == "anterior":
+                pages.pop()
+            else:
+                prefix = input("El nombre empieza por: ").strip()
+                pages = [None]
+            continue
+        break
     chosen = names[idx-1]
-    player = players[chosen]
+    player = store().get(chosen)
     print(c(f"Cargado: {player['nombre']} (Nivel {player['nivel']})", None))
     return player
 
@@ -124,11 +1101,8 @@ def cargar_jugador():
 # *args, lambdas y anidadas
 # -------------------------
 def añadir_items(player, *items):
-    inv = player["inventario"]
-    for it in items:
-        inv[it] = inv.get(it, 0) + 1
+    store().add_items(player, Counter(items))
     print("Ítems añadidos:", ", ".join(items))
-    save_player(player)
 
 xp_para_nivel = lambda lvl: 100 * lvl
 
@@ -354,6 +1328,7 @@ def aventura_session(player):
 def main_menu():
     print(c("=== Bienvenido al mundo de PyRPG ===", None))
     while True:
+        flush_pendientes()
         print("\n1) Registrar nuevo jugador\n2) Cargar jugador existente\n3) Salir")
         opt = ask_number("> ", valid_set={1,2,3})
         if opt is None:
@@ -372,6 +1347,7 @@ def main_menu():
 
 def game_loop(player):
     while True:
+        flush_pendientes()
         print(f"\n{player['nombre']} - Clase: {player['clase']} | Nivel: {player['nivel']} | HP: {player['hp']}/{player['hp_max']} | XP: {player['xp']}/{xp_para_nivel(player['nivel'])}")
         print("Menú:")
         print("1) Jugar sesión")
@@ -408,6 +1384,7 @@ def game_loop(player):
         elif opt == 3:
             print("Guardando progreso...")
             save_player(player)
+            store().flush()
             print("Progreso guardado. Volviendo al menú principal.")
             return
         elif opt == 4:
@@ -417,19 +1394,328 @@ def game_loop(player):
             if conf is None or conf == 2:
                 print("Cancelado. Volviendo al menú principal del jugador.")
                 continue
-            players = load_all_players()
-            players.pop(player["nombre"], None)
-            save_all_players(players)
+            store().delete(player["nombre"])
             print("Jugador eliminado.")
             return
         elif opt == 5:
             print("Volviendo al menú principal.")
             return
 
+# -------------------------
+# Benchmarks: python "proyecto final.py" bench <nombre> [jugadores]
+# -------------------------
+def sample_player(i, rng=random):
+    clase = rng.choice(("Guerrero", "Mago", "Explorador"))
+    return {
+        "nombre": f"jugador{i:07d}",
+        "clase": clase,
+        "nivel": rng.randint(1, 20),
+        "xp": rng.randint(0, 99),
+        "hp_max": 25,
+        "hp": 25,
+        "ataque": 8,
+        "defensa": 3,
+        "inventario": crear_inventario_default(),
+        "decisiones": rng.choice((["Tomó camino oscuro", "Taberna", "Luchó con goblin", "Ayudó al aldeano"],
+                                  ["Tomó sendero iluminado", "Mercado", "Huyó del goblin", "No ayudó al aldeano"])),
+    }
+
+def percentil(tiempos, p):
+    tiempos = sorted(tiempos)
+    return tiempos[min(len(tiempos) - 1, int(len(tiempos) * p))]
+
+def benchmark_store(n=100_000, cambios=10_000):
+    rng = random.Random(0)
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "players.json")
+    try:
+        players = {p["nombre"]: p for p in (sample_player(i, rng) for i in range(n))}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(players, f, indent=2, ensure_ascii=False)
+        print(f"Almacén de jugadores con {n:,} jugadores ({os.path.getsize(path) / 2**20:.1f} MiB en disco):")
+
+        # Lo que costaba antes cada cambio de inventario: leer todo, parsear y reescribir con indent=2
+        inicio = time.perf_counter()
+        todos = read_players_file(path)
+        todos[players["jugador0000000"]["nombre"]]["inventario"]["pocion"] += 1
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(todos, f, indent=2, ensure_ascii=False)
+        antes = time.perf_counter() - inicio
+        del todos
+        print(f"  Un cambio reescribiendo players.json: {antes * 1000:.0f} ms")
+
+        almacen = PlayerStore(JsonPlayerFile(path))
+        inicio = time.perf_counter()
+        almacen.backend.all()
+        print(f"  Carga inicial del almacén: {(time.perf_counter() - inicio) * 1000:.0f} ms")
+        nombres = list(players)
+        # Solo el coste de cada cambio; las escrituras se miden aparte
+        almacen.flush_threshold, almacen.flush_interval = float("inf"), float("inf")
+        tiempos = []
+        for _ in range(cambios):
+            player = almacen.get(rng.choice(nombres))
+            inicio = time.perf_counter()
+            player["inventario"]["pocion"] = player["inventario"].get("pocion", 0) + 1
+            almacen.put(player)
+            tiempos.append(time.perf_counter() - inicio)
+        print(f"  Un cambio con escritura diferida: mediana {percentil(tiempos, 0.5) * 1e6:.1f} µs, "
+              f"p99 {percentil(tiempos, 0.99) * 1e6:.1f} µs")
+        sucios = len(almacen.dirty)
+        inicio = time.perf_counter()
+        almacen.flush()
+        escritura = time.perf_counter() - inicio
+        print(f"  Flush de {sucios:,} jugadores sucios (renombrado atómico): {escritura * 1000:.0f} ms, "
+              f"uno cada {FLUSH_THRESHOLD} cambios o {FLUSH_INTERVAL:.0f} s con la configuración por defecto")
+        releido = read_players_file(path)
+        iguales = all(releido[nombre]["inventario"] == almacen.backend.players[nombre]["inventario"] for nombre in nombres)
+        print(f"  Releído del disco igual que en memoria: {'sí' if iguales else 'NO'}")
+    finally:
+        shutil.rmtree(directory)
+
+def fill_repository(repo, n, rng):
+    """Carga masiva directa a las tablas, sin diario de decisiones: mucho más rápida que save() uno a uno."""
+    with repo.transaction():
+        for start in range(0, n, 50_000):
+            lote = [sample_player(i, rng) for i in range(start, min(n, start + 50_000))]
+            repo.db.executemany(UPSERT_PLAYER, ([p[f] for f in PLAYER_FIELDS] for p in lote))
+            repo.db.executemany("INSERT INTO inventory VALUES (?, ?, ?)",
+                                ((p["nombre"], item, qty) for p in lote for item, qty in p["inventario"].items()))
+
+def benchmark_repository(*sizes, operaciones=2000):
+    sizes = sizes or (10_000, 100_000, 1_000_000)
+    directory = tempfile.mkdtemp()
+    try:
+        # La migración desde JSON, con el tamaño más pequeño
+        rng = random.Random(0)
+        json_path = os.path.join(directory, "players.json")
+        write_players_file(json_path, {p["nombre"]: p for p in (sample_player(i, rng) for i in range(sizes[0]))})
+        inicio = time.perf_counter()
+        repo = SQLitePlayerRepository(os.path.join(directory, "migrado.db"))
+        migrados, _ = repo.migrate_from_json(json_path)
+        print(f"Migración de {migrados:,} jugadores desde players.json: {time.perf_counter() - inicio:.2f}s")
+        repo.close()
+
+        for n in sizes:
+            path = os.path.join(directory, f"players-{n}.db")
+            repo = SQLitePlayerRepository(path)
+            inicio = time.perf_counter()
+            fill_repository(repo, n, rng)
+            creacion = time.perf_counter() - inicio
+            tamano = sum(os.path.getsize(f) for f in (path, path + "-wal") if os.path.exists(f))
+            print(f"SQLite con {n:,} jugadores ({tamano / 2**20:.0f} MiB, creada en {creacion:.1f}s):")
+
+            nombres = [f"jugador{rng.randrange(n):07d}" for _ in range(operaciones)]
+
+            def medir(nombre, operacion):
+                tiempos = []
+                for name in nombres:
+                    inicio = time.perf_counter()
+                    operacion(name)
+                    tiempos.append(time.perf_counter() - inicio)
+                print(f"  {nombre}: mediana {percentil(tiempos, 0.5) * 1e6:.0f} µs, "
+                      f"p99 {percentil(tiempos, 0.99) * 1e6:.0f} µs")
+
+            medir("Primera página de 20 nombres", lambda name: list(itertools.islice(repo.names(), 20)))
+            medir("Cargar un jugador", repo.load)
+            medir("Sumar a una casilla del inventario", lambda name: repo.add_items(name, {"pocion": 1}))
+
+            def guardar(name):
+                player = repo.load(name)
+                player["xp"] += 1
+                player["decisiones"].append("Taberna")
+                repo.save(player)
+            medir("Cargar, cambiar y guardar un jugador", guardar)
+            medir("Borrar un jugador", repo.delete)
+            repo.close()
+            os.unlink(path)
+    finally:
+        shutil.rmtree(directory)
+
+def benchmark_listing(*sizes, paginas=2000):
+    sizes = sizes or (10_000, 100_000, 1_000_000)
+    rng = random.Random(0)
+    directory = tempfile.mkdtemp()
+    try:
+        for n in sizes:
+            repo = SQLitePlayerRepository(os.path.join(directory, f"players-{n}.db"))
+            fill_repository(repo, n, rng)
+            print(f"Listado de {n:,} jugadores, páginas de {PAGE_SIZE}:")
+
+            def medir(nombre, pedir):
+                tiempos = []
+                tracemalloc.start()
+                for _ in range(paginas):
+                    inicio = time.perf_counter()
+                    pedir()
+                    tiempos.append(time.perf_counter() - inicio)
+                pico = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print(f"  {nombre}: mediana {percentil(tiempos, 0.5) * 1e6:.0f} µs, "
+                      f"p99 {percentil(tiempos, 0.99) * 1e6:.0f} µs, pico de memoria {pico / 1024:.0f} KiB")
+
+            medir("Primera página", lambda: repo.names_page())
+            medio = f"jugador{n // 2:07d}"
+            medir("Página a mitad de la lista", lambda: repo.names_page(after=medio))
+            medir("Última página", lambda: repo.names_page(after=f"jugador{n - PAGE_SIZE:07d}"))
+            prefijos = [f"jugador{rng.randrange(n) // 1000:04d}" for _ in range(paginas)]
+            medir("Buscar por prefijo (1000 coincidencias)", lambda: repo.names_page(prefijos.pop()))
+            # Recorrer varias páginas seguidas como haría el menú
+            after, vistas = None, 0
+            inicio = time.perf_counter()
+            while vistas < 1000:
+                page = repo.names_page(after=after)
+                if not page:
+                    break
+                after, vistas = page[-1], vistas + 1
+            print(f"  {vistas} páginas seguidas: {(time.perf_counter() - inicio) / vistas * 1e6:.0f} µs por página")
+            repo.close()
+    finally:
+        shutil.rmtree(directory)
+
+def benchmark_journal(jugadores=10_000, sesiones=20):
+    rng = random.Random(0)
+    directory = tempfile.mkdtemp()
+    try:
+        journal = DecisionJournal(directory)
+        historiales = {f"jugador{i:07d}": [] for i in range(jugadores)}
+        por_sesion = {}
+        for sesion in range(1, sesiones + 1):
+            tiempos = []
+            for name, decisiones in historiales.items():
+                decisiones.extend(sample_player(0, rng)["decisiones"])
+                inicio = time.perf_counter()
+                journal.append_new(name, decisiones)
+                tiempos.append(time.perf_counter() - inicio)
+            por_sesion[sesion] = tiempos
+        print(f"Diario de decisiones: {jugadores:,} jugadores, {sesiones} sesiones de 4 decisiones:")
+        for sesion in (1, sesiones):
+            tiempos = por_sesion[sesion]
+            print(f"  Guardar la sesión {sesion:>2}: mediana {percentil(tiempos, 0.5) * 1e6:.0f} µs, "
+                  f"p99 {percentil(tiempos, 0.99) * 1e6:.0f} µs")
+        # Lo que costaría serializar la lista entera en cada guardado, como en players.json
+        inicio = time.perf_counter()
+        for decisiones in historiales.values():
+            json.dumps(decisiones, ensure_ascii=False)
+        lista = (time.perf_counter() - inicio) / jugadores
+        en_json = sum(len(json.dumps(d, ensure_ascii=False).encode("utf-8")) for d in historiales.values())
+        en_diario = sum(e.stat().st_size for e in os.scandir(directory))
+        print(f"  Solo serializar la lista completa en la sesión {sesiones}: {lista * 1e6:.0f} µs por jugador")
+        print(f"  En disco: {en_diario / 2**20:.1f} MiB de diario frente a {en_json / 2**20:.1f} MiB como listas JSON")
+
+        name = next(iter(historiales))
+        releido = DecisionJournal(directory)
+        inicio = time.perf_counter()
+        leidas = list(releido.read(name))
+        print(f"  Leer {len(leidas)} decisiones de un jugador: {(time.perf_counter() - inicio) * 1e6:.0f} µs, "
+              f"iguales: {'sí' if leidas == historiales[name] else 'NO'}")
+        inicio = time.perf_counter()
+        oscuro = releido.count_players_with("Tomó camino oscuro")
+        duracion = time.perf_counter() - inicio
+        esperado = sum("Tomó camino oscuro" in d for d in historiales.values())
+        print(f"  Jugadores que tomaron el camino oscuro: {oscuro:,} (esperado {esperado:,}) en {duracion * 1000:.0f} ms "
+              f"(leyendo el índice entero)")
+        inicio = time.perf_counter()
+        releido.count_players_with("Taberna")
+        print(f"  Otra consulta con el índice ya leído: {(time.perf_counter() - inicio) * 1e6:.0f} µs")
+        inicio = time.perf_counter()
+        frecuencias = releido.frequencies()
+        print(f"  Frecuencia de cada decisión en {(time.perf_counter() - inicio) * 1000:.0f} ms: "
+              + ", ".join(f"{texto} {n:,}" for texto, n in frecuencias.most_common(3)) + ", ...")
+    finally:
+        shutil.rmtree(directory)
+
+def _stress_worker(backend, path, jugadores, operaciones, semilla):
+    """Un proceso de la prueba de estrés: añadir_items (y alguna decisión) sobre jugadores al azar."""
+    global STORE
+    rng = random.Random(semilla)
+    items, decisiones = Counter(), Counter()
+    if backend == "sin bloqueo":
+        # Como antes de PlayerStore: leer todo, cambiar y reescribir, sin bloqueo ni versiones
+        for _ in range(operaciones):
+            name = f"jugador{rng.randrange(jugadores):07d}"
+            players = read_players_file(path)
+            inv = players[name]["inventario"]
+            inv["moneda_antigua"] = inv.get("moneda_antigua", 0) + 1
+            write_players_file(path, players)
+            items[name] += 1
+        return items, decisiones, 0
+    STORE = PlayerStore(SQLitePlayerRepository(path) if backend == "sqlite" else JsonPlayerFile(path))
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(operaciones):
+            name = f"jugador{rng.randrange(jugadores):07d}"
+            player = store().get(name)
+            añadir_items(player, "moneda_antigua")
+            items[name] += 1
+            if i % 4 == 0:
+                store().update(player, lambda p: p["decisiones"].append("Prueba de estrés"))
+                decisiones[name] += 1
+    STORE.close()
+    return items, decisiones, getattr(STORE.backend, "retries", 0)
+
+def benchmark_concurrency(operaciones=400, jugadores=20):
+    if fcntl is None:
+        print("Sin fcntl en este sistema: la prueba necesita bloqueos entre procesos.")
+        return
+    rng = random.Random(0)
+    print(f"Prueba de estrés: cada proceso hace {operaciones} añadir_items sobre {jugadores} jugadores "
+          f"(y una decisión cada 4)")
+    for backend, procesos_probados in (("sin bloqueo", (4,)), ("json", (1, 4)), ("sqlite", (1, 2, 4, 8))):
+        for procesos in procesos_probados:
+            directory = tempfile.mkdtemp()
+            try:
+                iniciales = {f"jugador{i:07d}": sample_player(i, rng) for i in range(jugadores)}
+                if backend == "sqlite":
+                    path = os.path.join(directory, "players.db")
+                    repo = SQLitePlayerRepository(path)
+                    repo.write(iniciales)
+                    repo.close()
+                else:
+                    path = os.path.join(directory, "players.json")
+                    write_players_file(path, iniciales)
+                inicio = time.perf_counter()
+                with ProcessPoolExecutor(procesos) as pool:
+                    futuros = [pool.submit(_stress_worker, backend, path, jugadores, operaciones, semilla)
+                               for semilla in range(procesos)]
+                    resultados = [f.result() for f in futuros]
+                duracion = time.perf_counter() - inicio
+                items, decisiones, reintentos = Counter(), Counter(), 0
+                for i, d, r in resultados:
+                    items.update(i)
+                    decisiones.update(d)
+                    reintentos += r
+
+                if backend == "sqlite":
+                    repo = SQLitePlayerRepository(path)
+                    finales = {name: repo.load(name) for name in iniciales}
+                    repo.close()
+                else:
+                    finales = read_players_file(path)
+                perdidos = sum(iniciales[name]["inventario"].get("moneda_antigua", 0) + items[name]
+                               - finales[name]["inventario"].get("moneda_antigua", 0) for name in iniciales)
+                perdidas = sum(len(iniciales[name]["decisiones"]) + decisiones[name]
+                               - len(finales[name]["decisiones"]) for name in iniciales) if decisiones else 0
+                total = sum(items.values()) + sum(decisiones.values())
+                print(f"  {backend:<11} {procesos} procesos: {total / duracion:>6,.0f} cambios/s, "
+                      f"{reintentos:>4} reintentos, ítems perdidos {perdidos}, decisiones perdidas {perdidas}")
+            finally:
+                shutil.rmtree(directory)
+
+BENCHMARKS = {
+    "store": benchmark_store,
+    "repository": benchmark_repository,
+    "listing": benchmark_listing,
+    "journal": benchmark_journal,
+    "concurrency": benchmark_concurrency,
+}
+
 # -------------------------
 # Punto de entrada
 # -------------------------
 if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "bench":
+        args = [int(a) for a in sys.argv[3:]]
+        BENCHMARKS[sys.argv[2]](*args)
+        sys.exit(0)
     try:
         main_menu()
     except KeyboardInterrupt:
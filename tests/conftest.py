@@ -0,0 +1,35 @@
+import importlib.util
+import pathlib
+import sys
+
+import pytest
+
+RAIZ = pathlib.Path(__file__).resolve().parent.parent
+
+
+def _cargar(nombre, archivo):
+    # Los scripts tienen espacios en el nombre: se cargan por ruta. Quedan en sys.modules
+    # para que pickle (los procesos de ProcessPoolExecutor) encuentre sus funciones.
+    if nombre in sys.modules:
+        return sys.modules[nombre]
+    spec = importlib.util.spec_from_file_location(nombre, RAIZ / archivo)
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nombre] = modulo
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+@pytest.fixture(scope="session")
+def pk():
+    return _cargar("pokemon_ia", "pokemon IA.py")
+
+
+@pytest.fixture(scope="session")
+def rpg():
+    return _cargar("proyecto_final", "proyecto final.py")
+
+
+@pytest.fixture(autouse=True)
+def en_directorio_temporal(tmp_path, monkeypatch):
+    # Los dos juegos guardan en el directorio actual: cada prueba tiene el suyo
+    monkeypatch.chdir(tmp_path)
@@ -0,0 +1,370 @@
+import asyncio
+import io
+import struct
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def modo_dibujo(pk, primero, segundo):
+    """Dibuja dos fotogramas seguidos y dice cómo se escribió el segundo."""
+    salida = io.StringIO()
+    renderizador = pk.RenderizadorTerminal(salida)
+    renderizador.dibujar(primero)
+    salida.seek(0)
+    salida.truncate()
+    renderizador.dibujar(segundo)
+    return "completo" if salida.getvalue().startswith("\x1b[H\x1b[2J") else "diferencias", salida.getvalue()
+
+
+@pytest.fixture
+def terminal_10x20(monkeypatch):
+    monkeypatch.setenv("COLUMNS", "10")
+    monkeypatch.setenv("LINES", "20")
+
+
+def test_fotograma_que_cabe_se_dibuja_por_diferencias(pk, terminal_10x20):
+    assert modo_dibujo(pk, [["ab", "cd"]], [["xy", "cd"]])[0] == "diferencias"
+
+
+@pytest.mark.parametrize("segundo", [[["xy"] + ["ab"] * 5], [["🌲🌲"] + ["ab"] * 4], [["ab"] * 6]])
+def test_fotograma_mas_ancho_que_la_terminal_se_redibuja(pk, terminal_10x20, segundo):
+    assert modo_dibujo(pk, [["ab"] * 5], segundo)[0] == "completo"
+
+
+def test_guion_agotado_termina_sin_traza(pk, tmp_path, monkeypatch, capsys):
+    guion = tmp_path / "guion.txt"
+    guion.write_text("ana\n", encoding="utf-8")
+    monkeypatch.setattr(sys, "argv", ["pokemon IA.py", "guion", str(guion)])
+    pk.main()
+    assert "Fin de la entrada" in capsys.readouterr().out
+
+
+class AlmacenQueAnotaElHilo:
+    def __init__(self):
+        self.hilos = []
+
+    def guardar(self, jugador):
+        self.hilos.append(threading.current_thread())
+
+
+def test_guardar_desde_el_servidor_no_bloquea_el_bucle(pk):
+    almacen = AlmacenQueAnotaElHilo()
+    guardados = ThreadPoolExecutor(1)
+
+    async def partida():
+        sesion = pk.SesionJuego(almacen=almacen, guardados=guardados)
+        for orden in ("ana", "1"):
+            await sesion.procesar(orden)
+        return await sesion.procesar("g")
+
+    try:
+        assert asyncio.run(partida()) == "Partida guardada correctamente"
+    finally:
+        guardados.shutdown()
+    assert almacen.hilos and almacen.hilos[0] is not threading.main_thread()
+
+
+def test_ancho_en_pantalla_de_emojis_y_caracteres_anchos(pk):
+    assert pk.ancho_en_pantalla("· ") == 2
+    assert pk.ancho_en_pantalla("🐾") == 2
+    assert pk.ancho_en_pantalla("漢") == 2
+    assert pk.ancho_en_pantalla("❤") == 1
+    assert pk.ancho_en_pantalla("❤️") == 2
+
+
+def test_celdas_anchas_del_mismo_ancho_se_colocan_por_columnas(pk, terminal_10x20):
+    modo, texto = modo_dibujo(pk, [["🐾", "🐾", "ab"]], [["🐾", "🌲", "ab"]])
+    assert modo == "diferencias"
+    assert "\x1b[1;3H🌲" in texto
+
+
+def test_celda_que_cambia_de_ancho_reescribe_la_fila(pk, terminal_10x20):
+    modo, texto = modo_dibujo(pk, [["🐾", "ab", "cd"]], [["x", "ab", "cd"]])
+    assert modo == "diferencias"
+    assert "\x1b[1;1Hxabcd\x1b[K" in texto
+
+
+@pytest.mark.skipif(np is None, reason="sin NumPy")
+def test_poblacion_en_coincide_con_un_barrido(pk):
+    generador = np.random.default_rng(3)
+    n, tamano = 300, 12
+    poblacion = pk.PoblacionMapa(generador.integers(0, tamano, n), generador.integers(0, tamano, n),
+                                 [None] * n, ["🐾"] * n, tamano, generador)
+
+    def barrido(x, y):
+        indices = np.flatnonzero((poblacion.xs == x) & (poblacion.ys == y))
+        return int(indices[0]) if indices.size else None
+
+    for _ in range(20):
+        poblacion.paso_aleatorio(tamano)
+        for y in range(tamano):
+            for x in range(tamano):
+                criatura = poblacion.en(x, y)
+                assert (criatura.i if criatura else None) == barrido(x, y)
+    assert poblacion.en(-1, 0) is None and poblacion.en(tamano, 0) is None
+    poblacion.emojis[:] = [str(i) for i in range(n)]
+    assert poblacion.emojis_por_celda() == {(x, y): str(barrido(x, y)) for y in range(tamano)
+                                            for x in range(tamano) if barrido(x, y) is not None}
+
+
+@pytest.mark.skipif(np is None, reason="sin NumPy")
+def test_mover_una_criatura_por_la_vista_actualiza_las_celdas(pk):
+    poblacion = pk.PoblacionMapa([0, 0], [0, 0], ["a", "b"], ["🐾", "🐾"], 5)
+    assert poblacion.en(0, 0)["pokemon"] == "a"
+    poblacion[0]["x"] = 3
+    assert poblacion.en(0, 0)["pokemon"] == "b"
+    assert poblacion.en(3, 0)["pokemon"] == "a"
+    poblacion[1]["y"] = 4
+    assert poblacion.en(0, 0) is None
+    assert poblacion.en(0, 4)["pokemon"] == "b"
+
+
+def jugador_con_historial(pk, nombre, historial):
+    jugador = pk.Jugador(nombre)
+    jugador.agregar_pokemon(pk.ESPECIES_INICIALES[0]())
+    jugador.historial_combates = list(historial)
+    return jugador
+
+
+def test_archivo_elige_motor_guardado_como_almacen(pk, tmp_path, monkeypatch, capsys):
+    ruta = str(tmp_path / "partida.jsonl")
+    guion = tmp_path / "guion.txt"
+    guion.write_text("1\nana\n1\ng\nv\n4\n", encoding="utf-8")
+    monkeypatch.setattr(sys, "argv", ["pokemon IA.py", "archivo", ruta, "guion", str(guion)])
+    pk.main()
+
+    motor = pk.MotorGuardado(ruta)
+    assert [nombre for nombre, _ in motor.listar()] == ["ana"]
+    assert motor.cargar("ana").nombre == "ana"
+    assert motor.cargar("otro") is None
+    assert not (tmp_path / pk.ARCHIVO_PARTIDAS).exists()
+    assert motor.borrar("otro") is False
+    assert motor.borrar("ana") is True
+    assert motor.listar() == []
+
+
+def test_partida_sin_archivo_de_historial_carga_con_historial_vacio(pk, tmp_path):
+    ruta = str(tmp_path / "partida.jsonl")
+    pk.MotorGuardado(ruta).guardar(jugador_con_historial(pk, "ana", ["a", "b"]))
+    assert pk.MotorGuardado(ruta).cargar().historial_combates == ["a", "b"]
+
+    (tmp_path / "partida.jsonl.historial").unlink()
+    motor = pk.MotorGuardado(ruta)
+    jugador = motor.cargar()
+    assert jugador.historial_combates == []
+    jugador.historial_combates.append("c")
+    motor.guardar(jugador)
+    assert pk.MotorGuardado(ruta).cargar().historial_combates == ["c"]
+
+
+def historial_guardado(almacen, nombre):
+    return [entrada for (entrada,) in almacen.conexion.execute(
+        "SELECT entrada FROM historial WHERE jugador = ? ORDER BY idx", (nombre,))]
+
+
+def test_partida_nueva_con_el_mismo_nombre_reemplaza_el_historial(pk, tmp_path):
+    almacen = pk.AlmacenPartidas(str(tmp_path / "partidas.db"))
+    almacen.guardar(jugador_con_historial(pk, "Ash", ["Victoria contra Viejo0", "Victoria contra Viejo1"]))
+    almacen.guardar(jugador_con_historial(pk, "Ash", ["Victoria contra Nuevo"]))
+    assert almacen.cargar("Ash").historial_combates == ["Victoria contra Nuevo"]
+    # Mismo número de entradas que la anterior: también se reemplaza
+    almacen.guardar(jugador_con_historial(pk, "Ash", ["Derrota contra Otro"]))
+    assert almacen.cargar("Ash").historial_combates == ["Derrota contra Otro"]
+    assert historial_guardado(almacen, "Ash") == ["Derrota contra Otro"]
+    almacen.cerrar()
+
+
+def test_guardar_la_misma_partida_solo_añade_lo_nuevo(pk, tmp_path):
+    almacen = pk.AlmacenPartidas(str(tmp_path / "partidas.db"))
+    jugador = jugador_con_historial(pk, "Ash", ["a"])
+    almacen.guardar(jugador)
+    jugador.historial_combates.append("b")
+    almacen.guardar(jugador)
+    cargado = almacen.cargar("Ash")
+    cargado.historial_combates.append("c")
+    almacen.guardar(cargado)
+    assert historial_guardado(almacen, "Ash") == ["a", "b", "c"]
+    almacen.cerrar()
+
+
+def test_dos_sesiones_con_el_mismo_nombre_no_mezclan_historiales(pk, tmp_path):
+    ruta = str(tmp_path / "partidas.db")
+    una, otra = pk.AlmacenPartidas(ruta), pk.AlmacenPartidas(ruta)
+    primera = jugador_con_historial(pk, "Ash", ["a1", "a2"])
+    una.guardar(primera)
+    segunda = jugador_con_historial(pk, "Ash", ["b1", "b2"])
+    otra.guardar(segunda)
+    primera.historial_combates.append("a3")
+    una.guardar(primera)
+    assert una.cargar("Ash").historial_combates == ["a1", "a2", "a3"]
+    una.cerrar()
+    otra.cerrar()
+
+
+def combate_hasta_el_final(pk, jugador, salvaje, semilla):
+    motor = pk.MotorCombate(jugador, salvaje, semilla)
+    while jugador.pokemon_actual.hp_actual > 0 and salvaje.hp_actual > 0:
+        motor.atacar(0)
+        if salvaje.hp_actual > 0:
+            motor.atacar_salvaje(motor.elegir_movimiento_salvaje())
+    return motor
+
+
+def pokemon_fuera_del_catalogo(pk):
+    movimientos = (pk.Movimiento("Rayo raro", 17, "Cósmico"), pk.Movimiento("Placaje", 9, "Normal"))
+    return pk.Pokemon("Generadito", "Cósmico", 21, 13, 60, "Brillo", movimientos)
+
+
+def test_registro_binario_ida_y_vuelta(pk, tmp_path):
+    registro = pk.RegistroCombates(str(tmp_path / "combates.log"))
+    for semilla in range(5):
+        jugador = pk.Jugador("ana")
+        jugador.agregar_pokemon(pk.ESPECIES_INICIALES[0]())
+        jugador.agregar_pokemon(pokemon_fuera_del_catalogo(pk))
+        salvaje = pokemon_fuera_del_catalogo(pk) if semilla % 2 else pk.ESPECIES_SALVAJES[0]()
+        registro.anotar(combate_hasta_el_final(pk, jugador, salvaje, semilla))
+
+    leidos = list(registro.leer())
+    assert len(leidos) == 5
+    assert leidos[1]['salvaje'][0] == "Generadito"
+    tipo, habilidad, movimientos = leidos[1]['fichas'][0]
+    assert (tipo, habilidad) == ("Cósmico", "Brillo")
+    assert [(m.nombre, m.poder, m.tipo) for m in movimientos] == [("Rayo raro", 17, "Cósmico"), ("Placaje", 9, "Normal")]
+    assert registro.verificar() == (5, 0)
+
+
+def test_registro_de_la_version_1_se_sigue_leyendo(pk, tmp_path):
+    jugador = pk.Jugador("ana")
+    jugador.agregar_pokemon(pk.ESPECIES_INICIALES[0]())
+    motor = combate_hasta_el_final(pk, jugador, pk.ESPECIES_SALVAJES[0](), 7)
+    datos = motor.codificar()
+    # Misma partida escrita con el formato antiguo: nombre con un byte de longitud y sin ficha
+    antiguo = pk.decodificar_combate(datos)
+
+    def stats_v1(stats):
+        nombre = stats[0].encode('utf-8')
+        return bytes((len(nombre),)) + nombre + pk._STATS_COMBATE.pack(*stats[1:])
+    v1 = b"".join([pk._CABECERA_COMBATE.pack(b'CB', 1, motor.semilla), stats_v1(antiguo['salvaje']),
+                   bytes((len(antiguo['equipo']),))] + [stats_v1(p) for p in antiguo['equipo']])
+    # Lo que sigue a los Pokémon (activo, eventos y estado final) no cambió entre versiones
+    cola = 1 + pk._LONGITUD.size + len(motor.eventos) + struct.calcsize(f"<{1 + len(antiguo['equipo'])}HB")
+    v1 += datos[-cola:]
+    registro = pk.decodificar_combate(v1)
+    assert registro['fichas'] is None
+    assert registro['eventos'] == antiguo['eventos']
+    assert pk.verificar_combate(registro)
+
+
+def test_registro_de_combates_rota_al_llenarse(pk, tmp_path):
+    ruta = str(tmp_path / "combates.log")
+    registro = pk.RegistroCombates(ruta, max_bytes=2000)
+    for semilla in range(30):
+        jugador = pk.Jugador("ana")
+        jugador.agregar_pokemon(pk.ESPECIES_INICIALES[0]())
+        registro.anotar(combate_hasta_el_final(pk, jugador, pk.ESPECIES_SALVAJES[0](), semilla))
+        assert (tmp_path / "combates.log").stat().st_size <= 2000
+    assert (tmp_path / "combates.log.1").exists()
+    correctos, fallidos = registro.verificar()
+    assert fallidos == 0 and 0 < correctos < 30
+
+
+def test_el_registro_de_combates_va_junto_a_las_partidas(pk, tmp_path):
+    ruta = str(tmp_path / "partidas" / "partida.jsonl")
+    juego = pk.Juego(almacen=pk.MotorGuardado(ruta))
+    assert juego.registro_combates.ruta == str(tmp_path / "partidas" / pk.ARCHIVO_COMBATES)
+
+
+class RegistroEnMemoria:
+    def __init__(self):
+        self.motores = []
+
+    def anotar(self, motor):
+        self.motores.append(motor)
+
+
+def juego_con_salvaje_al_lado(pk, **opciones):
+    juego = pk.Juego(tamano_mapa=5, num_salvajes=0, **opciones)
+    juego.registro_combates = RegistroEnMemoria()
+    return juego, pk.ESPECIES_SALVAJES[0]()
+
+
+def test_encuentro_aplica_las_reglas_sin_entrada_ni_salida(pk, monkeypatch):
+    juego, salvaje = juego_con_salvaje_al_lado(pk)
+    juego.jugador = jugador_con_historial(pk, "ana", [])
+    reiniciados = []
+    monkeypatch.setattr(juego, "tras_encuentro", reiniciados.append)
+    encuentro = pk.Encuentro(juego, salvaje)
+    salvaje.hp_actual = 1
+    while encuentro.fase != 'fin':
+        encuentro.atacar(0)
+        if encuentro.fase == 'salvaje':
+            encuentro.turno_salvaje()
+        if encuentro.fase == 'cambio':
+            encuentro.cambiar(None)
+    assert juego.jugador.historial_combates[-1] in ("Victoria contra " + salvaje.nombre,
+                                                    "Derrota contra " + salvaje.nombre)
+    assert juego.registro_combates.motores == [encuentro.motor]
+    assert reiniciados == [salvaje]
+    encuentro.terminar()
+    assert len(juego.registro_combates.motores) == 1
+
+
+def test_terminal_y_servidor_juegan_el_mismo_combate(pk, capsys):
+    # Mismo salvaje, misma semilla y mismas órdenes: mismo historial y mismos eventos
+    historiales, eventos = [], []
+    for driver in ("terminal", "servidor"):
+        pk.random.seed(5)
+        if driver == "terminal":
+            juego, salvaje = juego_con_salvaje_al_lado(pk, ritmo=pk.Ritmo('guion', ["1", "1"] * 50 + ["3"]))
+            juego.renderizador = pk.RenderizadorTerminal(io.StringIO())
+            juego.jugador = jugador_con_historial(pk, "ana", [])
+            juego.combate(salvaje)
+        else:
+            sesion = pk.SesionJuego(tamano_mapa=5, num_salvajes=0)
+            juego, salvaje = sesion.juego, pk.ESPECIES_SALVAJES[0]()
+            juego.registro_combates = RegistroEnMemoria()
+            sesion.jugador = juego.jugador = jugador_con_historial(pk, "ana", [])
+
+            async def jugar():
+                sesion._empezar_combate(salvaje)
+                while sesion.estado != 'explorar':
+                    await sesion.procesar("1")
+            asyncio.run(jugar())
+        historiales.append(juego.jugador.historial_combates)
+        eventos.append(bytes(juego.registro_combates.motores[0].eventos))
+    assert historiales[0] == historiales[1] and historiales[0]
+    assert eventos[0] == eventos[1]
+
+
+def test_servidor_escucha_solo_en_local_por_defecto(pk):
+    assert pk.HOST_SERVIDOR == "127.0.0.1"
+
+    async def abrir():
+        servidor = pk.ServidorJuego()
+        servidor_asyncio = await servidor.iniciar(puerto=0)
+        host = servidor_asyncio.sockets[0].getsockname()[0]
+        servidor_asyncio.close()
+        await servidor_asyncio.wait_closed()
+        servidor.cerrar()
+        return host
+    assert asyncio.run(abrir()) == "127.0.0.1"
+
+
+def test_cancelar_y_buscar_no_pierde_a_quien_espera(pk):
+    cola = pk.ColaEmparejamiento(ancho_cubo=100, intervalo=5.0, reloj=lambda: 0.0)
+    cola.encolar("A", 1500, ahora=0.0, buscar=False)
+    cola.encolar("B", 1520, ahora=1.0, buscar=False)
+    assert cola.cancelar("B")
+    # A es la cabeza de su cubo y el resto son bajas: buscarle rival no puede quitarle el cubo
+    assert cola.emparejar(ahora=10.0) == []
+    assert [e[2].clave for e in cola.cubos[15]] == ["A"]
+    assert cola.encolar("C", 1550, ahora=11.0) == "A"
+    assert len(cola) == 0 and "A" not in cola and "C" not in cola
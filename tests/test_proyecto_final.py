@@ -0,0 +1,255 @@
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+
+@pytest.fixture(params=["json", "sqlite", "sqlite-migrado"])
+def backend(request, rpg, tmp_path, capsys):
+    if request.param == "json":
+        backend = rpg.JsonPlayerFile(str(tmp_path / "players.json"))
+    elif request.param == "sqlite":
+        backend = rpg.SQLitePlayerRepository(str(tmp_path / "players.db"))
+    else:
+        # Como la abre store() la primera vez: una base nueva que se trae players.json
+        json_path = str(tmp_path / "antiguo.json")
+        rpg.JsonPlayerFile(json_path).write({"veterano": dict(rpg.sample_player(0), nombre="veterano")})
+        backend = rpg.open_repository(str(tmp_path / "players.db"), json_path)
+    yield backend
+    backend.close()
+
+
+def reabrir(rpg, backend):
+    """Un backend nuevo sobre los mismos archivos: lo que vería otra partida."""
+    return type(backend)(backend.path)
+
+
+@pytest.fixture
+def store(rpg, backend, monkeypatch):
+    store = rpg.PlayerStore(backend)
+    monkeypatch.setattr(rpg, "STORE", store)
+    return store
+
+
+def test_update_conserva_los_cambios_sin_guardar(rpg, backend, store, capsys):
+    player = rpg.sample_player(1)
+    player["nivel"], player["xp"] = 1, 0
+    rpg.save_player(player)
+    store.flush()
+    player["inventario"]["antorcha"] = 2
+    rpg.ganar_xp(player, 40)
+    player["hp"] -= 3
+
+    rpg.añadir_items(player, "antorcha")
+    store.flush()
+
+    guardado = reabrir(rpg, backend).load(player["nombre"])
+    assert guardado["xp"] == player["xp"]
+    assert guardado["hp"] == player["hp"] == 22
+    assert guardado["inventario"]["antorcha"] == player["inventario"]["antorcha"] == 3
+
+
+def test_dos_partidas_añadiendo_items_no_pierden_ninguno(rpg, backend, capsys):
+    player = rpg.sample_player(1)
+    backend.write({player["nombre"]: player})
+    tiendas = [rpg.PlayerStore(reabrir(rpg, backend)) for _ in range(2)]
+    jugadores = [tienda.get(player["nombre"]) for tienda in tiendas]
+    for _ in range(3):
+        for tienda, jugador in zip(tiendas, jugadores):
+            tienda.update(jugador, lambda p: p["inventario"].update(pocion=p["inventario"]["pocion"] + 1))
+    assert reabrir(rpg, backend).load(player["nombre"])["inventario"]["pocion"] == 2 + 6
+
+
+def test_migrar_jugadores_con_version_desde_json(rpg, tmp_path, capsys):
+    json_path = str(tmp_path / "players.json")
+    player = rpg.sample_player(1)
+    rpg.JsonPlayerFile(json_path).write({player["nombre"]: player})
+    assert rpg.read_players_file(json_path)[player["nombre"]]["version"] == 1
+
+    repo = rpg.open_repository(str(tmp_path / "players.db"), json_path)
+    assert repo.count() == 1
+    assert repo.load(player["nombre"])["decisiones"] == player["decisiones"]
+    # Una segunda migración no puede insertarlo otra vez: se informa, no se cuenta
+    assert repo.migrate_from_json(json_path) == (0, [player["nombre"]])
+    repo.close()
+
+
+def test_flush_pendientes_escribe_al_pasar_el_intervalo(rpg, backend, monkeypatch):
+    ahora = [0.0]
+    store = rpg.PlayerStore(backend, flush_interval=10, clock=lambda: ahora[0])
+    monkeypatch.setattr(rpg, "STORE", store)
+    rpg.save_player(rpg.sample_player(1))
+    rpg.flush_pendientes()
+    assert store.dirty
+    ahora[0] = 10.0
+    rpg.flush_pendientes()
+    assert not store.dirty
+    assert reabrir(rpg, backend).load(rpg.sample_player(1)["nombre"]) is not None
+
+
+def test_count_players_with_ve_textos_de_otro_proceso(rpg, tmp_path):
+    lector = rpg.DecisionJournal(str(tmp_path / "diario"))
+    rpg.DecisionJournal(str(tmp_path / "diario")).append("ana", ["Tomó camino oscuro"])
+    assert lector.count_players_with("Tomó camino oscuro") == 1
+
+
+def test_rollback_deshace_lo_añadido_al_diario(rpg, tmp_path):
+    repo = rpg.SQLitePlayerRepository(str(tmp_path / "players.db"))
+    player = rpg.sample_player(1)
+    player["decisiones"] = ["Taberna"]
+    repo.save(player)
+    player = repo.load(player["nombre"])
+    player["decisiones"].append("Mercado")
+    with pytest.raises(KeyError):
+        repo.write({player["nombre"]: player, "roto": {"nombre": "roto"}})
+
+    assert list(repo.journal.read(player["nombre"])) == ["Taberna"]
+    assert repo.load(player["nombre"])["version"] == 1
+    player = repo.load(player["nombre"])
+    player["decisiones"].append("Luchó con goblin")
+    repo.save(player)
+    assert list(repo.journal.read(player["nombre"])) == ["Taberna", "Luchó con goblin"]
+    repo.close()
+
+
+def jugador_nuevo(rpg, nombre, clase, decisiones):
+    player = rpg.sample_player(1)
+    player.update(nombre=nombre, clase=clase, decisiones=list(decisiones))
+    return player
+
+
+def test_write_con_reemplazo_borra_al_anterior(rpg, backend, capsys):
+    backend.write({"ana": jugador_nuevo(rpg, "ana", "Guerrero", ["Entró en la cripta"])})
+    nuevo = jugador_nuevo(rpg, "ana", "Mago", ["Mercado"])
+    assert backend.write({"ana": nuevo}, replaced={"ana"}) == []
+    guardado = reabrir(rpg, backend).load("ana")
+    assert (guardado["clase"], guardado["decisiones"], guardado["version"]) == ("Mago", ["Mercado"], 1)
+
+
+def test_borrar_y_crear_se_deshace_entero_si_falla_la_escritura(rpg, tmp_path):
+    repo = rpg.SQLitePlayerRepository(str(tmp_path / "players.db"))
+    repo.save(jugador_nuevo(rpg, "ana", "Guerrero", ["Taberna"]))
+    with pytest.raises(KeyError):
+        repo.write({"ana": jugador_nuevo(rpg, "ana", "Mago", ["Mercado"]), "roto": {"nombre": "roto"}},
+                   replaced={"ana"})
+    guardado = repo.load("ana")
+    assert (guardado["clase"], guardado["decisiones"]) == ("Guerrero", ["Taberna"])
+    repo.close()
+
+
+def test_borrar_y_crear_otro_con_el_mismo_nombre_antes_de_escribir(rpg, backend, store, capsys):
+    viejo = jugador_nuevo(rpg, "ana", "Guerrero", ["Entró en la cripta", "Mercado"])
+    viejo["inventario"]["antorcha"] = 9
+    rpg.save_player(viejo)
+    store.flush()
+
+    store.delete("ana")
+    nuevo = jugador_nuevo(rpg, "ana", "Mago", ["Ayudó al aldeano"])
+    store.put(nuevo)
+    store.flush()
+
+    assert "otra partida" not in capsys.readouterr().out
+    assert store.get("ana") is nuevo
+    guardado = reabrir(rpg, backend).load("ana")
+    assert guardado["clase"] == "Mago"
+    assert guardado["decisiones"] == ["Ayudó al aldeano"]
+    assert guardado["inventario"] == rpg.crear_inventario_default()
+    assert guardado["version"] == nuevo["version"] == 1
+    if hasattr(backend, "journal"):
+        assert backend.journal.count_players_with("Entró en la cripta") == 0
+        assert sorted(backend.journal.players()) == sorted(backend.names())
+
+
+@pytest.mark.parametrize("respuesta, clase", [("1", "Mago"), ("2", "Guerrero")])
+def test_crear_jugador_con_un_nombre_que_ya_existe(rpg, backend, store, monkeypatch, capsys, respuesta, clase):
+    rpg.save_player(jugador_nuevo(rpg, "ana", "Guerrero", ["Taberna"]))
+    store.flush()
+    entradas = iter(["ana", respuesta, "2"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(entradas))
+    creado = rpg.crear_jugador()
+    assert (creado is None) == (respuesta == "2")
+    store.flush()
+    guardado = reabrir(rpg, backend).load("ana")
+    assert guardado["clase"] == clase
+    assert guardado["decisiones"] == ([] if creado else ["Taberna"])
+    assert "otra partida" not in capsys.readouterr().out
+
+
+def test_añadir_items_suma_sobre_lo_guardado_por_casillas(rpg, backend, store, capsys):
+    player = jugador_nuevo(rpg, "ana", "Guerrero", [])
+    rpg.save_player(player)
+    store.flush()
+    otra = rpg.PlayerStore(reabrir(rpg, backend))
+    otra.add_items(otra.get("ana"), {"pocion": 5})
+    # La otra partida subió la versión: se recarga con sus pociones y se suman las nuevas
+    rpg.añadir_items(player, "pocion", "pocion", "llave")
+    assert player["inventario"]["pocion"] == 2 + 5 + 2
+    assert player["inventario"]["llave"] == 1
+    rpg.añadir_items(player, "llave")
+    store.add_items(player, {"antorcha": -1})
+    guardado = reabrir(rpg, backend).load("ana")
+    assert guardado["inventario"] == player["inventario"] == {"pocion": 9, "llave": 2, "espada_baja": 1}
+    assert guardado["version"] == player["version"]
+
+
+def test_diario_con_nombres_largos(rpg, tmp_path):
+    diario = rpg.DecisionJournal(str(tmp_path / "diario"))
+    largo = "ñ" * 200  # 400 bytes en UTF-8: en hexadecimal no cabe como nombre de archivo
+    diario.append(largo, ["Taberna", "Mercado"])
+    diario.append("ana", ["Taberna"])
+    otro = rpg.DecisionJournal(str(tmp_path / "diario"))
+    assert list(otro.read(largo)) == ["Taberna", "Mercado"]
+    assert sorted(otro.players()) == sorted(["ana", largo])
+    assert otro.count_players_with("Mercado") == 1
+    otro.delete(largo)
+    assert list(diario.players()) == ["ana"]
+
+
+def test_count_players_with_sigue_los_deshacer_y_borrar(rpg, tmp_path):
+    diario = rpg.DecisionJournal(str(tmp_path / "diario"))
+    lector = rpg.DecisionJournal(str(tmp_path / "diario"))
+    diario.append_new("ana", ["Taberna"])
+    desde = diario.append_new("ana", ["Taberna", "Taberna", "Mercado"])
+    diario.append_new("eva", ["Mercado", "Mercado"])
+    assert (lector.count_players_with("Taberna"), lector.count_players_with("Mercado")) == (1, 2)
+    diario.undo("ana", desde)
+    assert (lector.count_players_with("Taberna"), lector.count_players_with("Mercado")) == (1, 1)
+    lector.delete("eva")
+    assert diario.count_players_with("Mercado") == 0
+    aparte = diario.set_aside("ana")
+    assert lector.count_players_with("Taberna") == 0
+    diario.restore("ana", aparte)
+    assert lector.count_players_with("Taberna") == 1
+
+
+def test_diario_de_antes_del_indice_se_indexa_al_abrirlo(rpg, tmp_path):
+    directorio = tmp_path / "diario"
+    rpg.DecisionJournal(str(directorio)).append("ana", ["Taberna"])
+    (directorio / "_indice.log").unlink()
+    assert rpg.DecisionJournal(str(directorio)).count_players_with("Taberna") == 1
+
+
+def _usar_diario_al_azar(directorio, semilla):
+    rpg = sys.modules["proyecto_final"]
+    diario, rng = rpg.DecisionJournal(directorio), random.Random(semilla)
+    for _ in range(150):
+        name = f"p{rng.randrange(10)}"
+        if rng.random() < 0.15:
+            diario.delete(name)
+        elif rng.random() < 0.2:
+            desde = diario.append_new(name, list(diario.read(name)) + [rng.choice("abc")])
+            if desde is not None and rng.random() < 0.5:
+                diario.undo(name, desde)
+        else:
+            diario.append(name, [rng.choice("abcd")])
+
+
+def test_indice_del_diario_con_varios_procesos(rpg, tmp_path):
+    directorio = str(tmp_path / "diario")
+    rpg.DecisionJournal(directorio)
+    with ProcessPoolExecutor(3) as pool:
+        list(pool.map(_usar_diario_al_azar, [directorio] * 3, range(3)))
+    diario = rpg.DecisionJournal(directorio)
+    for texto in "abcd":
+        assert diario.count_players_with(texto) == sum(texto in set(diario.read(n)) for n in diario.players())